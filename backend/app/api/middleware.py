@@ -0,0 +1,174 @@
+"""
+Middlewares ASGI da API
+"""
+import json
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from ..services.admission_service import admission, AdmissionRejected
+from ..services.metrics_service import metrics
+from ..services.rate_limit_service import rate_limiter, client_ip, RateLimitExceeded
+from ..services.profiler_service import profiler
+from .. import constants
+
+
+class MetricsMiddleware:
+    """
+    Latência por rota, requisições em andamento e tamanho dos payloads
+
+    ASGI puro (sem BaseHTTPMiddleware) para não copiar o corpo nem criar
+    tarefas extras. A rota é o template do FastAPI (`/api/v1/game/{session_id}/click`),
+    não o caminho, para manter a cardinalidade dos rótulos baixa.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.latency = metrics.histogram(
+            "http_request_duration_seconds", "Latência das requisições HTTP",
+            ("method", "route", "status")
+        )
+        self.in_flight = metrics.gauge("http_requests_in_flight", "Requisições HTTP em andamento")
+        self.request_size = metrics.histogram(
+            "http_request_size_bytes", "Tamanho do corpo das requisições", ("route",),
+            buckets=constants.METRICS_SIZE_BUCKETS
+        )
+        self.response_size = metrics.histogram(
+            "http_response_size_bytes", "Tamanho do corpo das respostas", ("route",),
+            buckets=constants.METRICS_SIZE_BUCKETS
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        received = 0
+        sent = 0
+
+        async def receive_wrapper():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            self.in_flight.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            self.latency.observe(time.perf_counter() - start, scope["method"], path, str(status))
+            self.request_size.observe(received, path)
+            self.response_size.observe(sent, path)
+
+
+class ProfilerMiddleware:
+    """
+    Seleciona requisições para o profiler por amostragem
+
+    Com o profiler desligado custa só a leitura de um atributo; ligado,
+    marca as requisições escolhidas (1 a cada N nas rotas configuradas)
+    enquanto estão em andamento.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.active or not profiler.enter(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.exit()
+
+
+class AdmissionMiddleware:
+    """
+    Backpressure nas rotas de inferência e do jogo
+
+    Fica antes do roteamento e da leitura do corpo: uma requisição recusada
+    (fila cheia ou prazo vencido na fila) recebe 503 com Retry-After sem
+    decodificar imagem nem chamar o modelo.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        gate = admission.gate_for(scope["path"]) if scope["type"] == "http" else None
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            admitted_at = await gate.acquire()
+        except AdmissionRejected as e:
+            admission.reject(gate, e)
+            await _send_json_error(send, 503, {
+                "detail": "Servidor ocupado, tente novamente", "reason": e.reason
+            }, e.retry_after)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release(admitted_at)
+
+
+class RateLimitMiddleware:
+    """
+    Token bucket por sessão/IP nas rotas com regra
+
+    Recusa com 429 + Retry-After antes do roteamento, da leitura do corpo e
+    do controle de admissão: um cliente acima do limite não ocupa fila.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rule, session_id = rate_limiter.match(scope["path"])
+        if rule is not None:
+            try:
+                if rate_limiter.blocking:
+                    await run_in_threadpool(rate_limiter.check, rule, session_id, client_ip(scope))
+                else:
+                    rate_limiter.check(rule, session_id, client_ip(scope))
+            except RateLimitExceeded as e:
+                await _send_json_error(send, 429, {
+                    "detail": "Muitas requisições, tente novamente", "rule": e.rule, "scope": e.scope
+                }, e.retry_after)
+                return
+        await self.app(scope, receive, send)
+
+
+async def _send_json_error(send, status: int, payload: dict, retry_after: int):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -1,27 +1,64 @@
 """
 Rotas da API REST
 """
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse, FileResponse
-from typing import List, Optional, Dict, Set
+from fastapi import (
+    APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query,
+    WebSocket, WebSocketDisconnect
+)
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+from pydantic import ValidationError
+from typing import Iterable, Iterator, List, Optional, Dict, Set
 from pathlib import Path
+import asyncio
 import base64
-import random
+import json
+import os
+import secrets
+import struct
+import tempfile
+from contextlib import nullcontext
+from datetime import datetime
 
 from ..models.schemas import (
     ImageAnalysisRequest, ImageAnalysisResponse,
     GameSession, GameRound, GameResult,
     ClickEvent, ClickResult, Detection,
-    LeaderboardEntry
+    LeaderboardEntry, ModelPromoteRequest, ModelCanaryRequest, ProfilerStartRequest
 )
 from ..services.detection_service import detection_service
 from ..services.game_service import game_service
 from ..services.ai_learning_service import ai_learning_service
+from ..services.model_registry import model_registry
+from ..services.storage_service import storage_service
+from ..services.leaderboard_service import leaderboard_service
+from ..services.video_service import video_service, iter_video_frames, iter_uploaded_frames
+from ..services.image_sampler import image_sampler
+from ..services.metrics_service import metrics, stage_seconds
+from ..services.profiler_service import profiler
+from ..services.admission_service import admission, AdmissionRejected
+from ..services.rate_limit_service import rate_limiter, client_ip, RateLimitExceeded
 from ..config import settings
-from ..constants import BOAR_IMAGE_PROBABILITY, BOAR_CLASS_INDICES
+from ..constants import (
+    BOAR_IMAGE_PROBABILITY, BOAR_CLASS_INDICES,
+    VIDEO_EXTENSIONS, VIDEO_UPLOAD_CHUNK_BYTES
+)
 
 router = APIRouter()
 
+# Conexões abertas no canal WebSocket do jogo
+ws_connections = metrics.gauge("game_ws_connections", "Conexões WebSocket de jogo abertas")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Exige o header X-Admin-Token igual a ADMIN_TOKEN (rotas desativadas sem ele)"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Rotas de administração desativadas")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Token de administração inválido")
+
 
 # ===========================================
 # Cache de Índice de Imagens por Categoria
@@ -109,35 +146,6 @@ def _get_image_index(split: str) -> Dict[str, List[Path]]:
     return _image_index_cache[split]
 
 
-def _select_random_image_with_bias(split: str) -> Path:
-    """
-    Seleciona uma imagem aleatória com viés para mostrar mais javalis.
-    
-    Usa BOAR_IMAGE_PROBABILITY para determinar a chance de mostrar 
-    uma imagem com javali vs uma imagem com outros animais.
-    """
-    index = _get_image_index(split)
-    
-    boar_images = index.get('boar', [])
-    other_images = index.get('other', [])
-    
-    # Se não há imagens de alguma categoria, retorna da outra
-    if not boar_images and not other_images:
-        raise HTTPException(status_code=404, detail="Nenhuma imagem encontrada")
-    
-    if not boar_images:
-        return random.choice(other_images)
-    
-    if not other_images:
-        return random.choice(boar_images)
-    
-    # Decide baseado na probabilidade configurada
-    if random.random() < BOAR_IMAGE_PROBABILITY:
-        return random.choice(boar_images)
-    else:
-        return random.choice(other_images)
-
-
 # ============== Rotas de Detecção ==============
 
 @router.post("/detect", response_model=ImageAnalysisResponse)
@@ -150,7 +158,9 @@ async def detect_animals(request: ImageAnalysisRequest):
     - Detecta humanos (penalidade severa)
     """
     try:
-        result = detection_service.analyze_image(request.image_base64, return_masks=True)
+        result = await run_in_threadpool(
+            detection_service.analyze_image, request.image_base64, return_masks=True
+        )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro na detecção: {str(e)}")
@@ -162,19 +172,238 @@ async def detect_from_upload(file: UploadFile = File(...)):
     try:
         contents = await file.read()
         image_base64 = base64.b64encode(contents).decode()
-        result = detection_service.analyze_image(image_base64, return_masks=True)
+        result = await run_in_threadpool(detection_service.analyze_image, image_base64, return_masks=True)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro na detecção: {str(e)}")
 
 
+def _ndjson(records: Iterable[dict]) -> Iterator[str]:
+    """Serializa registros como JSON delimitado por linhas (NDJSON)"""
+    for record in records:
+        yield json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+
+def _dataset_source(path: str):
+    """
+    Cria uma fonte (nome, leitor) para um caminho relativo ao dataset
+    
+    Caminhos fora do dataset ou inexistentes viram erro do próprio item.
+    """
+    base_dir = settings.AGRICULTURE_DATASET_DIR.resolve()
+    image_path = (base_dir / path).resolve()
+    
+    def load() -> bytes:
+        if base_dir not in image_path.parents:
+            raise ValueError("caminho fora do dataset")
+        return image_path.read_bytes()
+    
+    return path, load
+
+
+def _resolve_video_path(path: str) -> Path:
+    """Resolve um vídeo dentro de VIDEO_INPUT_DIR (bloqueia path traversal)"""
+    base_dir = settings.VIDEO_INPUT_DIR.resolve()
+    video_path = (base_dir / path).resolve()
+    
+    if base_dir not in video_path.parents:
+        raise HTTPException(status_code=400, detail="Caminho de vídeo inválido")
+    if video_path.suffix.lower() not in VIDEO_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Formato de vídeo não suportado: {video_path.suffix}")
+    if not video_path.exists():
+        raise HTTPException(status_code=404, detail="Vídeo não encontrado")
+    return video_path
+
+
+async def _spool_upload(file: UploadFile, suffix: str = "", prefix: str = "javali_upload_") -> Path:
+    """
+    Grava um upload em arquivo temporário, em blocos
+    
+    Os uploads são fechados quando o handler retorna, antes do corpo em
+    streaming ser gerado: o gerador só pode ler arquivos que são nossos.
+    """
+    fd, temp_name = tempfile.mkstemp(suffix=suffix, prefix=prefix)
+    with os.fdopen(fd, "wb") as out:
+        while chunk := await file.read(VIDEO_UPLOAD_CHUNK_BYTES):
+            out.write(chunk)
+    return Path(temp_name)
+
+
+async def _spool_uploads(files: List[UploadFile], prefix: str) -> List[Path]:
+    """Grava vários uploads em arquivos temporários (remove todos em caso de erro)"""
+    paths: List[Path] = []
+    try:
+        for upload in files:
+            suffix = Path(upload.filename or "").suffix.lower()
+            paths.append(await _spool_upload(upload, suffix, prefix))
+    except BaseException:
+        _remove_files(paths)
+        raise
+    return paths
+
+
+def _remove_files(paths: List[Path]):
+    """Remove arquivos temporários (tarefa de fundo após a resposta)"""
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+@router.post("/detect/batch")
+async def detect_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    paths: Optional[List[str]] = Form(None),
+    split: Optional[str] = Form(None),
+    batch_size: int = Form(settings.DETECTION_BATCH_SIZE, ge=1, le=settings.DETECTION_BATCH_MAX_SIZE),
+    return_masks: bool = Form(False)
+):
+    """
+    Analisa muitas imagens em lote, com resultados em streaming (NDJSON)
+    
+    Fontes aceitas:
+    - `files`: várias imagens em multipart
+    - `paths`: caminhos relativos ao dataset (ex: test/images/x.jpg)
+    - `split`: todas as imagens de 'test', 'valid' ou 'train'
+    
+    Cada linha da resposta é o resultado de uma imagem, enviado assim que o
+    seu lote termina. Erros são reportados por item (campo `error`).
+    `batch_size` vai de 1 a DETECTION_BATCH_MAX_SIZE (fora disso: 422).
+    """
+    sources = []
+    for path in paths or []:
+        sources.append(_dataset_source(path))
+    if split:
+        split_dirs = {
+            "test": settings.GAME_IMAGES_DIR,
+            "valid": settings.VALID_IMAGES_DIR,
+            "train": settings.TRAIN_IMAGES_DIR,
+        }
+        images_dir = split_dirs.get(split, settings.GAME_IMAGES_DIR)
+        if not images_dir.exists():
+            raise HTTPException(status_code=404, detail=f"Diretório {split} não encontrado")
+        extensions = ['.jpg', '.jpeg', '.png', '.webp']
+        relative_dir = images_dir.relative_to(settings.AGRICULTURE_DATASET_DIR)
+        sources.extend(
+            _dataset_source(str(relative_dir / p.name))
+            for p in sorted(images_dir.iterdir())
+            if p.suffix.lower() in extensions
+        )
+    
+    files = files or []
+    if not sources and not files:
+        raise HTTPException(status_code=400, detail="Envie files, paths ou split")
+    if len(sources) + len(files) > settings.DETECTION_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Máximo de {settings.DETECTION_BATCH_MAX_ITEMS} imagens por requisição"
+        )
+    
+    # Uploads vão para arquivos temporários (lidos lote a lote pelo gerador)
+    spooled = await _spool_uploads(files, prefix="javali_batch_")
+    sources[:0] = [
+        (upload.filename or "upload", temp_path.read_bytes)
+        for upload, temp_path in zip(files, spooled)
+    ]
+    
+    records = detection_service.analyze_many(
+        sources, batch_size=batch_size, return_masks=return_masks
+    )
+    return StreamingResponse(
+        _ndjson(records), media_type="application/x-ndjson",
+        background=BackgroundTask(_remove_files, spooled) if spooled else None
+    )
+
+
+@router.post("/detect/video")
+async def detect_video(
+    file: Optional[UploadFile] = File(None),
+    frames: Optional[List[UploadFile]] = File(None),
+    path: Optional[str] = Form(None),
+    frame_skip: int = Form(settings.VIDEO_FRAME_SKIP, ge=1),
+    batch_size: int = Form(settings.VIDEO_BATCH_SIZE, ge=1, le=settings.VIDEO_BATCH_MAX_SIZE),
+    return_masks: bool = Form(False)
+):
+    """
+    Detecta e rastreia animais em vídeo, com resultados em streaming (NDJSON)
+    
+    Fontes aceitas (uma por requisição):
+    - `path`: vídeo local em VIDEO_INPUT_DIR
+    - `file`: upload de um arquivo de vídeo
+    - `frames`: upload de frames individuais (imagens) em ordem
+    
+    Cada linha da resposta é um frame processado (detecções com `track_id`);
+    a última linha é o resumo com a contagem de javalis por trilha.
+    `batch_size` vai de 1 a VIDEO_BATCH_MAX_SIZE (fora disso: 422).
+    """
+    sources = [s for s in (file, frames, path) if s]
+    if len(sources) != 1:
+        raise HTTPException(status_code=400, detail="Envie exatamente uma fonte: path, file ou frames")
+    
+    spooled: List[Path] = []
+    if path:
+        source = iter_video_frames(_resolve_video_path(path), frame_skip)
+    elif file:
+        suffix = Path(file.filename or "").suffix.lower() or ".mp4"
+        if suffix not in VIDEO_EXTENSIONS:
+            raise HTTPException(status_code=400, detail=f"Formato de vídeo não suportado: {suffix}")
+        spooled = [await _spool_upload(file, suffix, prefix="javali_video_")]
+        source = iter_video_frames(spooled[0], frame_skip)
+    else:
+        # Frames em arquivos temporários: o gerador roda depois do handler
+        spooled = await _spool_uploads(frames, prefix="javali_frame_")
+        source = iter_uploaded_frames((p.read_bytes() for p in spooled), frame_skip)
+    
+    cleanup = BackgroundTask(_remove_files, spooled) if spooled else None
+    records = video_service.analyze_stream(
+        source, batch_size=batch_size, return_masks=return_masks
+    )
+    return StreamingResponse(
+        _ndjson(records), media_type="application/x-ndjson", background=cleanup
+    )
+
+
+# ============== Rotas de Modelos ==============
+
+@router.get("/models")
+async def list_models():
+    """
+    Lista os modelos registrados
+    
+    Inclui primário, canário e métricas (latência, detecções) lado a lado
+    """
+    return model_registry.describe()
+
+
+@router.post("/models/primary", dependencies=[Depends(require_admin)])
+async def promote_model(request: ModelPromoteRequest):
+    """Promove um modelo a primário (troca atômica, sem derrubar requisições)"""
+    try:
+        await run_in_threadpool(model_registry.set_primary, request.name)
+        return model_registry.describe()
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/models/canary", dependencies=[Depends(require_admin)])
+async def configure_canary(request: ModelCanaryRequest):
+    """Define o modelo canário e a porcentagem de tráfego roteada para ele"""
+    try:
+        await run_in_threadpool(model_registry.set_canary, request.name, request.percent)
+        return model_registry.describe()
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 # ============== Rotas do Jogo ==============
 
 @router.post("/game/start", response_model=GameSession)
-async def start_game(player_name: Optional[str] = None):
-    """Inicia uma nova sessão de jogo"""
+async def start_game(player_name: Optional[str] = None, seed: Optional[int] = None):
+    """
+    Inicia uma nova sessão de jogo
+    
+    `seed` fixa a sequência de imagens sorteadas (partida reproduzível).
+    """
     try:
-        session = game_service.create_session(player_name)
+        session = await run_in_threadpool(game_service.create_session, player_name, seed)
         return session
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao iniciar jogo: {str(e)}")
@@ -183,35 +412,150 @@ async def start_game(player_name: Optional[str] = None):
 @router.get("/game/{session_id}", response_model=GameSession)
 async def get_game_session(session_id: str):
     """Obtém informações de uma sessão de jogo"""
-    session = game_service.get_session(session_id)
+    session = await run_in_threadpool(game_service.get_session, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Sessão não encontrada")
     return session
 
 
+def _start_round_payload(
+    session_id: str,
+    image_base64: str,
+    image_name: Optional[str] = None,
+    return_masks: bool = True
+) -> dict:
+    """Inicia a rodada e monta a resposta (compartilhado por REST e WebSocket)"""
+    game_round, detections = game_service.start_round(
+        session_id, image_base64, image_name, return_masks
+    )
+    # Nome já verificado contra o catálogo (None se não confere)
+    if game_round.image_name:
+        difficulty = ai_learning_service.get_image_difficulty(game_round.image_name, detections)
+    else:
+        difficulty = ai_learning_service.calculate_difficulty(detections)
+    with stage_seconds.time("game", "serialize"):
+        return {
+            "round": game_round.model_dump(),
+            "detections": [d.model_dump() for d in detections],
+            "difficulty": difficulty
+        }
+
+
+def _handle_click(session_id: str, click: ClickEvent) -> ClickResult:
+    """Processa o clique e registra para aprendizado (REST e WebSocket, no threadpool)"""
+    # Processa o clique
+    result = game_service.process_player_click(session_id, click)
+    
+    # Obtém detecções para aprendizado (colunares; só a acertada vira modelo)
+    detections = game_service.get_detection_table(session_id, click.image_id)
+    
+    # Encontra detecção acertada (se houver)
+    index = detections.hit_test(click.x, click.y)
+    hit = index >= 0
+    detection = detections.detection(index, with_segmentation=False) if hit else None
+    
+    # Tempo de reação medido no servidor (relógio do cliente não é confiável)
+    reaction_time = image_name = None
+    session = game_service.get_session(session_id)
+    if session and session.current_round:
+        image_name = session.current_round.image_name
+        if session.current_round.started_at:
+            reaction_time = (datetime.utcnow() - session.current_round.started_at).total_seconds()
+    
+    # Registra para aprendizado
+    ai_learning_service.record_human_click(
+        session_id, click, hit, detection, detections, reaction_time, image_name
+    )
+    
+    return result
+
+
+def _finish_round(session_id: str) -> GameRound:
+    """Finaliza a rodada e atualiza o aprendizado (REST e WebSocket, no threadpool)"""
+    game_round = game_service.end_round(session_id)
+    
+    # Atualiza aprendizado da IA
+    session = game_service.get_session(session_id)
+    if session and session.current_round:
+        player_score = session.current_round.player_score
+        ai_score = session.current_round.ai_score
+        
+        player_total = player_score.correct_hits + player_score.wrong_hits
+        ai_total = ai_score.correct_hits + ai_score.wrong_hits
+        
+        player_acc = (player_score.correct_hits / player_total * 100) if player_total > 0 else 0
+        ai_acc = (ai_score.correct_hits / ai_total * 100) if ai_total > 0 else 0
+        
+        ai_learning_service.update_ai_confidence(session_id, player_acc, ai_acc)
+    
+    return game_round
+
+
+async def _finish_game(session_id: str) -> GameResult:
+    """Finaliza o jogo e atualiza o placar (REST e WebSocket)"""
+    result = await run_in_threadpool(game_service.end_game, session_id)
+    await leaderboard_service.record_game(
+        result.player_name,
+        result.player_final_score,
+        result.player_accuracy,
+        result.player_best_streak
+    )
+    return result
+
+
 @router.post("/game/{session_id}/round/start")
 async def start_round(session_id: str, request: ImageAnalysisRequest):
     """
     Inicia uma nova rodada com uma imagem
     
-    Retorna as detecções para o frontend poder mostrar os alvos
+    Retorna as detecções para o frontend poder mostrar os alvos. Com
+    `return_masks=false` as detecções vêm só com caixas (resposta menor e
+    mais rápida) e os polígonos são pedidos depois em /masks/{image_id}.
     """
     try:
-        game_round, detections = game_service.start_round(
-            session_id, 
-            request.image_base64
+        return await run_in_threadpool(
+            _start_round_payload,
+            session_id, request.image_base64, request.image_name, request.return_masks
         )
-        return {
-            "round": game_round.model_dump(),
-            "detections": [d.model_dump() for d in detections],
-            "difficulty": ai_learning_service.calculate_difficulty(detections)
-        }
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao iniciar rodada: {str(e)}")
 
 
+@router.get("/game/{session_id}/masks/{image_id}")
+async def get_round_masks(
+    session_id: str,
+    image_id: str,
+    indices: Optional[List[int]] = Query(None, description="Índices das detecções (padrão: todas)")
+):
+    """
+    Polígonos de segmentação de uma rodada iniciada com `return_masks=false`
+    
+    As máscaras brutas ficam em cache no processo durante a rodada; os
+    contornos são extraídos só para as detecções pedidas.
+    """
+    detections = await run_in_threadpool(game_service.get_detection_table, session_id, image_id)
+    if indices and any(i < 0 or i >= len(detections) for i in indices):
+        raise HTTPException(status_code=400, detail="Índice de detecção inválido")
+    
+    try:
+        polygons = await run_in_threadpool(game_service.get_masks, session_id, image_id, indices)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    if polygons is None:
+        raise HTTPException(status_code=404, detail="Máscaras não disponíveis (expiradas ou em outro worker)")
+    
+    return {
+        "image_id": image_id,
+        "masks": [
+            {"index": i, "segmentation": [p.model_dump() for p in polygon]}
+            for i, polygon in sorted(polygons.items())
+        ]
+    }
+
+
 @router.post("/game/{session_id}/click", response_model=ClickResult)
 async def process_click(session_id: str, click: ClickEvent):
     """
@@ -222,23 +566,7 @@ async def process_click(session_id: str, click: ClickEvent):
     - Registra para aprendizado da IA
     """
     try:
-        # Processa o clique
-        result = game_service.process_player_click(session_id, click)
-        
-        # Obtém detecções para aprendizado
-        detections = game_service.detection_cache.get(click.image_id, [])
-        
-        # Encontra detecção acertada (se houver)
-        hit, detection = detection_service.check_click_hit(
-            click.x, click.y, detections
-        )
-        
-        # Registra para aprendizado
-        ai_learning_service.record_human_click(
-            session_id, click, hit, detection, detections
-        )
-        
-        return result
+        return await run_in_threadpool(_handle_click, session_id, click)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao processar clique: {str(e)}")
 
@@ -248,20 +576,25 @@ async def ai_turn(session_id: str, image_id: str):
     """
     Executa a vez da IA para uma imagem
     
-    A IA analisa as detecções e "clica" baseada em seu aprendizado
+    A IA analisa as detecções e "clica" baseada em seu aprendizado.
+    A resposta é imediata: `events` traz cada clique com o instante
+    (`at_ms`) em que deve ser revelado pelo cliente.
     """
     try:
-        detections = game_service.detection_cache.get(image_id, [])
+        detections = await run_in_threadpool(game_service.get_detection_table, session_id, image_id)
         
-        # Obtém recomendações baseadas no aprendizado
-        recommendations = ai_learning_service.get_ai_recommendations(detections)
+        # Pontua as detecções com o aprendizado (recomendações e cliques
+        # da IA saem da mesma pontuação)
+        scores = ai_learning_service.score_detections(detections)
         
-        # Simula cliques da IA
-        results = await game_service.simulate_ai_turn(session_id, detections)
+        # Calcula a linha do tempo de cliques da IA
+        events = await run_in_threadpool(game_service.simulate_ai_turn, session_id, detections, scores)
         
         return {
-            "results": [r.model_dump() for r in results],
-            "recommendations_used": len([r for r in recommendations if r["should_click"]])
+            "results": [e.click.model_dump() for e in events],
+            "events": [e.model_dump() for e in events],
+            "duration_ms": events[-1].at_ms if events else 0.0,
+            "recommendations_used": int(scores.should_click.sum())
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro na vez da IA: {str(e)}")
@@ -271,23 +604,7 @@ async def ai_turn(session_id: str, image_id: str):
 async def end_round(session_id: str):
     """Finaliza a rodada atual"""
     try:
-        game_round = game_service.end_round(session_id)
-        
-        # Atualiza aprendizado da IA
-        session = game_service.get_session(session_id)
-        if session and session.current_round:
-            player_score = session.current_round.player_score
-            ai_score = session.current_round.ai_score
-            
-            player_total = player_score.correct_hits + player_score.wrong_hits
-            ai_total = ai_score.correct_hits + ai_score.wrong_hits
-            
-            player_acc = (player_score.correct_hits / player_total * 100) if player_total > 0 else 0
-            ai_acc = (ai_score.correct_hits / ai_total * 100) if ai_total > 0 else 0
-            
-            ai_learning_service.update_ai_confidence(session_id, player_acc, ai_acc)
-        
-        return game_round
+        return await run_in_threadpool(_finish_round, session_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -298,14 +615,190 @@ async def end_round(session_id: str):
 async def end_game(session_id: str):
     """Finaliza o jogo e retorna resultado"""
     try:
-        result = game_service.end_game(session_id)
-        return result
+        return await _finish_game(session_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao finalizar jogo: {str(e)}")
 
 
+# ============== Canal WebSocket do Jogo ==============
+
+# Clique binário: seq (uint32), x, y (float32), timestamp (float64) - 20 bytes
+_BINARY_CLICK = struct.Struct("<Iffd")
+
+
+def _parse_ws_message(message: dict) -> dict:
+    """Converte um frame do WebSocket (texto JSON ou clique binário) em dict"""
+    if message.get("bytes") is not None:
+        data = message["bytes"]
+        if len(data) != _BINARY_CLICK.size:
+            raise ValueError(f"Clique binário deve ter {_BINARY_CLICK.size} bytes")
+        seq, x, y, timestamp = _BINARY_CLICK.unpack(data)
+        return {"type": "click", "seq": seq, "x": x, "y": y, "timestamp": timestamp}
+    
+    payload = json.loads(message.get("text") or "{}")
+    if not isinstance(payload, dict):
+        raise ValueError("Mensagem deve ser um objeto JSON")
+    return payload
+
+
+async def _ws_rate_limit(websocket: WebSocket, session_id: str, rule_name: str):
+    """Mesmo token bucket das rotas REST (mensagens do canal não passam pelo middleware)"""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    args = (rate_limiter.rules[rule_name], session_id, client_ip(websocket.scope))
+    if rate_limiter.blocking:
+        await run_in_threadpool(rate_limiter.check, *args)
+    else:
+        rate_limiter.check(*args)
+
+
+@router.websocket("/game/{session_id}/ws")
+async def game_channel(websocket: WebSocket, session_id: str):
+    """
+    Canal persistente do jogo (substitui as chamadas REST por ação)
+    
+    Mensagens do cliente (JSON, campo `type`; `seq` opcional é ecoado):
+    - `round_start` {image_base64, image_name?, return_masks?, auto_ai?}: inicia rodada
+    - `click` {x, y, timestamp, image_id?}: clique do jogador
+      (também aceito como frame binário `<Iffd`: seq, x, y, timestamp)
+    - `ai_turn`: calcula a vez da IA (`ai_turn_planned` traz a linha do tempo)
+      e envia cada clique (`ai_click`) no seu instante
+    - `round_end`, `game_end`, `ping`
+    
+    Mensagens do servidor: `round_started`, `click_result`, `ai_turn_planned`,
+    `ai_click`, `ai_turn_done`, `round_ended`, `game_ended`, `pong` e `error`.
+    """
+    await websocket.accept()
+    
+    # O session store pode ser SQLite: leituras e escritas rodam no threadpool
+    if not await run_in_threadpool(game_service.get_session, session_id):
+        await websocket.send_json({"type": "error", "detail": "Sessão não encontrada"})
+        await websocket.close(code=4404)
+        return
+    
+    send_lock = asyncio.Lock()
+    ai_task: Optional[asyncio.Task] = None
+    ws_connections.inc()
+    
+    async def send(message: dict):
+        async with send_lock:
+            await websocket.send_json(message)
+    
+    async def load_current_round():
+        session = await run_in_threadpool(game_service.get_session, session_id)
+        return session.current_round if session else None
+    
+    async def run_ai_turn(image_id: str, seq=None):
+        detections = await run_in_threadpool(game_service.get_detection_table, session_id, image_id)
+        events = await run_in_threadpool(game_service.simulate_ai_turn, session_id, detections)
+        await send({
+            "type": "ai_turn_planned",
+            "seq": seq,
+            "events": [e.model_dump(mode="json") for e in events]
+        })
+        
+        # Envia cada clique no seu instante (só este canal espera, não o servidor)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for event in events:
+            delay = started + event.at_ms / 1000 - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await send({"type": "ai_click", "at_ms": event.at_ms, **event.click.model_dump(mode="json")})
+        await send({"type": "ai_turn_done", "clicks": len(events)})
+    
+    def cancel_ai_turn():
+        if ai_task is not None and not ai_task.done():
+            ai_task.cancel()
+    
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            
+            seq = None
+            try:
+                payload = _parse_ws_message(message)
+                seq = payload.get("seq")
+                kind = payload.get("type")
+                
+                if kind == "click":
+                    await _ws_rate_limit(websocket, session_id, "click")
+                    image_id = payload.get("image_id")
+                    if not image_id:
+                        current_round = await load_current_round()
+                        image_id = current_round.image_id if current_round else ""
+                    click = ClickEvent(
+                        x=payload["x"],
+                        y=payload["y"],
+                        timestamp=payload.get("timestamp", 0.0),
+                        image_id=image_id,
+                        game_session_id=session_id
+                    )
+                    result = await run_in_threadpool(_handle_click, session_id, click)
+                    await send({"type": "click_result", "seq": seq, **result.model_dump(mode="json")})
+                
+                elif kind == "round_start":
+                    await _ws_rate_limit(websocket, session_id, "round_start")
+                    cancel_ai_turn()
+                    # Mesmo limite das rotas de inferência REST (o canal não passa pelo middleware)
+                    gate = admission.gate_for(f"/api/v1/game/{session_id}/round/start")
+                    async with (gate.admit() if gate else nullcontext()):
+                        data = await run_in_threadpool(
+                            _start_round_payload,
+                            session_id, payload["image_base64"], payload.get("image_name"),
+                            payload.get("return_masks", True)
+                        )
+                    await send({"type": "round_started", "seq": seq, **jsonable_encoder(data)})
+                    if payload.get("auto_ai"):
+                        ai_task = asyncio.create_task(run_ai_turn(data["round"]["image_id"]))
+                
+                elif kind == "ai_turn":
+                    current_round = await load_current_round()
+                    if not current_round:
+                        raise ValueError("Nenhuma rodada ativa")
+                    cancel_ai_turn()
+                    ai_task = asyncio.create_task(run_ai_turn(current_round.image_id, seq))
+                
+                elif kind == "round_end":
+                    cancel_ai_turn()
+                    game_round = await run_in_threadpool(_finish_round, session_id)
+                    await send({"type": "round_ended", "seq": seq, "round": game_round.model_dump(mode="json")})
+                
+                elif kind == "game_end":
+                    cancel_ai_turn()
+                    result = await _finish_game(session_id)
+                    await send({"type": "game_ended", "seq": seq, "result": result.model_dump(mode="json")})
+                    await websocket.close()
+                    break
+                
+                elif kind == "ping":
+                    await send({"type": "pong", "seq": seq})
+                
+                else:
+                    raise ValueError(f"Tipo de mensagem desconhecido: {kind}")
+            
+            except WebSocketDisconnect:
+                raise
+            except AdmissionRejected as e:
+                admission.reject(gate, e)
+                await send({"type": "error", "seq": seq, "detail": "Servidor ocupado", "retry_after": e.retry_after})
+            except RateLimitExceeded as e:
+                await send({"type": "error", "seq": seq, "detail": "Muitas mensagens", "retry_after": e.retry_after})
+            except (ValueError, KeyError, ValidationError) as e:
+                await send({"type": "error", "seq": seq, "detail": str(e)})
+            except Exception as e:
+                await send({"type": "error", "seq": seq, "detail": f"Erro no canal do jogo: {str(e)}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        cancel_ai_turn()
+        ws_connections.dec()
+
+
 # ============== Rotas de Aprendizado ==============
 
 @router.get("/learning/summary")
@@ -324,21 +817,21 @@ async def reset_learning():
 # ============== Rotas de Leaderboard ==============
 
 @router.get("/leaderboard", response_model=List[LeaderboardEntry])
-async def get_leaderboard(limit: int = 10):
-    """Retorna o placar de líderes"""
-    # Por enquanto retorna dados de exemplo
-    # Em produção, buscar do banco de dados
-    return [
-        LeaderboardEntry(
-            rank=i+1,
-            player_name=f"Jogador{i+1}",
-            score=1000 - i*100,
-            accuracy=95 - i*5,
-            games_played=10 - i,
-            best_streak=5 - i//2
-        )
-        for i in range(min(limit, 10))
-    ]
+async def get_leaderboard(limit: int = 10, offset: int = 0, period: str = "all"):
+    """
+    Retorna o placar de líderes
+    
+    Args:
+        limit: entradas por página (máx. 100)
+        offset: posição inicial (paginação)
+        period: 'all' (geral), 'daily' (hoje) ou 'weekly' (semana atual)
+    """
+    if not 1 <= limit <= 100 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit deve estar entre 1 e 100 e offset >= 0")
+    try:
+        return await leaderboard_service.get_page(period, offset, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 # ============== Rotas de Health Check ==============
@@ -346,15 +839,60 @@ async def get_leaderboard(limit: int = 10):
 @router.get("/health")
 async def health_check():
     """Verifica saúde do serviço"""
+    active_sessions = await run_in_threadpool(game_service.active_session_count)
     return {
         "status": "healthy",
-        "model_loaded": detection_service.model is not None,
+        "model_loaded": detection_service.segmentation_model is not None,
+        "model_primary": model_registry.primary_name,
+        "model_canary": model_registry.canary_name,
         "segmentation_enabled": detection_service.use_segmentation,
-        "active_sessions": len(game_service.active_sessions),
+        "active_sessions": active_sessions,
+        "storage": storage_service.stats(),
+        "admission": admission.describe(),
         "images_available": len(game_service.sample_images)
     }
 
 
+# ============== Rotas de Administração ==============
+
+@router.get("/admin/profiler", dependencies=[Depends(require_admin)])
+async def profiler_status():
+    """Estado do profiler e perfis já gravados"""
+    return {**profiler.status(), "profiles": profiler.list_profiles()}
+
+
+@router.post("/admin/profiler/start", dependencies=[Depends(require_admin)])
+async def start_profiler(request: ProfilerStartRequest):
+    """
+    Liga a amostragem de pilhas por uma janela limitada
+    
+    Amostra 1 a cada `sample_one_in` requisições das rotas pedidas; ao fim da
+    janela (ou em /stop) grava as pilhas em formato collapsed (flamegraph).
+    """
+    try:
+        return profiler.start(
+            request.duration_seconds, request.interval_ms,
+            request.sample_one_in, request.route_prefixes
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/admin/profiler/stop", dependencies=[Depends(require_admin)])
+async def stop_profiler():
+    """Encerra a janela atual e retorna o perfil gravado"""
+    return {"profile": await run_in_threadpool(profiler.stop)}
+
+
+@router.get("/admin/profiler/profiles/{filename}", dependencies=[Depends(require_admin)])
+async def download_profile(filename: str):
+    """Baixa um perfil (pilhas collapsed)"""
+    path = settings.PROFILES_DIR / filename
+    if Path(filename).name != filename or path.suffix != ".collapsed" or not path.exists():
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return FileResponse(path, media_type="text/plain")
+
+
 # ============== Rotas de Imagens (Dataset Agriculture) ==============
 
 @router.get("/images/stats")
@@ -414,7 +952,13 @@ async def list_game_images(split: str = "test", limit: int = 50):
 
 
 @router.get("/images/random")
-async def get_random_image(split: str = "test", use_bias: bool = True):
+async def get_random_image(
+    split: str = "test",
+    use_bias: bool = True,
+    min_difficulty: float = 0.0,
+    max_difficulty: float = 1.0,
+    session_id: Optional[str] = None
+):
     """
     Retorna uma imagem aleatória do dataset Agriculture
     
@@ -422,43 +966,36 @@ async def get_random_image(split: str = "test", use_bias: bool = True):
         split: 'test', 'valid' ou 'train'
         use_bias: Se True, usa viés para mostrar mais imagens com javali
                   (padrão: True, ~70% javalis)
+        min_difficulty, max_difficulty: Faixa de dificuldade (0-1) das imagens
+        session_id: Se informado, não repete imagens já jogadas na sessão e
+                    usa a semente da sessão (sequência reproduzível)
     """
+    if not 0.0 <= min_difficulty <= max_difficulty <= 1.0:
+        raise HTTPException(status_code=400, detail="Faixa de dificuldade inválida (0 <= min <= max <= 1)")
+    
+    options = {
+        "use_bias": use_bias,
+        "min_difficulty": min_difficulty,
+        "max_difficulty": max_difficulty,
+    }
     try:
-        if use_bias:
-            # Usa seleção com viés para javalis
-            image_path = _select_random_image_with_bias(split)
+        if session_id:
+            entry = await run_in_threadpool(game_service.draw_image, session_id, split, **options)
         else:
-            # Seleção puramente aleatória
-            split_dirs = {
-                "test": settings.GAME_IMAGES_DIR,
-                "valid": settings.VALID_IMAGES_DIR,
-                "train": settings.TRAIN_IMAGES_DIR,
-            }
-            
-            images_dir = split_dirs.get(split, settings.GAME_IMAGES_DIR)
-            
-            if not images_dir.exists():
-                raise HTTPException(status_code=404, detail=f"Diretório {split} não encontrado")
-            
-            extensions = ['.jpg', '.jpeg', '.png', '.webp']
-            images = [p for p in images_dir.iterdir() if p.suffix.lower() in extensions]
-            
-            if not images:
-                raise HTTPException(status_code=404, detail="Nenhuma imagem encontrada")
-            
-            image_path = random.choice(images)
+            entry = image_sampler.draw(split, **options)
         
         # Lê e converte para base64
-        with open(image_path, 'rb') as f:
+        with open(entry.path, 'rb') as f:
             image_base64 = base64.b64encode(f.read()).decode()
         
         return {
-            "filename": image_path.name,
+            "filename": entry.name,
             "split": split,
+            "difficulty": image_sampler.difficulty(entry),
             "image_base64": image_base64
         }
-    except HTTPException:
-        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao obter imagem: {str(e)}")
 
@@ -498,7 +1035,9 @@ async def get_random_analyzed_image(split: str = "test"):
     image_data = await get_random_image(split)
     
     # Analisa com o modelo
-    analysis = detection_service.analyze_image(image_data["image_base64"], return_masks=True)
+    analysis = await run_in_threadpool(
+        detection_service.analyze_image, image_data["image_base64"], return_masks=True
+    )
     
     return {
         "filename": image_data["filename"],
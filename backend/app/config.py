@@ -45,10 +45,58 @@ class Settings(BaseSettings):
     TRAIN_IMAGES_DIR: Path = AGRICULTURE_DATASET_DIR / "train" / "images"
     VALID_IMAGES_DIR: Path = AGRICULTURE_DATASET_DIR / "valid" / "images"
     
+    # Vídeos de câmeras de trilha acessíveis pelo servidor
+    VIDEO_INPUT_DIR: Path = BASE_DIR / "ml" / "data" / "videos"
+    
     # ===========================================
     # Banco de Dados
     # ===========================================
     DATABASE_URL: str = "sqlite+aiosqlite:///./javali_hunter.db"
+    STORAGE_ENABLED: bool = True
+    STORAGE_BATCH_SIZE: int = constants.STORAGE_BATCH_SIZE
+    STORAGE_FLUSH_INTERVAL_SECONDS: float = constants.STORAGE_FLUSH_INTERVAL_SECONDS
+    STORAGE_QUEUE_MAX: int = constants.STORAGE_QUEUE_MAX
+    LEADERBOARD_CACHE_SIZE: int = constants.LEADERBOARD_CACHE_SIZE
+    LEADERBOARD_CACHE_TTL_SECONDS: float = constants.LEADERBOARD_CACHE_TTL_SECONDS
+    
+    # Estado das sessões: "sqlite" permite rodar o uvicorn com --workers N
+    SESSION_STORE_BACKEND: str = constants.SESSION_STORE_BACKEND
+    SESSION_STORE_PATH: Path = BACKEND_DIR / "sessions.db"
+    SESSION_STORE_MAX_RETRIES: int = constants.SESSION_STORE_MAX_RETRIES
+    SESSION_LOCK_STRIPES: int = constants.SESSION_LOCK_STRIPES
+    
+    # Observabilidade: middleware de tempos e /metrics
+    METRICS_ENABLED: bool = True
+    PROFILES_DIR: Path = BACKEND_DIR / "profiles"
+    
+    # Controle de admissão (limites por processo/worker)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_INFERENCE_MAX_IN_FLIGHT: int = constants.ADMISSION_INFERENCE_MAX_IN_FLIGHT
+    ADMISSION_INFERENCE_MAX_QUEUE: int = constants.ADMISSION_INFERENCE_MAX_QUEUE
+    ADMISSION_INFERENCE_DEADLINE_SECONDS: float = constants.ADMISSION_INFERENCE_DEADLINE_SECONDS
+    ADMISSION_STREAM_MAX_IN_FLIGHT: int = constants.ADMISSION_STREAM_MAX_IN_FLIGHT
+    ADMISSION_STREAM_MAX_QUEUE: int = constants.ADMISSION_STREAM_MAX_QUEUE
+    ADMISSION_STREAM_DEADLINE_SECONDS: float = constants.ADMISSION_STREAM_DEADLINE_SECONDS
+    ADMISSION_GAME_MAX_IN_FLIGHT: int = constants.ADMISSION_GAME_MAX_IN_FLIGHT
+    ADMISSION_GAME_MAX_QUEUE: int = constants.ADMISSION_GAME_MAX_QUEUE
+    ADMISSION_GAME_DEADLINE_SECONDS: float = constants.ADMISSION_GAME_DEADLINE_SECONDS
+    
+    # Limite de taxa por sessão/IP ("sqlite" compartilha os baldes entre workers)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = constants.RATE_LIMIT_BACKEND
+    RATE_LIMIT_PATH: Path = BACKEND_DIR / "rate_limit.db"
+    RATE_LIMIT_SQLITE_TIMEOUT_SECONDS: float = constants.RATE_LIMIT_SQLITE_TIMEOUT_SECONDS
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # Usa X-Forwarded-For (só atrás de proxy confiável)
+    RATE_LIMIT_CLICK_PER_SECOND: float = constants.RATE_LIMIT_CLICK_PER_SECOND
+    RATE_LIMIT_CLICK_BURST: float = constants.RATE_LIMIT_CLICK_BURST
+    RATE_LIMIT_CLICK_IP_PER_SECOND: float = constants.RATE_LIMIT_CLICK_IP_PER_SECOND
+    RATE_LIMIT_CLICK_IP_BURST: float = constants.RATE_LIMIT_CLICK_IP_BURST
+    RATE_LIMIT_ROUND_START_PER_SECOND: float = constants.RATE_LIMIT_ROUND_START_PER_SECOND
+    RATE_LIMIT_ROUND_START_BURST: float = constants.RATE_LIMIT_ROUND_START_BURST
+    RATE_LIMIT_ROUND_START_IP_PER_SECOND: float = constants.RATE_LIMIT_ROUND_START_IP_PER_SECOND
+    RATE_LIMIT_ROUND_START_IP_BURST: float = constants.RATE_LIMIT_ROUND_START_IP_BURST
+    RATE_LIMIT_DETECT_IP_PER_SECOND: float = constants.RATE_LIMIT_DETECT_IP_PER_SECOND
+    RATE_LIMIT_DETECT_IP_BURST: float = constants.RATE_LIMIT_DETECT_IP_BURST
     
     # ===========================================
     # Configurações do Jogo (do constants.py)
@@ -65,9 +113,40 @@ class Settings(BaseSettings):
     # IA
     AI_BASE_CONFIDENCE: float = constants.AI_BASE_CONFIDENCE
     AI_LEARNING_RATE: float = constants.AI_LEARNING_RATE
+    AI_LEARNING_SNAPSHOT_SECONDS: float = constants.AI_LEARNING_SNAPSHOT_SECONDS
+    AI_COUNTER_SHARDS: int = constants.AI_COUNTER_SHARDS
+    AI_CLICK_HISTORY_MAX_IMAGES: int = constants.AI_CLICK_HISTORY_MAX_IMAGES
+    AI_CLICK_HEATMAP_GRID: int = constants.AI_CLICK_HEATMAP_GRID
+    AI_CLICK_RECENT_EVENTS: int = constants.AI_CLICK_RECENT_EVENTS
+    
+    # Amostrador de imagens
+    SAMPLER_CLASS_MIX_BONUS: float = constants.SAMPLER_CLASS_MIX_BONUS
+    SAMPLER_TABLE_TTL_SECONDS: float = constants.SAMPLER_TABLE_TTL_SECONDS
     
     # Modelo ML
     MODEL_CONFIDENCE_THRESHOLD: float = constants.MODEL_CONFIDENCE_THRESHOLD
+    DETECTION_BATCH_SIZE: int = constants.DETECTION_BATCH_SIZE
+    DETECTION_BATCH_MAX_ITEMS: int = constants.DETECTION_BATCH_MAX_ITEMS
+    DETECTION_BATCH_MAX_SIZE: int = constants.DETECTION_BATCH_MAX_SIZE
+    MASK_CACHE_MAX_IMAGES: int = constants.MASK_CACHE_MAX_IMAGES
+    MASK_CACHE_PIN_SECONDS: float = constants.MASK_CACHE_PIN_SECONDS
+    ANALYSIS_CACHE_MAX_IMAGES: int = constants.ANALYSIS_CACHE_MAX_IMAGES
+    MODEL_FILENAME: str = constants.MODEL_FILENAME
+    MODEL_CANARY_FILENAME: Optional[str] = None
+    MODEL_CANARY_PERCENT: float = constants.MODEL_CANARY_PERCENT
+    MODEL_RELOAD_INTERVAL_SECONDS: float = constants.MODEL_RELOAD_INTERVAL_SECONDS
+    MODEL_STUB: bool = False  # Detecções sintéticas, sem pesos (testes de carga)
+    MODEL_STUB_LATENCY_MS: float = constants.MODEL_STUB_LATENCY_MS
+    
+    # Vídeo e rastreamento
+    VIDEO_FRAME_SKIP: int = constants.VIDEO_FRAME_SKIP
+    VIDEO_BATCH_SIZE: int = constants.VIDEO_BATCH_SIZE
+    VIDEO_BATCH_MAX_SIZE: int = constants.VIDEO_BATCH_MAX_SIZE
+    VIDEO_QUEUE_SIZE: int = constants.VIDEO_QUEUE_SIZE
+    TRACK_IOU_THRESHOLD: float = constants.TRACK_IOU_THRESHOLD
+    TRACK_MAX_CENTROID_DISTANCE: float = constants.TRACK_MAX_CENTROID_DISTANCE
+    TRACK_MAX_MISSED: int = constants.TRACK_MAX_MISSED
+    TRACK_MIN_HITS: int = constants.TRACK_MIN_HITS
     
     # ===========================================
     # API Keys (SENSÍVEIS - do .env)
@@ -78,6 +157,7 @@ class Settings(BaseSettings):
     # Segurança (SENSÍVEIS - do .env)
     # ===========================================
     SECRET_KEY: str = "change-this-in-production-use-random-key"
+    ADMIN_TOKEN: Optional[str] = None  # Header X-Admin-Token das rotas /admin (None desativa)
     CORS_ORIGINS: str = "http://localhost:3000,http://127.0.0.1:3000"
     
     # ===========================================
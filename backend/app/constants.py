@@ -44,6 +44,19 @@ AI_BASE_CONFIDENCE = 0.7    # Confiança base da IA (0.0 - 1.0)
 AI_LEARNING_RATE = 0.05     # Taxa de aprendizado da IA
 AI_REACTION_TIME_BASE = 1.5  # Tempo base de reação da IA em segundos
 AI_REACTION_TIME_VARIANCE = 0.5  # Variância no tempo de reação
+AI_LEARNING_SNAPSHOT_SECONDS = 10.0  # Intervalo entre gravações/recargas do aprendizado
+AI_COUNTER_SHARDS = 16               # Shards dos contadores (threads escrevem sem trava global)
+
+# Histórico de cliques agregado (memória constante)
+AI_CLICK_HISTORY_MAX_IMAGES = 1000   # Imagens com agregados em memória (LRU)
+AI_CLICK_HEATMAP_GRID = 32           # Resolução do mapa de calor de cliques (grade N x N)
+AI_CLICK_RECENT_EVENTS = 1000        # Cliques brutos recentes mantidos (0 = desativado)
+AI_REACTION_TIME_BINS = (0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0)  # Limites (s) do histograma
+
+# Dificuldade por imagem (estática + desempenho observado dos jogadores)
+DIFFICULTY_PRIOR_CLICKS = 20         # Cliques até o desempenho observado pesar 50%
+DIFFICULTY_LABEL_CONFIDENCE = 0.75   # Confiança assumida ao estimar dificuldade pelos labels
+DIFFICULTY_MAX_IMAGES = 50000        # Imagens com dificuldade em memória (descarta a mais antiga)
 
 # ===========================================
 # Configurações do Modelo ML
@@ -51,6 +64,41 @@ AI_REACTION_TIME_VARIANCE = 0.5  # Variância no tempo de reação
 MODEL_CONFIDENCE_THRESHOLD = 0.5  # Threshold mínimo de confiança para detecção
 SEGMENTATION_ENABLED = True       # Habilitar segmentação de instância
 
+DETECTION_BATCH_SIZE = 8          # Imagens por chamada ao modelo em /detect/batch
+DETECTION_BATCH_MAX_ITEMS = 10000 # Máximo de imagens por requisição em lote
+DETECTION_BATCH_MAX_SIZE = 64     # Máximo de batch_size aceito em /detect/batch
+MASK_CACHE_MAX_IMAGES = 64        # Imagens com máscaras brutas em memória (máscaras sob demanda)
+MASK_CACHE_PIN_SECONDS = 300      # Validade da trava das máscaras de uma rodada não finalizada
+ANALYSIS_CACHE_MAX_IMAGES = 256   # Análises recentes por conteúdo (imagens repetidas não reprocessam)
+
+# Registro de modelos (versões/formatos e hot reload)
+MODEL_FILENAME = "javali_seg.pt"          # Modelo primário padrão
+MODEL_FILE_PATTERNS = ["javali_seg*"]     # Arquivos descobertos em ML_MODELS_DIR
+MODEL_FORMATS = {                         # Extensão -> formato
+    ".pt": "pt",
+    ".onnx": "onnx",
+    ".engine": "tensorrt",
+    ".torchscript": "torchscript",
+}
+MODEL_QUANTIZED_TAGS = ("int8", "quant")  # Marcadores de modelo quantizado no nome
+MODEL_RELOAD_INTERVAL_SECONDS = 10.0      # Intervalo de verificação de novos arquivos (0 desativa)
+MODEL_CANARY_PERCENT = 0.0                # % do tráfego roteado para o canário
+MODEL_STUB_LATENCY_MS = 0.0               # Latência simulada por imagem do modelo stub (testes de carga)
+
+# ===========================================
+# Detecção em Vídeo e Rastreamento
+# ===========================================
+VIDEO_FRAME_SKIP = 5              # Processa 1 a cada N frames
+VIDEO_BATCH_SIZE = 8              # Frames por chamada ao modelo
+VIDEO_BATCH_MAX_SIZE = 64         # Máximo de batch_size aceito em /detect/video
+VIDEO_QUEUE_SIZE = 32             # Frames decodificados aguardando inferência
+VIDEO_UPLOAD_CHUNK_BYTES = 1024 * 1024  # Tamanho dos blocos ao gravar upload em disco
+VIDEO_EXTENSIONS = [".mp4", ".avi", ".mov", ".mkv", ".webm"]
+TRACK_IOU_THRESHOLD = 0.3         # IoU mínimo para associar detecção a uma trilha
+TRACK_MAX_CENTROID_DISTANCE = 0.1 # Distância normalizada máxima (fallback por centróide)
+TRACK_MAX_MISSED = 3              # Frames processados sem associação antes de encerrar a trilha
+TRACK_MIN_HITS = 2                # Frames necessários para confirmar uma trilha
+
 # Classes do modelo Agriculture (HTW)
 # Mapeamento: índice do modelo -> nome da classe
 MODEL_CLASSES = {
@@ -82,6 +130,65 @@ DATASET_IMAGES = {
     "total": 1443,
 }
 
+# ===========================================
+# Persistência (fila write-behind)
+# ===========================================
+STORAGE_BATCH_SIZE = 500              # Linhas por insert em lote
+STORAGE_FLUSH_INTERVAL_SECONDS = 1.0  # Espera máxima antes de gravar um lote parcial
+STORAGE_QUEUE_MAX = 100000            # Linhas pendentes antes de começar a descartar
+
+# Placar de líderes
+LEADERBOARD_CACHE_SIZE = 100          # Entradas mantidas em memória por placar (top-N)
+LEADERBOARD_CACHE_TTL_SECONDS = 30.0  # Recarrega o top-N (gravações de outros workers)
+
+# Estado das sessões de jogo (compartilhado entre workers)
+SESSION_STORE_BACKEND = "memory"      # "memory" (um worker) ou "sqlite" (vários workers)
+SESSION_STORE_MAX_RETRIES = 5         # Tentativas em conflito de versão antes de falhar
+SESSION_LOCK_STRIPES = 64             # Travas por processo para atualizações de sessões
+
+# ===========================================
+# Observabilidade (/metrics)
+# ===========================================
+METRICS_PREFIX = "javali_"            # Prefixo dos nomes das métricas
+METRICS_LATENCY_BUCKETS = (           # Limites (s) dos histogramas de latência
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+METRICS_SIZE_BUCKETS = (              # Limites (bytes) dos histogramas de payload
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216
+)
+
+# Profiler por amostragem (rotas /admin/profiler)
+PROFILER_INTERVAL_MS = 5.0            # Intervalo padrão entre amostras de pilhas
+PROFILER_MAX_SECONDS = 300.0          # Duração máxima de uma janela de amostragem
+PROFILER_ROUTE_PREFIXES = (           # Rotas amostradas por padrão (detecção e jogo)
+    "/api/v1/detect", "/api/v1/game", "/api/v1/images/random/analyzed"
+)
+
+# Controle de admissão por classe de rota (503 + Retry-After em sobrecarga)
+ADMISSION_INFERENCE_MAX_IN_FLIGHT = 4       # /detect, /detect/upload, round/start...
+ADMISSION_INFERENCE_MAX_QUEUE = 16          # Espera além disso é recusada na hora
+ADMISSION_INFERENCE_DEADLINE_SECONDS = 5.0  # Tempo máximo na fila antes de descartar
+ADMISSION_STREAM_MAX_IN_FLIGHT = 2          # /detect/batch e /detect/video
+ADMISSION_STREAM_MAX_QUEUE = 4
+ADMISSION_STREAM_DEADLINE_SECONDS = 10.0
+ADMISSION_GAME_MAX_IN_FLIGHT = 64           # Demais rotas do jogo (cliques, fim de rodada...)
+ADMISSION_GAME_MAX_QUEUE = 256
+ADMISSION_GAME_DEADLINE_SECONDS = 2.0
+
+# Limite de taxa por cliente (token bucket: fichas/s e rajada; 0 desativa)
+RATE_LIMIT_BACKEND = "memory"               # "memory" (um worker) ou "sqlite" (vários workers)
+RATE_LIMIT_SQLITE_TIMEOUT_SECONDS = 0.05    # Espera máxima pela trava do SQLite (depois libera)
+RATE_LIMIT_CLICK_PER_SECOND = 10.0          # Cliques por sessão
+RATE_LIMIT_CLICK_BURST = 20
+RATE_LIMIT_CLICK_IP_PER_SECOND = 50.0       # Cliques por IP (várias sessões atrás de um NAT)
+RATE_LIMIT_CLICK_IP_BURST = 100
+RATE_LIMIT_ROUND_START_PER_SECOND = 1.0     # Rodadas iniciadas por sessão
+RATE_LIMIT_ROUND_START_BURST = 3
+RATE_LIMIT_ROUND_START_IP_PER_SECOND = 5.0
+RATE_LIMIT_ROUND_START_IP_BURST = 10
+RATE_LIMIT_DETECT_IP_PER_SECOND = 2.0       # /detect*, /images/random/analyzed por IP
+RATE_LIMIT_DETECT_IP_BURST = 5
+
 # ===========================================
 # Configurações de UI/UX
 # ===========================================
@@ -100,3 +207,9 @@ BOAR_IMAGE_PROBABILITY = 0.70  # 70% de chance de mostrar imagem com javali
 
 # Classes que indicam "javali" nos labels YOLO (índices 0 e 1)
 BOAR_CLASS_INDICES = {0, 1}  # boar, wild-boar
+
+# Amostrador de imagens (tabelas de alias)
+SAMPLER_CLASS_MIX_BONUS = 0.5        # Peso extra para imagens com javali + distratores
+SAMPLER_TABLE_TTL_SECONDS = 60.0     # Recria as tabelas (dificuldade observada muda)
+SAMPLER_TABLE_CACHE_SIZE = 32        # Tabelas (split, viés, faixa) mantidas em cache
+SAMPLER_MAX_REJECTIONS = 32          # Sorteios rejeitados (já vistos) antes do fallback
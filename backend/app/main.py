@@ -4,12 +4,24 @@ Aplicação Principal FastAPI
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 import uvicorn
 
 from .config import settings
 from .api.routes import router
+from .api.middleware import (
+    AdmissionMiddleware, MetricsMiddleware, ProfilerMiddleware, RateLimitMiddleware
+)
+from .services.model_registry import model_registry
+from .services.storage_service import storage_service
+from .services.leaderboard_service import leaderboard_service
+from .services.ai_learning_service import ai_learning_service
+from .services.image_sampler import image_sampler
+from .services.game_service import game_service
+from .services.metrics_service import metrics
+from .services.profiler_service import profiler
 
 
 @asynccontextmanager
@@ -29,9 +41,26 @@ async def lifespan(app: FastAPI):
     else:
         print(f"⚠️ Dataset não encontrado: {settings.GAME_IMAGES_DIR}")
     
+    # Catálogo de imagens do amostrador (labels lidos uma vez)
+    image_sampler.warm()
+    
+    # Hot reload de modelos (novos arquivos em ML_MODELS_DIR)
+    model_registry.start_watcher()
+    
+    # Banco de dados: engine, pool e fila de escrita em lote
+    await storage_service.start()
+    await leaderboard_service.warm()
+    
+    # Aprendizado da IA compartilhado entre reinícios e workers
+    await ai_learning_service.start()
+    
     yield
     
     # Shutdown
+    model_registry.stop_watcher()
+    profiler.stop()
+    await ai_learning_service.stop()
+    await storage_service.stop()
     print("👋 Encerrando servidor...")
 
 
@@ -73,6 +102,13 @@ if not cors_origins:
         "http://localhost:3001",
     ]
 
+# Backpressure por classe de rota (dentro do CORS: o 503 leva os headers CORS)
+app.add_middleware(AdmissionMiddleware)
+
+# Token bucket por sessão/IP (fora da admissão: recusado não ocupa fila)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,
@@ -81,9 +117,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Seleção de requisições para o profiler (só atua com /admin/profiler ligado)
+app.add_middleware(ProfilerMiddleware)
+
+# Latência por rota, requisições em andamento e payloads (exposto em /metrics)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Registra rotas
 app.include_router(router, prefix="/api/v1", tags=["API"])
 
+# Gauges calculados na coleta
+metrics.callback_gauge("active_sessions", "Sessões de jogo ativas", game_service.active_session_count)
+metrics.callback_gauge(
+    "storage_queue_rows", "Linhas aguardando gravação no banco",
+    lambda: storage_service.stats()["queued"]
+)
+metrics.callback_gauge(
+    "storage_rows_dropped", "Linhas descartadas com a fila cheia",
+    lambda: storage_service.stats()["rows_dropped"]
+)
+
 
 @app.get("/")
 async def root():
@@ -96,6 +150,12 @@ async def root():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Métricas do processo no formato de texto do Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
@@ -1,7 +1,7 @@
 """
 Modelos do banco de dados SQLAlchemy
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, JSON, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -107,16 +107,38 @@ class AILearningDB(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class AILearningStatsDB(Base):
+    """Agregados do aprendizado da IA (contadores somados entre workers)"""
+    __tablename__ = "ai_learning_stats"
+    
+    # Ex: "global.human_correct", "class.boar.hit_count", "adjust.boar"
+    key = Column(String, primary_key=True)
+    value = Column(Float, default=0.0)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
 class LeaderboardDB(Base):
-    """Tabela de placar de líderes"""
+    """
+    Tabela de placar de líderes
+    
+    Uma linha por jogador e por placar (`board`): "all" (geral),
+    "daily:AAAA-MM-DD" e "weekly:AAAA-Www". Os índices atendem a leitura
+    ordenada por pontuação e o upsert por (board, player_name).
+    """
     __tablename__ = "leaderboard"
+    __table_args__ = (
+        UniqueConstraint("board", "player_name", name="uq_leaderboard_board_player"),
+        Index("ix_leaderboard_board_score", "board", "score", "player_name"),
+        Index("ix_leaderboard_player_name", "player_name"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    player_name = Column(String)
+    board = Column(String, nullable=False, default="all")
+    player_name = Column(String, nullable=False)
     score = Column(Integer)
     accuracy = Column(Float)
     games_played = Column(Integer, default=1)
     best_streak = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
@@ -46,6 +46,14 @@ class ImageAnalysisRequest(BaseModel):
     """Requisição de análise de imagem"""
     image_base64: str = Field(..., description="Imagem em base64")
     game_session_id: Optional[str] = None
+    image_name: Optional[str] = Field(
+        default=None,
+        description="Arquivo do dataset (de /images/random), usado na dificuldade por imagem"
+    )
+    return_masks: bool = Field(
+        default=True,
+        description="Se False, a rodada responde só com caixas; polígonos via /game/{id}/masks/{image_id}"
+    )
 
 
 class ImageAnalysisResponse(BaseModel):
@@ -55,6 +63,8 @@ class ImageAnalysisResponse(BaseModel):
     processing_time_ms: float
     has_boar: bool
     boar_count: int
+    # Chave das máscaras em `mask_cache` (uso interno, fora da resposta da API)
+    mask_key: Optional[str] = Field(default=None, exclude=True)
 
 
 class ClickEvent(BaseModel):
@@ -75,6 +85,12 @@ class ClickResult(BaseModel):
     message: str
 
 
+class AIClickEvent(BaseModel):
+    """Clique da IA agendado na linha do tempo da rodada"""
+    at_ms: float = Field(..., description="Instante do clique, em ms desde o início da vez da IA")
+    click: ClickResult
+
+
 class PlayerScore(BaseModel):
     """Pontuação de um jogador"""
     total_points: int = 0
@@ -92,16 +108,25 @@ class GameRound(BaseModel):
     time_limit: float
     player_score: PlayerScore
     ai_score: PlayerScore
+    started_at: Optional[datetime] = None
+    image_name: Optional[str] = None
 
 
 class GameSession(BaseModel):
     """Sessão de jogo"""
     session_id: str
     created_at: datetime
+    player_name: Optional[str] = None
     rounds_completed: int = 0
     total_rounds: int = 10
     player_total_score: int = 0
     ai_total_score: int = 0
+    player_stats: PlayerScore = Field(default_factory=PlayerScore)
+    ai_stats: PlayerScore = Field(default_factory=PlayerScore)
+    player_streak: int = 0       # Javalis seguidos sem errar
+    player_best_streak: int = 0
+    image_seed: Optional[int] = None  # Semente do sorteio de imagens (partida reproduzível)
+    images_seen: List[str] = Field(default_factory=list)
     current_round: Optional[GameRound] = None
     status: str = "active"  # active, completed, abandoned
 
@@ -117,6 +142,8 @@ class GameResult(BaseModel):
     total_boars_found: int
     player_stats: PlayerScore
     ai_stats: PlayerScore
+    player_name: Optional[str] = None
+    player_best_streak: int = 0
 
 
 class AILearningData(BaseModel):
@@ -137,3 +164,24 @@ class LeaderboardEntry(BaseModel):
     games_played: int
     best_streak: int
 
+
+
+class ModelPromoteRequest(BaseModel):
+    """Requisição para promover um modelo a primário"""
+    name: str = Field(..., description="Nome do arquivo do modelo (ex: javali_seg_v2.onnx)")
+
+
+class ModelCanaryRequest(BaseModel):
+    """Requisição para configurar o modelo canário"""
+    name: Optional[str] = Field(default=None, description="Modelo canário (None desativa)")
+    percent: float = Field(default=10.0, ge=0.0, le=100.0, description="% do tráfego para o canário")
+
+
+class ProfilerStartRequest(BaseModel):
+    """Requisição para ligar o profiler por amostragem"""
+    duration_seconds: float = Field(default=30.0, gt=0.0, description="Duração da janela (limitada no servidor)")
+    interval_ms: float = Field(default=5.0, ge=1.0, le=1000.0, description="Intervalo entre amostras")
+    sample_one_in: int = Field(default=1, ge=1, description="Amostra 1 a cada N requisições")
+    route_prefixes: Optional[List[str]] = Field(
+        default=None, description="Prefixos de rota amostrados (padrão: detecção e jogo)"
+    )
@@ -2,4 +2,8 @@
 from .detection_service import DetectionService
 from .game_service import GameService
 from .ai_learning_service import AILearningService
+from .model_registry import ModelRegistry
 
+from .storage_service import StorageService
+from .leaderboard_service import LeaderboardService
+from .session_store import SessionStore, InMemorySessionStore, SQLiteSessionStore
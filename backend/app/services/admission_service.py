@@ -0,0 +1,192 @@
+"""
+Controle de Admissão (backpressure por classe de rota)
+
+Cada classe de rota tem um limite de requisições em execução, uma fila de
+espera limitada e um prazo. Em sobrecarga:
+- fila cheia: 503 imediato com Retry-After (custa microssegundos)
+- prazo vencido ainda na fila: 503 antes de qualquer inferência
+
+Assim um pico de /detect não empilha trabalho sem limite nem atrasa as
+rotas baratas do jogo, que têm a sua própria classe. Os limites são por
+processo (cada worker admite os seus).
+"""
+import asyncio
+import math
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from ..config import settings
+from .metrics_service import metrics
+
+
+# Classe de rota por caminho (avaliado antes do roteamento do FastAPI)
+STREAM_PATHS = {"/api/v1/detect/batch", "/api/v1/detect/video"}
+INFERENCE_PATHS = {"/api/v1/detect", "/api/v1/detect/upload", "/api/v1/images/random/analyzed"}
+ROUND_START_PATTERN = re.compile(r"^/api/v1/game/[^/]+/round/start$")
+GAME_PREFIXES = ("/api/v1/game/", "/api/v1/images/random")
+
+
+def classify(path: str) -> Optional[str]:
+    """Classe de admissão da rota (None = sem controle, ex: /health)"""
+    if path in STREAM_PATHS:
+        return "stream"
+    if path in INFERENCE_PATHS or ROUND_START_PATTERN.match(path):
+        return "inference"
+    if path.startswith(GAME_PREFIXES):
+        return "game"
+    return None
+
+
+class AdmissionRejected(Exception):
+    """Requisição recusada; `retry_after` em segundos"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """Limite de execução + fila FIFO limitada + prazo de espera"""
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int, deadline_seconds: float):
+        self.name = name
+        self.max_in_flight = max(max_in_flight, 1)
+        self.max_queue = max(max_queue, 0)
+        self.deadline_seconds = deadline_seconds
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Média móvel do tempo de execução, para estimar o Retry-After
+        self._avg_service = 0.1
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Segundos estimados até a fila atual ser atendida"""
+        backlog = (self.queued + 1) / self.max_in_flight
+        return max(1, math.ceil(backlog * self._avg_service))
+
+    async def acquire(self) -> float:
+        """
+        Aguarda uma vaga (ou recusa); retorna o instante da admissão
+
+        Raises:
+            AdmissionRejected: fila cheia ou prazo vencido na fila
+        """
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return time.perf_counter()
+
+        if len(self._waiters) >= self.max_queue:
+            raise AdmissionRejected("queue_full", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.deadline_seconds)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # Vaga chegou junto com o prazo: devolve para o próximo
+                self._release_slot()
+            else:
+                future.cancel()
+            raise AdmissionRejected("deadline", self.retry_after())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release_slot()
+            else:
+                future.cancel()
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+        return time.perf_counter()
+
+    def release(self, admitted_at: float):
+        """Libera a vaga e atualiza o tempo médio de execução"""
+        self._avg_service += 0.1 * ((time.perf_counter() - admitted_at) - self._avg_service)
+        self._release_slot()
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Executa o bloco com uma vaga (levanta AdmissionRejected se recusado)"""
+        admitted_at = await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+    def _release_slot(self):
+        # Passa a vaga diretamente ao próximo da fila (sem reabrir disputa)
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class AdmissionController:
+    """Portões por classe de rota, configurados pelo Settings"""
+
+    def __init__(self):
+        self.gates: Dict[str, AdmissionGate] = {
+            "inference": AdmissionGate(
+                "inference",
+                settings.ADMISSION_INFERENCE_MAX_IN_FLIGHT,
+                settings.ADMISSION_INFERENCE_MAX_QUEUE,
+                settings.ADMISSION_INFERENCE_DEADLINE_SECONDS,
+            ),
+            "stream": AdmissionGate(
+                "stream",
+                settings.ADMISSION_STREAM_MAX_IN_FLIGHT,
+                settings.ADMISSION_STREAM_MAX_QUEUE,
+                settings.ADMISSION_STREAM_DEADLINE_SECONDS,
+            ),
+            "game": AdmissionGate(
+                "game",
+                settings.ADMISSION_GAME_MAX_IN_FLIGHT,
+                settings.ADMISSION_GAME_MAX_QUEUE,
+                settings.ADMISSION_GAME_DEADLINE_SECONDS,
+            ),
+        }
+        self.rejected = metrics.counter(
+            "admission_rejected_total", "Requisições recusadas pelo controle de admissão",
+            ("route_class", "reason")
+        )
+        for name, gate in self.gates.items():
+            metrics.callback_gauge(f"admission_{name}_in_flight", f"Requisições {name} em execução",
+                                   lambda gate=gate: gate.in_flight)
+            metrics.callback_gauge(f"admission_{name}_queued", f"Requisições {name} na fila",
+                                   lambda gate=gate: gate.queued)
+
+    def gate_for(self, path: str) -> Optional[AdmissionGate]:
+        if not settings.ADMISSION_ENABLED:
+            return None
+        route_class = classify(path)
+        return self.gates.get(route_class) if route_class else None
+
+    def reject(self, gate: AdmissionGate, error: AdmissionRejected):
+        """Conta uma recusa (fila cheia ou prazo vencido)"""
+        self.rejected.inc(gate.name, error.reason)
+
+    def describe(self) -> Dict[str, Dict]:
+        return {
+            name: {
+                "in_flight": gate.in_flight,
+                "queued": gate.queued,
+                "max_in_flight": gate.max_in_flight,
+                "max_queue": gate.max_queue,
+                "deadline_seconds": gate.deadline_seconds,
+            }
+            for name, gate in self.gates.items()
+        }
+
+
+# Instância global
+admission = AdmissionController()
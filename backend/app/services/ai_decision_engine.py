@@ -0,0 +1,112 @@
+"""
+Motor de Decisão da IA
+
+Pontua todas as detecções de uma imagem de uma vez (arrays NumPy) a partir
+da confiança do modelo, do tipo de alvo e da taxa de acerto humano por
+classe. A mesma pontuação gera as recomendações e os cliques simulados da
+IA, sorteados (decisão + tempo de reação) em um único passo vetorizado.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..models.schemas import Detection
+from .detection_table import CLASS_ORDER, DetectionTable
+
+
+# Prioridade
+TARGET_PRIORITY_BOOST = 1.5     # Alvos (javalis) primeiro
+HUMAN_PRIORITY_FACTOR = 0.1     # Humanos quase nunca
+RECOMMEND_THRESHOLD = 0.5       # Prioridade mínima para recomendar o clique
+
+# Decisão de clique (ruído realista - a IA também erra)
+TARGET_EXTRA_CLICK = 0.3        # Chance extra de clicar em javalis
+HUMAN_CLICK_FACTOR = 0.1        # IA é mais cuidadosa com humanos
+NON_TARGET_ERROR = 0.2          # Chance de erro em não-alvos
+REACTION_JITTER = (0.8, 1.2)    # Variação do tempo de reação por clique
+
+
+class DetectionScores:
+    """Pontuação vetorizada das detecções de uma imagem"""
+
+    __slots__ = ("detections", "table", "priority", "is_target", "is_human", "order")
+
+    def __init__(
+        self,
+        detections: Union[DetectionTable, Sequence[Detection]],
+        class_success: Dict[str, float]
+    ):
+        """
+        Args:
+            detections: Detecções da imagem (tabela da sessão ou lista)
+            class_success: Taxa de acerto humano por classe (classes sem
+                           dados não são penalizadas)
+        """
+        self.detections = detections
+        self.table = (
+            detections if isinstance(detections, DetectionTable)
+            else DetectionTable.from_detections(detections)
+        )
+
+        confidence = self.table.confidence.astype(np.float64)
+        self.is_target = self.table.is_target
+        self.is_human = self.table.is_human
+        success = np.array([class_success.get(c.value, 1.0) for c in CLASS_ORDER])[self.table.classes]
+
+        # Penalidade para classes com alto erro humano
+        self.priority = (
+            confidence
+            * np.where(self.is_target, TARGET_PRIORITY_BOOST, 1.0)
+            * (0.5 + 0.5 * success)
+            * np.where(self.is_human, HUMAN_PRIORITY_FACTOR, 1.0)
+        )
+        # Maior prioridade primeiro (estável para empates)
+        self.order = np.argsort(-self.priority, kind="stable")
+
+    @property
+    def should_click(self) -> np.ndarray:
+        return (self.priority > RECOMMEND_THRESHOLD) & ~self.is_human
+
+    def recommendations(self) -> List[Dict]:
+        """Recomendações ordenadas por prioridade"""
+        should_click = self.should_click
+        return [
+            {
+                "detection": self.detections[i],
+                "priority": float(self.priority[i]),
+                "should_click": bool(should_click[i]),
+            }
+            for i in self.order.tolist()
+        ]
+
+    def sample_clicks(
+        self,
+        ai_confidence: float,
+        base_reaction: float,
+        rng: Optional[np.random.Generator] = None
+    ) -> Tuple[List[int], List[float]]:
+        """
+        Sorteia os cliques da IA e seus instantes
+
+        A IA clica na ordem de prioridade; o instante de cada clique é a soma
+        dos tempos de reação sorteados até ele.
+
+        Returns:
+            (índices das detecções clicadas, instantes em ms desde o início da vez)
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        n = len(self.detections)
+        u = rng.random((4, n))
+
+        # IA decide se vai "clicar" baseado na confiança
+        base = u[0] < ai_confidence
+        click = np.where(
+            self.is_target,
+            base | (u[1] < TARGET_EXTRA_CLICK),
+            np.where(self.is_human, base & (u[2] < HUMAN_CLICK_FACTOR), base | (u[3] < NON_TARGET_ERROR))
+        )
+
+        chosen = self.order[click[self.order]]
+        reaction = base_reaction * rng.uniform(*REACTION_JITTER, size=len(chosen))
+        at_ms = np.round(np.cumsum(reaction) * 1000, 1)
+        return chosen.tolist(), at_ms.tolist()
@@ -1,17 +1,379 @@
 """
 Serviço de Aprendizado Adaptativo da IA
+
+O aprendizado é guardado como contadores somáveis (contagens e somas, das
+quais saem as médias). Cada worker acumula o que aprendeu desde a última
+gravação e a envia periodicamente como incremento para `ai_learning_stats`;
+o banco soma os incrementos de todos os workers (ordem indiferente, sem
+travas entre processos) e cada worker recarrega o total mesclado.
 """
+import asyncio
+import itertools
 import json
-from typing import Dict, List, Optional
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
 from datetime import datetime
-from collections import defaultdict
+from collections import OrderedDict, defaultdict, deque
 import numpy as np
 
+from sqlalchemy import select
+
 from ..models.schemas import (
     ClickEvent, Detection, AnimalClass, AILearningData
 )
+from ..models.database import AILearningStatsDB
 from ..config import settings
+from .. import constants
 from .detection_service import detection_service
+from .storage_service import storage_service
+from .ai_decision_engine import DetectionScores
+from .metrics_service import record_cache, stage_seconds
+
+
+# Limite do ajuste de confiança por classe
+MAX_CONFIDENCE_ADJUSTMENT = 0.3
+
+GLOBAL_METRIC_KEYS = ("total_rounds", "human_correct", "human_wrong", "ai_correct", "ai_wrong")
+
+
+def _sum_updates(stmt, columns):
+    """SET do upsert: soma o incremento ao total já gravado"""
+    return {
+        "value": AILearningStatsDB.value + stmt.excluded.value,
+        "updated_at": stmt.excluded.updated_at,
+    }
+
+
+class _CounterShard:
+    """Incrementos de um grupo de threads (cada shard tem a sua trava)"""
+    
+    __slots__ = ("lock", "local", "pending")
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Incrementos desde a última recarga / desde a última gravação
+        self.local: Dict[str, float] = defaultdict(float)
+        self.pending: Dict[str, float] = defaultdict(float)
+
+
+class LearningCounters:
+    """
+    Contadores do aprendizado: total gravado + incrementos locais
+    
+    Como só há somas, a mescla entre workers é comutativa: o total de cada
+    chave é a soma dos incrementos, em qualquer ordem. Dentro do processo,
+    cada thread escreve em um de `shards` shards (travas independentes),
+    então requisições paralelas não disputam uma trava global; leituras
+    somam os shards.
+    
+    Valores que dependem do total atual (média móvel, soma limitada) também
+    são gravados como incrementos, calculados sobre o total visto pelo
+    worker: com um worker o resultado é exato; com vários, cada recarga
+    corrige a visão de cada um.
+    """
+    
+    def __init__(self, shards: int = settings.AI_COUNTER_SHARDS):
+        self.base: Dict[str, float] = {}
+        self._shards = [_CounterShard() for _ in range(max(1, shards))]
+        self._next_shard = itertools.count()
+        self._thread_shard = threading.local()
+    
+    def _shard(self) -> _CounterShard:
+        shard = getattr(self._thread_shard, "shard", None)
+        if shard is None:
+            shard = self._shards[next(self._next_shard) % len(self._shards)]
+            self._thread_shard.shard = shard
+        return shard
+    
+    def add(self, key: str, value: float = 1.0):
+        shard = self._shard()
+        with shard.lock:
+            shard.local[key] += value
+            shard.pending[key] += value
+    
+    def _add_relative(self, key: str, delta: Callable[[float], float]):
+        """
+        Soma um incremento calculado sobre o total atual da chave
+        
+        Usa o shard da chave (não o da thread): atualizações da mesma chave
+        ficam serializadas na trava do seu shard, e chaves diferentes não
+        disputam uma trava global.
+        """
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            value = delta(self.get(key))
+            if value:
+                shard.local[key] += value
+                shard.pending[key] += value
+    
+    def add_ema(self, key: str, value: float, alpha: float):
+        """Média móvel exponencial: total += alpha * (value - total)"""
+        self._add_relative(key, lambda current: alpha * (value - current))
+    
+    def add_clamped(self, key: str, value: float, limit: float):
+        """Soma `value` mantendo o total em [-limit, limit] (corta o incremento)"""
+        self._add_relative(
+            key, lambda current: max(-limit, min(limit, current + value)) - current
+        )
+    
+    def get(self, key: str) -> float:
+        return self.base.get(key, 0.0) + sum(s.local.get(key, 0.0) for s in self._shards)
+    
+    def keys_with_prefix(self, prefix: str) -> List[str]:
+        keys = set(self.base)
+        for shard in self._shards:
+            keys.update(list(shard.local))
+        return [k for k in keys if k.startswith(prefix)]
+    
+    @property
+    def totals(self) -> Dict[str, float]:
+        """Cópia dos totais atuais"""
+        totals = defaultdict(float, self.base)
+        for shard in self._shards:
+            for key, value in list(shard.local.items()):
+                totals[key] += value
+        return totals
+    
+    def drain(self) -> Dict[str, float]:
+        """Retira os incrementos pendentes (para gravação)"""
+        pending = defaultdict(float)
+        for shard in self._shards:
+            with shard.lock:
+                drained, shard.pending = shard.pending, defaultdict(float)
+            for key, value in drained.items():
+                pending[key] += value
+        return {k: v for k, v in pending.items() if v}
+    
+    def merge_loaded(self, stored: Dict[str, float]):
+        """
+        Substitui o total gravado; os incrementos locais passam a ser só os
+        ainda não enviados para gravação
+        """
+        self.base = dict(stored)
+        for shard in self._shards:
+            with shard.lock:
+                shard.local = defaultdict(float, shard.pending)
+
+
+class ImageClickStats:
+    """Agregados de tamanho fixo dos cliques em uma imagem"""
+    
+    __slots__ = ("heatmap", "target_hits", "wrong_hits", "misses", "reaction_hist")
+    
+    def __init__(self, grid_size: int, reaction_bins: int):
+        # Contagem de cliques por célula (linhas = y, colunas = x)
+        self.heatmap = np.zeros((grid_size, grid_size), dtype=np.uint32)
+        self.target_hits = 0
+        self.wrong_hits = 0
+        self.misses = 0
+        # Histograma do tempo de reação (última posição = acima do maior limite)
+        self.reaction_hist = np.zeros(reaction_bins, dtype=np.uint32)
+    
+    @property
+    def clicks(self) -> int:
+        return self.target_hits + self.wrong_hits + self.misses
+    
+    @property
+    def success_rate(self) -> float:
+        """Fração dos cliques que acertaram um alvo"""
+        return self.target_hits / self.clicks if self.clicks else 0.0
+
+
+class ClickHistory:
+    """
+    Histórico de cliques com memória constante
+    
+    Guarda agregados por imagem (mapa de calor, acertos/erros e histograma
+    de reação) para no máximo `max_images` imagens, descartando a usada há
+    mais tempo, e opcionalmente os últimos `recent_size` cliques brutos.
+    """
+    
+    def __init__(
+        self,
+        max_images: int = settings.AI_CLICK_HISTORY_MAX_IMAGES,
+        grid_size: int = settings.AI_CLICK_HEATMAP_GRID,
+        recent_size: int = settings.AI_CLICK_RECENT_EVENTS,
+        reaction_bins=constants.AI_REACTION_TIME_BINS
+    ):
+        self.max_images = max_images
+        self.grid_size = grid_size
+        self.reaction_bins = np.asarray(reaction_bins, dtype=np.float32)
+        self.images: "OrderedDict[str, ImageClickStats]" = OrderedDict()
+        self.recent: Optional[deque] = deque(maxlen=recent_size) if recent_size > 0 else None
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.images)
+    
+    def record(self, click: ClickEvent, hit: bool, is_target: bool,
+               reaction_time: Optional[float] = None):
+        """Acumula um clique nos agregados da imagem"""
+        col = min(self.grid_size - 1, max(0, int(click.x * self.grid_size)))
+        row = min(self.grid_size - 1, max(0, int(click.y * self.grid_size)))
+        
+        with self._lock:
+            stats = self.images.get(click.image_id)
+            if stats is None:
+                stats = ImageClickStats(self.grid_size, len(self.reaction_bins) + 1)
+                self.images[click.image_id] = stats
+                if len(self.images) > self.max_images:
+                    self.images.popitem(last=False)
+            else:
+                self.images.move_to_end(click.image_id)
+            
+            stats.heatmap[row, col] += 1
+            if not hit:
+                stats.misses += 1
+            elif is_target:
+                stats.target_hits += 1
+            else:
+                stats.wrong_hits += 1
+            if reaction_time is not None:
+                stats.reaction_hist[np.searchsorted(self.reaction_bins, reaction_time)] += 1
+            
+            if self.recent is not None:
+                self.recent.append(click)
+    
+    def get(self, image_id: str) -> Optional[ImageClickStats]:
+        return self.images.get(image_id)
+    
+    def reaction_percentiles(self, qs: Sequence[float] = (50, 90)) -> Dict[str, Optional[float]]:
+        """
+        Limite superior aproximado dos percentis `qs` (0-100) do tempo de
+        reação, somando os histogramas de todas as imagens
+        """
+        with self._lock:
+            hist = sum((stats.reaction_hist for stats in self.images.values()),
+                       np.zeros(len(self.reaction_bins) + 1, dtype=np.uint64))
+        if not hist.any():
+            return {f"p{q:g}": None for q in qs}
+        cumulative = np.cumsum(hist)
+        result = {}
+        for q in qs:
+            index = int(np.searchsorted(cumulative, cumulative[-1] * q / 100))
+            result[f"p{q:g}"] = float(self.reaction_bins[min(index, len(self.reaction_bins) - 1)])
+        return result
+    
+    def clear(self):
+        with self._lock:
+            self.images.clear()
+            if self.recent is not None:
+                self.recent.clear()
+
+
+def difficulty_score(num_detections: int, num_targets: int, num_humans: int,
+                     avg_confidence: float) -> float:
+    """Dificuldade estática (0-1) a partir da composição da imagem"""
+    # Mais detecções = mais difícil
+    detection_factor = min(1.0, num_detections / 10)
+    
+    # Menos alvos = mais difícil
+    target_factor = 1.0 - (num_targets / max(1, num_detections))
+    
+    # Humanos presentes = mais perigoso
+    human_factor = min(1.0, num_humans * 0.3)
+    
+    # Baixa confiança = mais incerto
+    confidence_factor = 1.0 - avg_confidence
+    
+    # Combina fatores
+    difficulty = (
+        0.25 * detection_factor +
+        0.3 * target_factor +
+        0.25 * human_factor +
+        0.2 * confidence_factor
+    )
+    
+    return min(1.0, max(0.0, difficulty))
+
+
+def label_difficulty(label_path: Path) -> float:
+    """Dificuldade estática pelos labels YOLO, sem inferência"""
+    num_objects = num_targets = num_humans = 0
+    try:
+        with open(label_path, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if not parts:
+                    continue
+                class_name = constants.MODEL_CLASSES.get(int(parts[0]))
+                num_objects += 1
+                num_targets += class_name in constants.TARGET_CLASSES
+                num_humans += class_name in constants.PENALTY_CLASSES
+    except (OSError, ValueError):
+        return 0.5
+    
+    if not num_objects:
+        return 0.5
+    return difficulty_score(
+        num_objects, num_targets, num_humans, constants.DIFFICULTY_LABEL_CONFIDENCE
+    )
+
+
+class ImageDifficultyStore:
+    """
+    Dificuldade por imagem: estática + desempenho observado dos jogadores
+    
+    Os cliques observados ficam nos contadores do aprendizado (somados entre
+    workers); o score combinado é guardado em cache e só é recalculado
+    quando a imagem recebe cliques novos ou os contadores são recarregados.
+    Guarda no máximo `max_images` imagens (descarta a estimada há mais tempo).
+    """
+    
+    def __init__(self, counters: LearningCounters,
+                 prior_clicks: float = constants.DIFFICULTY_PRIOR_CLICKS,
+                 max_images: int = constants.DIFFICULTY_MAX_IMAGES):
+        self.counters = counters
+        self.prior_clicks = prior_clicks
+        self.max_images = max_images
+        self.static: "OrderedDict[str, float]" = OrderedDict()
+        self.from_detections = set()
+        self.scores: Dict[str, float] = {}
+    
+    def set_static(self, image_name: str, score: float, from_detections: bool = False):
+        self.static[image_name] = score
+        self.static.move_to_end(image_name)
+        if from_detections:
+            self.from_detections.add(image_name)
+        self.scores.pop(image_name, None)
+        while len(self.static) > self.max_images:
+            evicted, _ = self.static.popitem(last=False)
+            self.from_detections.discard(evicted)
+            self.scores.pop(evicted, None)
+    
+    def observe(self, image_name: str, is_target: bool):
+        """Registra um clique de jogador na imagem"""
+        self.counters.add(f"image.{image_name}.clicks")
+        if is_target:
+            self.counters.add(f"image.{image_name}.target_hits")
+        self.scores.pop(image_name, None)
+    
+    def get(self, image_name: str) -> Optional[float]:
+        """Score combinado (None se a imagem ainda não tem estimativa estática)"""
+        score = self.scores.get(image_name)
+        record_cache("difficulty", score is not None)
+        if score is not None:
+            return score
+        
+        static = self.static.get(image_name)
+        if static is None:
+            return None
+        
+        # Peso do observado cresce com o nº de cliques (prior de `prior_clicks`)
+        clicks = self.counters.get(f"image.{image_name}.clicks")
+        if clicks > 0:
+            success = self.counters.get(f"image.{image_name}.target_hits") / clicks
+            weight = clicks / (clicks + self.prior_clicks)
+            static = (1 - weight) * static + weight * (1.0 - success)
+        
+        score = min(1.0, max(0.0, static))
+        self.scores[image_name] = score
+        return score
+    
+    def invalidate(self):
+        """Descarta os scores em cache (contadores recarregados)"""
+        self.scores.clear()
 
 
 class AILearningService:
@@ -27,13 +389,14 @@ class AILearningService:
     def __init__(self):
         """Inicializa o serviço de aprendizado"""
         # Histórico de cliques por imagem
-        self.click_history: Dict[str, List[ClickEvent]] = defaultdict(list)
+        self.click_history = ClickHistory()
         
-        # Padrões aprendidos por classe de animal
-        self.class_patterns: Dict[str, dict] = {}
+        # Padrões por classe, ajustes de confiança e métricas globais
+        # (expostos por `class_patterns`, `confidence_adjustments` e `global_metrics`)
+        self.counters = LearningCounters()
         
-        # Ajustes de confiança aprendidos
-        self.confidence_adjustments: Dict[str, float] = {}
+        # Dificuldade por imagem do dataset (cache de scores)
+        self.image_difficulty = ImageDifficultyStore(self.counters)
         
         # Histórico de performance humana
         self.human_performance: Dict[str, dict] = {}
@@ -41,15 +404,141 @@ class AILearningService:
         # Taxa de aprendizado
         self.learning_rate = settings.AI_LEARNING_RATE
         
-        # Métricas globais
-        self.global_metrics = {
-            "total_rounds": 0,
-            "human_correct": 0,
-            "human_wrong": 0,
-            "ai_correct": 0,
-            "ai_wrong": 0,
-            "avg_reaction_time": 0.0
+        self._snapshot_task: Optional[asyncio.Task] = None
+        storage_service.register_upsert(
+            AILearningStatsDB, ["key"], updates=_sum_updates, merge=False
+        )
+    
+    # ===========================================
+    # Visões derivadas dos contadores
+    # ===========================================
+    
+    @property
+    def global_metrics(self) -> Dict:
+        """Métricas globais (somadas entre workers)"""
+        metrics = {k: int(self.counters.get(f"global.{k}")) for k in GLOBAL_METRIC_KEYS}
+        reactions = self.counters.get("global.reaction_time_count")
+        metrics["avg_reaction_time"] = (
+            self.counters.get("global.reaction_time_sum") / reactions if reactions else 0.0
+        )
+        return metrics
+    
+    @property
+    def class_patterns(self) -> Dict[str, dict]:
+        """
+        Padrões aprendidos por classe de animal
+        
+        Confiança: média sobre os acertos. Posição e tamanho: médias móveis
+        exponenciais (alpha = taxa de aprendizado), que acompanham mudanças
+        recentes no comportamento dos jogadores.
+        """
+        class_names = {
+            key[len("class."):].rsplit(".", 1)[0]
+            for key in self.counters.keys_with_prefix("class.")
         }
+        patterns = {}
+        for class_name in class_names:
+            hits = self._class_counter(class_name, "hit_count")
+            misses = self._class_counter(class_name, "miss_count")
+            if hits + misses <= 0:
+                continue
+            
+            confidence_sum = self._class_counter(class_name, "confidence_sum")
+            patterns[class_name] = {
+                "hit_count": int(hits),
+                "miss_count": int(misses),
+                "avg_confidence_when_hit": confidence_sum / hits if hits else 0.0,
+                "position_bias": {
+                    "x": self._class_counter(class_name, "x_ema"),
+                    "y": self._class_counter(class_name, "y_ema"),
+                },
+                "size_preference": {
+                    "width": self._class_counter(class_name, "width_ema"),
+                    "height": self._class_counter(class_name, "height_ema"),
+                }
+            }
+        return patterns
+    
+    def _class_counter(self, class_name: str, field: str) -> float:
+        return self.counters.get(f"class.{class_name}.{field}")
+    
+    @property
+    def confidence_adjustments(self) -> Dict[str, float]:
+        """
+        Ajuste de confiança por classe
+        
+        O total já é limitado na gravação (`add_clamped`); o corte aqui só
+        cobre o excesso de workers que somaram ao mesmo tempo.
+        """
+        return {
+            key[len("adjust."):]: max(
+                -MAX_CONFIDENCE_ADJUSTMENT,
+                min(MAX_CONFIDENCE_ADJUSTMENT, self.counters.get(key))
+            )
+            for key in self.counters.keys_with_prefix("adjust.")
+        }
+    
+    # ===========================================
+    # Gravação periódica (chamado pelo lifespan)
+    # ===========================================
+    
+    async def start(self):
+        """Carrega o aprendizado gravado e inicia as gravações periódicas"""
+        if not storage_service.enabled or self._snapshot_task is not None:
+            return
+        await self.reload()
+        self._snapshot_task = asyncio.create_task(self._snapshot_loop())
+        print(f"🧠 Aprendizado carregado: {len(self.counters.totals)} contadores")
+    
+    async def stop(self):
+        """Encerra as gravações periódicas e grava o que falta"""
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            try:
+                await self._snapshot_task
+            except asyncio.CancelledError:
+                pass
+            self._snapshot_task = None
+        self.snapshot()
+    
+    async def _snapshot_loop(self):
+        """
+        Recarrega o total mesclado e grava os incrementos locais
+        
+        A recarga vem antes da gravação: os incrementos da volta anterior já
+        foram descarregados pela fila durante o intervalo.
+        """
+        while True:
+            await asyncio.sleep(settings.AI_LEARNING_SNAPSHOT_SECONDS)
+            try:
+                await self.reload()
+            except Exception as e:
+                print(f"⚠️ Erro ao recarregar aprendizado: {e}")
+            self.snapshot()
+    
+    def snapshot(self):
+        """Envia os incrementos pendentes para a fila de persistência"""
+        now = datetime.utcnow()
+        for key, value in self.counters.drain().items():
+            storage_service.enqueue(AILearningStatsDB, {
+                "key": key,
+                "value": value,
+                "updated_at": now,
+            }, upsert=True)
+    
+    async def reload(self):
+        """Lê os totais gravados por todos os workers"""
+        if not storage_service.enabled:
+            return
+        async with storage_service.session() as db:
+            rows = (await db.execute(select(AILearningStatsDB.key, AILearningStatsDB.value))).all()
+        self.counters.merge_loaded({key: value or 0.0 for key, value in rows})
+        self.image_difficulty.invalidate()
+        detection_service.set_confidence_adjustments(self.confidence_adjustments)
+    
+    # ===========================================
+    # Aprendizado
+    # ===========================================
     
     def record_human_click(
         self,
@@ -57,7 +546,9 @@ class AILearningService:
         click: ClickEvent,
         hit: bool,
         detection: Optional[Detection],
-        detections: List[Detection]
+        detections: Sequence[Detection],
+        reaction_time: Optional[float] = None,
+        image_name: Optional[str] = None
     ):
         """
         Registra um clique do humano para aprendizado
@@ -68,63 +559,58 @@ class AILearningService:
             hit: Se acertou algo
             detection: Detecção acertada (se houver)
             detections: Todas as detecções na imagem
+            reaction_time: Segundos desde o início da rodada (se conhecido)
+            image_name: Arquivo do dataset exibido na rodada (se conhecido)
         """
-        # Registra no histórico
-        self.click_history[click.image_id].append(click)
-        
-        # Atualiza métricas globais
-        if hit and detection:
-            if detection.is_target:
-                self.global_metrics["human_correct"] += 1
-            else:
-                self.global_metrics["human_wrong"] += 1
-        
-        # Aprende padrões de clique
-        self._learn_from_click(click, hit, detection, detections)
+        with stage_seconds.time("learning", "record_click"):
+            # Registra nos agregados da imagem
+            is_target = bool(hit and detection and detection.is_target)
+            self.click_history.record(click, hit, is_target, reaction_time)
+            if image_name:
+                self.image_difficulty.observe(image_name, is_target)
+            
+            if reaction_time is not None:
+                self.counters.add("global.reaction_time_sum", reaction_time)
+                self.counters.add("global.reaction_time_count")
+            
+            # Atualiza métricas globais
+            if hit and detection:
+                if detection.is_target:
+                    self.counters.add("global.human_correct")
+                else:
+                    self.counters.add("global.human_wrong")
+            
+            # Aprende padrões de clique
+            self._learn_from_click(click, hit, detection, detections)
     
     def _learn_from_click(
         self,
         click: ClickEvent,
         hit: bool,
         detection: Optional[Detection],
-        detections: List[Detection]
+        detections: Sequence[Detection]
     ):
         """Extrai aprendizado de um clique"""
         if not hit or not detection:
             return
         
-        class_name = detection.class_name.value
-        
-        # Inicializa padrões da classe se necessário
-        if class_name not in self.class_patterns:
-            self.class_patterns[class_name] = {
-                "hit_count": 0,
-                "miss_count": 0,
-                "avg_confidence_when_hit": 0.0,
-                "position_bias": {"x": 0.0, "y": 0.0},
-                "size_preference": {"width": 0.0, "height": 0.0}
-            }
-        
-        pattern = self.class_patterns[class_name]
+        prefix = f"class.{detection.class_name.value}"
         
         if detection.is_target:
-            pattern["hit_count"] += 1
+            self.counters.add(f"{prefix}.hit_count")
             
-            # Atualiza média de confiança
-            old_avg = pattern["avg_confidence_when_hit"]
-            n = pattern["hit_count"]
-            pattern["avg_confidence_when_hit"] = old_avg + (detection.confidence - old_avg) / n
+            # Soma para a média de confiança
+            self.counters.add(f"{prefix}.confidence_sum", detection.confidence)
             
             # Aprende preferência de posição (onde humanos tendem a clicar mais rápido)
+            # e de tamanho, com média móvel exponencial
             alpha = self.learning_rate
-            pattern["position_bias"]["x"] += alpha * (click.x - pattern["position_bias"]["x"])
-            pattern["position_bias"]["y"] += alpha * (click.y - pattern["position_bias"]["y"])
-            
-            # Aprende preferência de tamanho
-            pattern["size_preference"]["width"] += alpha * (detection.bbox.width - pattern["size_preference"]["width"])
-            pattern["size_preference"]["height"] += alpha * (detection.bbox.height - pattern["size_preference"]["height"])
+            self.counters.add_ema(f"{prefix}.x_ema", click.x, alpha)
+            self.counters.add_ema(f"{prefix}.y_ema", click.y, alpha)
+            self.counters.add_ema(f"{prefix}.width_ema", detection.bbox.width, alpha)
+            self.counters.add_ema(f"{prefix}.height_ema", detection.bbox.height, alpha)
         else:
-            pattern["miss_count"] += 1
+            self.counters.add(f"{prefix}.miss_count")
     
     def update_ai_confidence(
         self,
@@ -153,12 +639,12 @@ class AILearningService:
                 
                 # Ajusta confiança inversamente ao erro
                 class_adjustment = adjustment * (1 - error_rate)
-                
-                current = self.confidence_adjustments.get(class_name, 0.0)
-                self.confidence_adjustments[class_name] = max(-0.3, min(0.3, current + class_adjustment))
-                
-                # Propaga para o serviço de detecção
-                detection_service.update_confidence_adjustment(class_name, class_adjustment)
+                self.counters.add_clamped(
+                    f"adjust.{class_name}", class_adjustment, MAX_CONFIDENCE_ADJUSTMENT
+                )
+        
+        # Propaga para o serviço de detecção
+        detection_service.set_confidence_adjustments(self.confidence_adjustments)
     
     def get_ai_recommendations(
         self,
@@ -173,40 +659,24 @@ class AILearningService:
         Returns:
             Lista de recomendações ordenada por prioridade
         """
-        recommendations = []
-        
-        for detection in detections:
-            class_name = detection.class_name.value
-            pattern = self.class_patterns.get(class_name, {})
-            
-            # Calcula score de prioridade
-            priority = detection.confidence
-            
-            # Boost para alvos
-            if detection.is_target:
-                priority *= 1.5
-            
-            # Penalidade para classes com alto erro humano
-            if pattern:
-                total = pattern.get("hit_count", 0) + pattern.get("miss_count", 0)
-                if total > 0:
-                    success_rate = pattern.get("hit_count", 0) / total
-                    priority *= (0.5 + 0.5 * success_rate)
-            
-            # Penalidade severa para humanos
-            if detection.class_name == AnimalClass.HUMAN:
-                priority *= 0.1
-            
-            recommendations.append({
-                "detection": detection,
-                "priority": priority,
-                "should_click": priority > 0.5 and detection.class_name != AnimalClass.HUMAN
-            })
-        
-        # Ordena por prioridade
-        recommendations.sort(key=lambda x: x["priority"], reverse=True)
+        return self.score_detections(detections).recommendations()
+    
+    def score_detections(self, detections: Sequence[Detection]) -> DetectionScores:
+        """
+        Pontua as detecções com o aprendizado atual
         
-        return recommendations
+        A mesma pontuação serve às recomendações e aos cliques simulados
+        (`GameService.simulate_ai_turn`).
+        """
+        with stage_seconds.time("learning", "score"):
+            return DetectionScores(detections, self.class_success_rates())
+    
+    def class_success_rates(self) -> Dict[str, float]:
+        """Taxa de acerto humano por classe (só classes com cliques)"""
+        return {
+            class_name: pattern["hit_count"] / (pattern["hit_count"] + pattern["miss_count"])
+            for class_name, pattern in self.class_patterns.items()
+        }
     
     def calculate_difficulty(self, detections: List[Detection]) -> float:
         """
@@ -218,33 +688,43 @@ class AILearningService:
         if not detections:
             return 0.5
         
-        # Fatores de dificuldade
-        num_detections = len(detections)
-        num_targets = sum(1 for d in detections if d.is_target)
-        num_humans = sum(1 for d in detections if d.class_name == AnimalClass.HUMAN)
-        avg_confidence = np.mean([d.confidence for d in detections])
-        
-        # Mais detecções = mais difícil
-        detection_factor = min(1.0, num_detections / 10)
-        
-        # Menos alvos = mais difícil
-        target_factor = 1.0 - (num_targets / max(1, num_detections))
+        # Fatores de dificuldade (uma passada pelas detecções)
+        num_targets = num_humans = 0
+        confidence_sum = 0.0
+        for d in detections:
+            num_targets += d.is_target
+            num_humans += d.class_name == AnimalClass.HUMAN
+            confidence_sum += d.confidence
         
-        # Humanos presentes = mais perigoso
-        human_factor = min(1.0, num_humans * 0.3)
+        return difficulty_score(
+            len(detections), num_targets, num_humans, confidence_sum / len(detections)
+        )
+    
+    def get_image_difficulty(
+        self,
+        image_name: str,
+        detections: Optional[List[Detection]] = None,
+        label_path: Optional[Path] = None
+    ) -> float:
+        """
+        Dificuldade de uma imagem do dataset (consulta ao cache)
         
-        # Baixa confiança = mais incerto
-        confidence_factor = 1.0 - avg_confidence
+        A parte estática vem das detecções do modelo quando disponíveis, ou
+        dos labels YOLO; é combinada com a taxa de acerto observada.
         
-        # Combina fatores
-        difficulty = (
-            0.25 * detection_factor +
-            0.3 * target_factor +
-            0.25 * human_factor +
-            0.2 * confidence_factor
-        )
+        Args:
+            image_name: Nome do arquivo da imagem
+            detections: Detecções da imagem (substituem a estimativa pelos labels)
+            label_path: Arquivo de label, usado se ainda não houver estimativa
+        """
+        store = self.image_difficulty
+        if detections is not None and image_name not in store.from_detections:
+            store.set_static(image_name, self.calculate_difficulty(detections), from_detections=True)
+        elif image_name not in store.static and label_path is not None:
+            store.set_static(image_name, label_difficulty(label_path))
         
-        return min(1.0, max(0.0, difficulty))
+        score = store.get(image_name)
+        return 0.5 if score is None else score
     
     def get_learning_summary(self) -> Dict:
         """Retorna resumo do aprendizado da IA"""
@@ -259,23 +739,25 @@ class AILearningService:
                 for k, v in self.class_patterns.items()
             },
             "confidence_adjustments": self.confidence_adjustments,
-            "total_images_analyzed": len(self.click_history)
+            "total_images_analyzed": len(self.click_history),
+            "recent_clicks": len(self.click_history.recent or ()),
+            "reaction_time_percentiles": self.click_history.reaction_percentiles()
         }
     
     def reset_learning(self):
-        """Reseta todo o aprendizado"""
+        """
+        Reseta todo o aprendizado
+        
+        Zera os totais com incrementos negativos, então o reset também vale
+        para os outros workers após a próxima recarga.
+        """
         self.click_history.clear()
-        self.class_patterns.clear()
-        self.confidence_adjustments.clear()
         self.human_performance.clear()
-        self.global_metrics = {
-            "total_rounds": 0,
-            "human_correct": 0,
-            "human_wrong": 0,
-            "ai_correct": 0,
-            "ai_wrong": 0,
-            "avg_reaction_time": 0.0
-        }
+        for key, value in list(self.counters.totals.items()):
+            if value:
+                self.counters.add(key, -value)
+        self.image_difficulty.invalidate()
+        detection_service.set_confidence_adjustments({})
 
 
 # Instância global
@@ -6,22 +6,218 @@ detectar e segmentar javalis, macacos, cachorros e pessoas.
 """
 import io
 import base64
+import hashlib
+import threading
 import time
-import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
 from pathlib import Path
-from typing import List, Optional, Tuple, Dict, Any
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import numpy as np
 from PIL import Image, ImageDraw
 
-try:
-    from ultralytics import YOLO
-    YOLO_AVAILABLE = True
-except ImportError:
-    YOLO_AVAILABLE = False
-
 from ..models.schemas import Detection, BoundingBox, AnimalClass, ImageAnalysisResponse, SegmentationPoint
 from ..config import settings
 from .. import constants
+from .model_registry import model_registry
+from .metrics_service import cache_requests, record_cache, stage_seconds
+
+
+def content_image_id(image_bytes: bytes) -> str:
+    """
+    ID estável de uma imagem: hash do conteúdo (BLAKE2b de 96 bits)
+    
+    A mesma imagem recebe o mesmo ID em qualquer requisição, sessão ou
+    worker, então caches, aprendizado e resultados pré-calculados usam a
+    mesma chave (e 96 bits tornam colisões desprezíveis).
+    """
+    return hashlib.blake2b(image_bytes, digest_size=12).hexdigest()
+
+
+def analysis_mask_key(image_id: str, model_name: str, loaded_at: Optional[float], thresholds: tuple) -> str:
+    """Chave das máscaras de uma análise (imagem + modelo carregado + limiares)"""
+    digest = hashlib.blake2b(repr((model_name, loaded_at, thresholds)).encode(), digest_size=8)
+    return f"{image_id}:{digest.hexdigest()}"
+
+
+class MaskCache:
+    """
+    Máscaras brutas do YOLO por imagem, para extrair polígonos sob demanda
+    
+    Guarda as máscaras (já recortadas às detecções mantidas, na mesma ordem)
+    em LRU limitado por `MASK_CACHE_MAX_IMAGES`. É por processo: com vários
+    workers, uma consulta em outro worker não encontra as máscaras. A chave
+    (`mask_key` da análise) cobre imagem, modelo e limiares: os índices só
+    valem para as detecções daquela análise, então outro modelo (canário)
+    ou outros limiares na mesma imagem não sobrescrevem a entrada. Sessões
+    com a mesma análise compartilham a entrada.
+    
+    Entradas de rodadas em andamento ficam presas (`pin`, com contagem de
+    referências) e o LRU só descarta as soltas: com mais rodadas ativas que
+    `max_images`, o cache cresce em vez de perder máscaras no meio da
+    rodada. Uma trava não liberada (sessão abandonada, fim da rodada em
+    outro worker) expira após `pin_seconds`.
+    """
+    
+    def __init__(
+        self,
+        max_images: int = settings.MASK_CACHE_MAX_IMAGES,
+        pin_seconds: float = settings.MASK_CACHE_PIN_SECONDS
+    ):
+        self.max_images = max_images
+        self.pin_seconds = pin_seconds
+        self._entries: "OrderedDict[str, Tuple[Any, int, int]]" = OrderedDict()
+        # mask_key -> [referências, expira em]
+        self._pins: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+    
+    def pin(self, mask_key: str):
+        """Prende a entrada (mesmo antes de existir) até `release`"""
+        with self._lock:
+            pin = self._pins.setdefault(mask_key, [0, 0.0])
+            pin[0] += 1
+            pin[1] = time.monotonic() + self.pin_seconds
+    
+    def release(self, mask_key: str):
+        """Solta uma referência de `pin` (a entrada volta ao LRU sem referências)"""
+        with self._lock:
+            pin = self._pins.get(mask_key)
+            if pin is not None:
+                pin[0] -= 1
+                if pin[0] <= 0:
+                    del self._pins[mask_key]
+    
+    def _evict(self):
+        """Descarta as entradas soltas mais antigas até caber em `max_images`"""
+        now = time.monotonic()
+        for key, (_, expires) in list(self._pins.items()):
+            if expires <= now:
+                del self._pins[key]
+        excess = len(self._entries) - self.max_images
+        if excess <= 0:
+            return
+        for key in [k for k in self._entries if k not in self._pins][:excess]:
+            del self._entries[key]
+    
+    def put(self, mask_key: str, masks, img_width: int, img_height: int):
+        # Na CPU e como booleanos (4x menos memória que float32)
+        masks = masks.cpu()
+        masks = type(masks)(masks.data.bool(), masks.orig_shape)
+        with self._lock:
+            self._entries[mask_key] = (masks, img_width, img_height)
+            self._entries.move_to_end(mask_key)
+            self._evict()
+    
+    def polygons(
+        self,
+        mask_key: str,
+        indices: Optional[List[int]] = None
+    ) -> Optional[Dict[int, List[SegmentationPoint]]]:
+        """
+        Polígonos normalizados (0-1) das detecções pedidas
+        
+        Args:
+            mask_key: `mask_key` da análise feita com `cache_masks=True`
+            indices: Índices das detecções (padrão: todas)
+            
+        Returns:
+            {índice: polígono} ou None se as máscaras não estão em cache
+            
+        Raises:
+            ValueError: índice fora do intervalo
+        """
+        with self._lock:
+            cached = self._entries.get(mask_key)
+            if cached is not None:
+                self._entries.move_to_end(mask_key)
+        record_cache("masks", cached is not None)
+        if cached is None:
+            return None
+        
+        masks, img_width, img_height = cached
+        if indices is None:
+            indices = list(range(len(masks)))
+        if any(i < 0 or i >= len(masks) for i in indices):
+            raise ValueError(f"Índice de detecção inválido (a imagem tem {len(masks)})")
+        if not indices:
+            return {}
+        
+        # Contornos extraídos só para as máscaras pedidas
+        return {
+            i: [
+                SegmentationPoint(x=float(p[0]) / img_width, y=float(p[1]) / img_height)
+                for p in polygon
+            ]
+            for i, polygon in zip(indices, masks[indices].xy)
+        }
+    
+    def __contains__(self, mask_key: str) -> bool:
+        with self._lock:
+            return mask_key in self._entries
+
+
+class AnalysisCache:
+    """
+    Análises recentes por conteúdo (LRU) com deduplicação das que estão em andamento
+    
+    A chave inclui o ID de conteúdo, o modelo (nome + carga) e os limiares
+    efetivos, então trocar de modelo ou mudar o aprendizado invalida as
+    entradas naturalmente. Pedidos simultâneos da mesma chave esperam a
+    primeira análise em vez de repetir a inferência.
+    """
+    
+    def __init__(self, max_images: int = settings.ANALYSIS_CACHE_MAX_IMAGES):
+        self.max_images = max_images
+        self._entries: "OrderedDict[tuple, ImageAnalysisResponse]" = OrderedDict()
+        self._in_flight: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+    
+    def get_or_compute(
+        self,
+        key: tuple,
+        compute: Callable[[], ImageAnalysisResponse],
+        refresh: bool = False
+    ) -> ImageAnalysisResponse:
+        """
+        Resultado em cache, da análise em andamento ou de `compute()`
+        
+        Com `refresh`, ignora o cache (mas ainda reaproveita uma análise em
+        andamento) e grava o novo resultado.
+        """
+        with self._lock:
+            cached = None if refresh else self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+            future = self._in_flight.get(key)
+            owner = cached is None and future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        
+        if cached is not None:
+            record_cache("analysis", True)
+            return cached
+        if not owner:
+            cache_requests.inc("analysis", "deduplicated")
+            return future.result()
+        
+        record_cache("analysis", False)
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_exception(e)
+            raise
+        
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if self.max_images > 0:
+                self._entries[key] = result
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_images:
+                    self._entries.popitem(last=False)
+        future.set_result(result)
+        return result
 
 
 class DetectionService:
@@ -42,44 +238,41 @@ class DetectionService:
     def __init__(self):
         """Inicializa o serviço de detecção/segmentação"""
         self.model = None
-        self.segmentation_model = None
+        self.registry = model_registry
         self.use_segmentation = constants.SEGMENTATION_ENABLED
+        self.mask_cache = MaskCache()
+        self.analysis_cache = AnalysisCache()
         self._load_models()
         
-        # Confidence adjustments baseados em aprendizado
+        # Confidence adjustments baseados em aprendizado (substituídos por
+        # cópia sob a trava; leitores usam a referência atual sem travar)
         self.confidence_adjustments = {}
+        self._adjustments_lock = threading.Lock()
+    
+    @property
+    def segmentation_model(self):
+        """Modelo primário atual do registro (None se não carregado)"""
+        entry = self.registry.primary
+        return entry.model if entry is not None else None
         
     def _load_models(self):
-        """Carrega o modelo de segmentação Agriculture"""
-        if not YOLO_AVAILABLE:
-            print("⚠️ YOLO não disponível. Instale: pip install ultralytics")
-            return
-            
-        try:
-            # Carrega modelo de SEGMENTAÇÃO treinado no Agriculture dataset
-            seg_model_path = settings.ML_MODELS_DIR / "javali_seg.pt"
-            if seg_model_path.exists():
-                self.segmentation_model = YOLO(str(seg_model_path))
-                self.use_segmentation = True
-                print(f"✅ Modelo Agriculture carregado: javali_seg.pt")
-                print(f"   Classes: {list(constants.MODEL_CLASSES.values())}")
-            else:
-                print(f"❌ Modelo javali_seg.pt não encontrado em: {seg_model_path}")
-                print("   Execute o treinamento com: python ml/training/train_segmentation.py")
-                
-        except Exception as e:
-            print(f"❌ Erro ao carregar modelo: {e}")
-            self.segmentation_model = None
+        """Carrega os modelos de segmentação Agriculture via registro"""
+        self.registry.load()
     
     def decode_image(self, image_base64: str) -> Image.Image:
         """Decodifica imagem de base64 para PIL Image"""
+        return self.open_image(self.decode_base64(image_base64))
+    
+    def decode_base64(self, image_base64: str) -> bytes:
+        """Bytes do arquivo de imagem (aceita data URL)"""
         # Remove header se presente
         if "," in image_base64:
             image_base64 = image_base64.split(",")[1]
-            
-        image_data = base64.b64decode(image_base64)
-        image = Image.open(io.BytesIO(image_data))
-        return image.convert("RGB")
+        return base64.b64decode(image_base64)
+    
+    def open_image(self, image_data: bytes) -> Image.Image:
+        """Abre os bytes de uma imagem como PIL Image RGB"""
+        return Image.open(io.BytesIO(image_data)).convert("RGB")
     
     def encode_image(self, image: Image.Image) -> str:
         """Codifica PIL Image para base64"""
@@ -91,7 +284,8 @@ class DetectionService:
         self, 
         image_base64: str,
         confidence_threshold: Optional[float] = None,
-        return_masks: bool = False
+        return_masks: bool = False,
+        cache_masks: bool = False
     ) -> ImageAnalysisResponse:
         """
         Analisa uma imagem e retorna detecções/segmentações
@@ -100,33 +294,68 @@ class DetectionService:
             image_base64: Imagem codificada em base64
             confidence_threshold: Limiar de confiança (opcional)
             return_masks: Se True, inclui máscaras de segmentação nos resultados
+            cache_masks: Se True, guarda as máscaras brutas em `mask_cache`
+                         (pelo `mask_key` da resposta) para extrair polígonos
+                         depois; a entrada fica presa até quem chamou fazer
+                         `mask_cache.release(mask_key)`
             
         Returns:
-            ImageAnalysisResponse com as detecções encontradas
+            ImageAnalysisResponse com as detecções encontradas; `image_id` é
+            o hash do conteúdo (a mesma imagem sempre recebe o mesmo ID)
         """
         start_time = time.time()
-        image_id = str(uuid.uuid4())[:8]
-        
         threshold = confidence_threshold or settings.MODEL_CONFIDENCE_THRESHOLD
         
-        # Decodifica imagem
-        image = self.decode_image(image_base64)
-        img_width, img_height = image.size
-        
-        detections = []
+        with stage_seconds.time("detection", "hash"):
+            image_data = self.decode_base64(image_base64)
+            image_id = content_image_id(image_data)
         
         # Usa apenas modelo de segmentação Agriculture
-        if self.use_segmentation and self.segmentation_model is not None:
-            detections = self._analyze_with_segmentation(
-                image, img_width, img_height, threshold, return_masks
-            )
-        else:
+        entry = self.registry.select() if self.use_segmentation else None
+        if entry is None or entry.model is None:
             # Modelo não disponível - retorna vazio
             print("⚠️ Modelo de segmentação não carregado. Nenhuma detecção disponível.")
+            return self._build_response(image_id, [], (time.time() - start_time) * 1000)
+        
+        # Imagem repetida (outra sessão, nova tentativa, pedidos simultâneos):
+        # reaproveita a análise; com `cache_masks`, só se as máscaras dessa
+        # mesma análise (imagem + modelo + limiares) ainda estiverem em cache
+        thresholds = tuple(np.round(self._class_thresholds(self._model_names(entry), threshold), 3).tolist())
+        key = (image_id, entry.name, entry.loaded_at, return_masks, cache_masks, thresholds)
+        mask_key = analysis_mask_key(image_id, entry.name, entry.loaded_at, thresholds) if cache_masks else None
         
-        processing_time = (time.time() - start_time) * 1000
+        def analyze() -> ImageAnalysisResponse:
+            with stage_seconds.time("detection", "decode"):
+                image = self.open_image(image_data)
+            img_width, img_height = image.size
+            detections = self._analyze_with_segmentation(
+                image, img_width, img_height, threshold, return_masks,
+                mask_key=mask_key, entry=entry
+            )
+            return self._build_response(image_id, detections, (time.time() - start_time) * 1000)
         
-        # Conta javalis
+        if mask_key is not None:
+            # Presa antes da análise: o LRU não a descarta entre o `put` e a rodada
+            self.mask_cache.pin(mask_key)
+        try:
+            refresh = mask_key is not None and mask_key not in self.mask_cache
+            response = self.analysis_cache.get_or_compute(key, analyze, refresh=refresh)
+        except BaseException:
+            if mask_key is not None:
+                self.mask_cache.release(mask_key)
+            raise
+        return response.model_copy(update={
+            "processing_time_ms": (time.time() - start_time) * 1000,
+            "mask_key": mask_key,
+        })
+    
+    def _build_response(
+        self,
+        image_id: str,
+        detections: List[Detection],
+        processing_time: float
+    ) -> ImageAnalysisResponse:
+        """Monta a resposta da análise contando os javalis"""
         boar_count = sum(1 for d in detections if d.is_target)
         
         return ImageAnalysisResponse(
@@ -137,13 +366,71 @@ class DetectionService:
             boar_count=boar_count
         )
     
+    def analyze_many(
+        self,
+        sources: Iterable[Tuple[str, Callable[[], bytes]]],
+        batch_size: int = settings.DETECTION_BATCH_SIZE,
+        confidence_threshold: Optional[float] = None,
+        return_masks: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Analisa muitas imagens em lotes, produzindo um resultado por imagem
+        
+        Os bytes de cada imagem só são lidos quando o seu lote é montado, então
+        no máximo `batch_size` imagens ficam decodificadas em memória. Como é
+        um gerador, o próximo lote só é processado quando o consumidor pede
+        (backpressure natural em respostas em streaming).
+        
+        Args:
+            sources: Pares (nome, função que retorna os bytes da imagem)
+            batch_size: Imagens por chamada ao modelo
+            
+        Yields:
+            Dicionário por imagem com `index`, `source` e a análise ou `error`
+        """
+        batch: List[Tuple[int, str, str, Image.Image]] = []
+        
+        def flush(items):
+            start_time = time.time()
+            try:
+                batch_detections = self.analyze_batch(
+                    [image for _, _, _, image in items], confidence_threshold, return_masks
+                )
+            except Exception as e:
+                for index, name, _, _ in items:
+                    yield {"index": index, "source": name, "error": f"Erro na detecção: {e}"}
+                return
+            
+            processing_time = (time.time() - start_time) * 1000 / len(items)
+            for (index, name, image_id, _), detections in zip(items, batch_detections):
+                response = self._build_response(image_id, detections, processing_time)
+                yield {"index": index, "source": name, **response.model_dump(mode="json")}
+        
+        for index, (name, load) in enumerate(sources):
+            try:
+                image_data = load()
+                image = self.open_image(image_data)
+            except Exception as e:
+                yield {"index": index, "source": name, "error": f"Imagem inválida: {e}"}
+                continue
+            
+            batch.append((index, name, content_image_id(image_data), image))
+            if len(batch) >= batch_size:
+                yield from flush(batch)
+                batch = []
+        
+        if batch:
+            yield from flush(batch)
+    
     def _analyze_with_segmentation(
         self, 
         image: Image.Image, 
         img_width: int, 
         img_height: int, 
         threshold: float,
-        return_masks: bool = False
+        return_masks: bool = False,
+        mask_key: Optional[str] = None,
+        entry=None
     ) -> List[Detection]:
         """
         Analisa imagem usando SEGMENTAÇÃO (máscaras de instância)
@@ -153,79 +440,232 @@ class DetectionService:
         """
         detections = []
         
-        # Executa segmentação
-        results = self.segmentation_model(image, verbose=False)
+        # Seleciona modelo (primário ou canário) e executa segmentação
+        entry = entry or self.registry.select()
+        if entry is None:
+            return detections
+        
+        inference_start = time.time()
+        with stage_seconds.time("detection", "inference"):
+            results, thresholds = self._predict(entry, image, threshold)
+        
+        with stage_seconds.time("detection", "postprocess"):
+            for result in results:
+                detections.extend(self._detections_from_result(
+                    result, img_width, img_height, thresholds, return_masks, mask_key
+                ))
         
-        for result in results:
-            boxes = result.boxes
-            masks = result.masks
+        entry.record((time.time() - inference_start) * 1000, len(detections))
+        
+        return detections
+    
+    def analyze_batch(
+        self,
+        images: List[Any],
+        confidence_threshold: Optional[float] = None,
+        return_masks: bool = False
+    ) -> List[List[Detection]]:
+        """
+        Analisa várias imagens em uma única chamada ao modelo
+        
+        Args:
+            images: Imagens PIL (RGB) ou arrays NumPy BGR (ex: frames do OpenCV)
+            confidence_threshold: Limiar de confiança (opcional)
+            return_masks: Se True, inclui máscaras de segmentação nos resultados
             
-            if boxes is not None:
-                for i, box in enumerate(boxes):
-                    cls_id = int(box.cls[0])
-                    conf = float(box.conf[0])
-                    
-                    # Usa nome da classe do modelo
-                    cls_name = result.names[cls_id]
-                    
-                    # Para modelo customizado, mapeia diretamente
-                    if cls_id in self.CUSTOM_CLASSES:
-                        animal_class = self.CUSTOM_CLASSES[cls_id]
-                    else:
-                        animal_class = self._map_class(cls_name)
-                    
-                    # Aplica ajustes de confiança
-                    adjusted_conf = self._apply_confidence_adjustment(cls_name, conf)
-                    
-                    if adjusted_conf >= threshold:
-                        # Converte coordenadas
-                        x1, y1, x2, y2 = box.xyxy[0].tolist()
-                        
-                        # Normaliza para 0-1
-                        bbox = BoundingBox(
-                            x=(x1 + x2) / 2 / img_width,
-                            y=(y1 + y2) / 2 / img_height,
-                            width=(x2 - x1) / img_width,
-                            height=(y2 - y1) / img_height
-                        )
-                        
-                        # Verifica se é javali
-                        is_target = animal_class == AnimalClass.BOAR
-                        
-                        # Extrai máscara de segmentação se disponível
-                        mask_polygon = None
-                        if return_masks and masks is not None and i < len(masks):
-                            mask = masks[i]
-                            if mask.xy is not None and len(mask.xy) > 0:
-                                # Normaliza pontos do polígono para SegmentationPoint
-                                mask_polygon = [
-                                    SegmentationPoint(
-                                        x=float(p[0]) / img_width, 
-                                        y=float(p[1]) / img_height
-                                    )
-                                    for p in mask.xy[0]
-                                ]
-                        
-                        detection = Detection(
-                            class_name=animal_class,
-                            confidence=adjusted_conf,
-                            bbox=bbox,
-                            is_target=is_target,
-                            segmentation=mask_polygon  # Contorno da segmentação
-                        )
-                        detections.append(detection)
+        Returns:
+            Lista de detecções para cada imagem, na mesma ordem da entrada
+        """
+        if not images:
+            return []
+        
+        threshold = confidence_threshold or settings.MODEL_CONFIDENCE_THRESHOLD
+        
+        entry = self.registry.select() if self.use_segmentation else None
+        if entry is None:
+            return [[] for _ in images]
+        
+        inference_start = time.time()
+        with stage_seconds.time("detection", "inference_batch"):
+            results, thresholds = self._predict(entry, list(images), threshold)
+        
+        batch_detections = []
+        with stage_seconds.time("detection", "postprocess_batch"):
+            for result in results:
+                img_height, img_width = result.orig_shape[:2]
+                batch_detections.append(self._detections_from_result(
+                    result, img_width, img_height, thresholds, return_masks
+                ))
+        
+        # Métricas do registro são por imagem para ficarem comparáveis ao /detect
+        elapsed_ms = (time.time() - inference_start) * 1000
+        for detections in batch_detections:
+            entry.record(elapsed_ms / len(batch_detections), len(detections))
+        
+        return batch_detections
+    
+    def _predict(self, entry, source, threshold: float):
+        """
+        Executa o modelo com o limiar já ajustado pelo aprendizado
+        
+        O YOLO aceita um único `conf`, aplicado antes do NMS; passa o menor
+        limiar efetivo entre as classes para que caixas recuperadas por um
+        ajuste positivo não sejam descartadas pelo modelo. O corte por classe
+        é feito em `_detections_from_result`, antes de extrair as máscaras.
+        
+        Returns:
+            (resultados do YOLO, limiar efetivo por id de classe)
+        """
+        thresholds = self._class_thresholds(self._model_names(entry), threshold)
+        conf = float(thresholds.min()) if thresholds.size else threshold
+        return entry.model(source, conf=conf, verbose=False), thresholds
+    
+    def _model_names(self, entry) -> Dict[int, str]:
+        """Nomes das classes do modelo (padrão: classes do dataset)"""
+        names = getattr(entry.model, "names", None)
+        return dict(names) if names else dict(self.CLASS_NAMES)
+    
+    def _animal_class(self, cls_id: int) -> AnimalClass:
+        """Classe do jogo para um id de classe do modelo"""
+        return self.CUSTOM_CLASSES.get(cls_id, AnimalClass.OTHER)
+    
+    def _class_thresholds(self, names: Dict[int, str], threshold: float) -> np.ndarray:
+        """
+        Limiar efetivo por id de classe (base menos o ajuste aprendido)
+        
+        `conf + ajuste >= threshold` equivale a `conf >= threshold - ajuste`,
+        então o ajuste vira um corte por classe aplicado ao score do modelo.
+        """
+        thresholds = np.full(max(names) + 1 if names else 0, threshold, dtype=np.float64)
+        for cls_id, cls_name in names.items():
+            thresholds[cls_id] = threshold - self._class_adjustment(cls_id, cls_name)
+        return np.clip(thresholds, 0.0, 1.0)
+    
+    def _detections_from_result(
+        self,
+        result,
+        img_width: int,
+        img_height: int,
+        thresholds: np.ndarray,
+        return_masks: bool = False,
+        mask_key: Optional[str] = None
+    ) -> List[Detection]:
+        """
+        Converte um resultado do YOLO em detecções normalizadas (0-1)
+        
+        Aplica o limiar efetivo de cada classe de uma vez sobre os tensores e
+        recorta o resultado antes de tocar nas máscaras, então os polígonos
+        só são extraídos para as detecções mantidas. Com `mask_key`, as
+        máscaras mantidas vão para `mask_cache` (índices = ordem das detecções).
+        """
+        result, cls_ids, confs = self._filter_result(result, thresholds)
+        if result is None:
+            return []
+        
+        if mask_key is not None and result.masks is not None:
+            self.mask_cache.put(mask_key, result.masks, img_width, img_height)
+        
+        boxes = self._normalized_boxes(result, img_width, img_height)
+        polygons = self._normalized_polygons(result, img_width, img_height) if return_masks else None
+        return self._build_detections(result.names, cls_ids, confs, boxes, polygons)
+    
+    # Etapas de `_detections_from_result` (cronometradas em separado por
+    # benchmarks/inference_bench.py)
+    
+    def _filter_result(self, result, thresholds: np.ndarray):
+        """
+        Mantém só as caixas acima do limiar efetivo da sua classe
+        
+        Returns:
+            (resultado recortado ou None se nada passou, ids de classe, scores)
+        """
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return None, None, None
+        
+        cls_ids = boxes.cls.cpu().numpy().astype(int)
+        confs = boxes.conf.cpu().numpy()
+        keep = np.flatnonzero(confs >= thresholds[cls_ids])
+        if keep.size == 0:
+            return None, None, None
+        if keep.size < len(boxes):
+            result = result[keep.tolist()]
+            cls_ids, confs = cls_ids[keep], confs[keep]
+        return result, cls_ids, confs
+    
+    @staticmethod
+    def _normalized_boxes(result, img_width: int, img_height: int) -> np.ndarray:
+        """Caixas (centro x, centro y, largura, altura) normalizadas para 0-1"""
+        xyxy = result.boxes.xyxy.cpu().numpy().astype(np.float64)
+        x1, y1, x2, y2 = xyxy[:, 0], xyxy[:, 1], xyxy[:, 2], xyxy[:, 3]
+        return np.stack([
+            (x1 + x2) / 2 / img_width,
+            (y1 + y2) / 2 / img_height,
+            (x2 - x1) / img_width,
+            (y2 - y1) / img_height,
+        ], axis=1)
+    
+    @staticmethod
+    def _normalized_polygons(result, img_width: int, img_height: int) -> Optional[List[np.ndarray]]:
+        """Contornos das máscaras normalizados para 0-1 (None sem máscaras)"""
+        if result.masks is None:
+            return None
+        scale = np.array([img_width, img_height], dtype=np.float64)
+        return [np.asarray(polygon, dtype=np.float64) / scale for polygon in result.masks.xy]
+    
+    def _build_detections(
+        self,
+        names: Dict[int, str],
+        cls_ids: np.ndarray,
+        confs: np.ndarray,
+        boxes: np.ndarray,
+        polygons: Optional[List[np.ndarray]] = None
+    ) -> List[Detection]:
+        """Monta os modelos pydantic das detecções mantidas"""
+        detections = []
+        for i, (cls_id, conf) in enumerate(zip(cls_ids.tolist(), confs.tolist())):
+            animal_class = self._animal_class(cls_id)
+            
+            # Confiança reportada inclui o ajuste do aprendizado
+            adjustment = self._class_adjustment(cls_id, names[cls_id])
+            adjusted_conf = max(0.0, min(1.0, conf + adjustment))
+            
+            x, y, width, height = boxes[i].tolist()
+            bbox = BoundingBox(x=x, y=y, width=width, height=height)
+            
+            # Contorno da segmentação se disponível
+            mask_polygon = None
+            if polygons is not None and i < len(polygons) and len(polygons[i]) > 0:
+                mask_polygon = [
+                    SegmentationPoint(x=px, y=py) for px, py in polygons[i].tolist()
+                ]
+            
+            detections.append(Detection(
+                class_name=animal_class,
+                confidence=adjusted_conf,
+                bbox=bbox,
+                is_target=animal_class == AnimalClass.BOAR,
+                segmentation=mask_polygon  # Contorno da segmentação
+            ))
         
         return detections
 
-    def _apply_confidence_adjustment(self, cls_name: str, confidence: float) -> float:
-        """Aplica ajustes de confiança baseados no aprendizado"""
-        adjustment = self.confidence_adjustments.get(cls_name, 0.0)
-        return max(0.0, min(1.0, confidence + adjustment))
-    
-    def update_confidence_adjustment(self, cls_name: str, adjustment: float):
-        """Atualiza ajuste de confiança para uma classe"""
-        current = self.confidence_adjustments.get(cls_name, 0.0)
-        self.confidence_adjustments[cls_name] = current + adjustment
+    def _class_adjustment(self, cls_id: int, cls_name: str) -> float:
+        """
+        Ajuste de confiança aprendido para uma classe do modelo
+        
+        O aprendizado grava ajustes pela classe do jogo ("boar", "human"...);
+        ajustes pelo nome da classe do modelo têm precedência.
+        """
+        adjustments = self.confidence_adjustments
+        if cls_name in adjustments:
+            return adjustments[cls_name]
+        return adjustments.get(self._animal_class(cls_id).value, 0.0)
+    
+    def set_confidence_adjustments(self, adjustments: Dict[str, float]):
+        """Substitui os ajustes de confiança (estado mesclado do aprendizado)"""
+        with self._adjustments_lock:
+            self.confidence_adjustments = dict(adjustments)
     
     def check_click_hit(
         self, 
@@ -0,0 +1,170 @@
+"""
+Tabela Colunar de Detecções
+
+Representação interna das detecções guardadas por sessão: arrays NumPy
+para caixas, classes, confiança e alvos, e os polígonos de todas as
+detecções em um único buffer com offsets. Uma detecção com polígono de 40
+pontos ocupa ~350 bytes aqui, contra alguns KB como modelos pydantic
+(`Detection` + `BoundingBox` + um `SegmentationPoint` por ponto).
+
+Os modelos da API só são criados na resposta (`to_detections`, ou um item
+por vez via `table[i]`); o teste de clique é vetorizado sobre as caixas.
+"""
+import base64
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..models.schemas import AnimalClass, BoundingBox, Detection, SegmentationPoint
+
+
+# Índice da classe no array `classes`
+CLASS_ORDER: Tuple[AnimalClass, ...] = tuple(AnimalClass)
+_CLASS_INDEX = {c: i for i, c in enumerate(CLASS_ORDER)}
+HUMAN_INDEX = _CLASS_INDEX[AnimalClass.HUMAN]
+
+
+def _pack(array: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode()
+
+
+def _unpack(text: str, dtype, shape=(-1,)) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(text), dtype=dtype).reshape(shape).copy()
+
+
+class DetectionTable:
+    """Detecções de uma imagem em colunas (sequência somente leitura de `Detection`)"""
+
+    __slots__ = ("classes", "confidence", "boxes", "is_target", "offsets", "points")
+
+    def __init__(
+        self,
+        classes: np.ndarray,
+        confidence: np.ndarray,
+        boxes: np.ndarray,
+        is_target: np.ndarray,
+        offsets: np.ndarray,
+        points: np.ndarray
+    ):
+        self.classes = classes          # (n,) uint8, índice em CLASS_ORDER
+        self.confidence = confidence    # (n,) float32
+        self.boxes = boxes              # (n, 4) float32: cx, cy, w, h normalizados
+        self.is_target = is_target      # (n,) bool
+        self.offsets = offsets          # (n + 1,) int32: pontos da detecção i = points[o[i]:o[i+1]]
+        self.points = points            # (m, 2) float32: polígonos concatenados
+
+    @classmethod
+    def empty(cls) -> "DetectionTable":
+        return cls.from_detections([])
+
+    @classmethod
+    def from_detections(cls, detections: Sequence[Detection]) -> "DetectionTable":
+        n = len(detections)
+        sizes = [len(d.segmentation) if d.segmentation else 0 for d in detections]
+        offsets = np.zeros(n + 1, dtype=np.int32)
+        offsets[1:] = np.cumsum(sizes)
+
+        points = np.empty((int(offsets[-1]), 2), dtype=np.float32)
+        for d, start, size in zip(detections, offsets.tolist(), sizes):
+            if size:
+                points[start:start + size] = [(p.x, p.y) for p in d.segmentation]
+
+        return cls(
+            classes=np.fromiter((_CLASS_INDEX[d.class_name] for d in detections), dtype=np.uint8, count=n),
+            confidence=np.fromiter((d.confidence for d in detections), dtype=np.float32, count=n),
+            boxes=np.array(
+                [(d.bbox.x, d.bbox.y, d.bbox.width, d.bbox.height) for d in detections], dtype=np.float32
+            ).reshape(n, 4),
+            is_target=np.fromiter((d.is_target for d in detections), dtype=bool, count=n),
+            offsets=offsets,
+            points=points,
+        )
+
+    # ===========================================
+    # Sequência de Detection (conversão sob demanda)
+    # ===========================================
+
+    def __len__(self) -> int:
+        return len(self.classes)
+
+    def __getitem__(self, index: int) -> Detection:
+        return self.detection(index)
+
+    def __iter__(self) -> Iterator[Detection]:
+        return iter(self.to_detections())
+
+    def fields(self, index: int) -> Tuple[AnimalClass, bool, float]:
+        """(classe, é_alvo, confiança) de uma detecção, sem criar o modelo"""
+        return (
+            CLASS_ORDER[self.classes[index]],
+            bool(self.is_target[index]),
+            round(float(self.confidence[index]), 4),
+        )
+
+    def polygon(self, index: int) -> Optional[List[SegmentationPoint]]:
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        if start == end:
+            return None
+        coords = self.points[start:end].astype(np.float64).round(4).tolist()
+        return [SegmentationPoint(x=x, y=y) for x, y in coords]
+
+    def detection(self, index: int, with_segmentation: bool = True) -> Detection:
+        class_name, is_target, confidence = self.fields(index)
+        x, y, width, height = self.boxes[index].astype(np.float64).round(5).tolist()
+        return Detection(
+            class_name=class_name,
+            confidence=confidence,
+            bbox=BoundingBox(x=x, y=y, width=width, height=height),
+            is_target=is_target,
+            segmentation=self.polygon(index) if with_segmentation else None
+        )
+
+    def to_detections(self, with_segmentation: bool = True) -> List[Detection]:
+        """Modelos da API (na ordem original)"""
+        return [self.detection(i, with_segmentation) for i in range(len(self))]
+
+    # ===========================================
+    # Consultas vetorizadas
+    # ===========================================
+
+    def hit_test(self, x: float, y: float, tolerance: float = 0.05) -> int:
+        """
+        Índice da primeira detecção cuja caixa (com tolerância) contém o
+        ponto, ou -1 (mesma regra de `DetectionService.check_click_hit`)
+        """
+        if not len(self):
+            return -1
+        boxes = self.boxes
+        inside = (
+            (np.abs(boxes[:, 0] - x) <= boxes[:, 2] / 2 + tolerance)
+            & (np.abs(boxes[:, 1] - y) <= boxes[:, 3] / 2 + tolerance)
+        )
+        hits = np.flatnonzero(inside)
+        return int(hits[0]) if hits.size else -1
+
+    @property
+    def is_human(self) -> np.ndarray:
+        return self.classes == HUMAN_INDEX
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+    # ===========================================
+    # Serialização (estado das sessões)
+    # ===========================================
+
+    def to_payload(self) -> Dict[str, str]:
+        """Colunas como bytes brutos em base64 (para o JSON do session store)"""
+        return {name: _pack(getattr(self, name)) for name in self.__slots__}
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, str]) -> "DetectionTable":
+        return cls(
+            classes=_unpack(payload["classes"], np.uint8),
+            confidence=_unpack(payload["confidence"], np.float32),
+            boxes=_unpack(payload["boxes"], np.float32, (-1, 4)),
+            is_target=_unpack(payload["is_target"], bool),
+            offsets=_unpack(payload["offsets"], np.int32),
+            points=_unpack(payload["points"], np.float32, (-1, 2)),
+        )
@@ -1,20 +1,31 @@
 """
 Serviço de Gerenciamento do Jogo
+
+O estado das sessões (sessão, estado da IA e detecções das rodadas) fica no
+`SessionStore` configurado, para que vários workers atendam o mesmo jogo.
+Cada alteração é uma função aplicada com concorrência otimista; gravações na
+fila de persistência acontecem depois, fora da função, para não repetirem.
 """
 import uuid
 import time
 import random
-import asyncio
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from pathlib import Path
 
 from ..models.schemas import (
     GameSession, GameRound, GameResult, PlayerScore,
-    ClickEvent, ClickResult, Detection, AnimalClass
+    ClickEvent, ClickResult, Detection, AnimalClass, AIClickEvent,
+    SegmentationPoint
 )
 from ..config import settings
 from .detection_service import detection_service
+from .storage_service import storage_service
+from .session_store import SessionState, SessionStore, create_session_store
+from .detection_table import DetectionTable
+from .image_sampler import CatalogEntry, image_sampler
+from .ai_learning_service import ai_learning_service
+from .ai_decision_engine import DetectionScores
 
 
 class GameService:
@@ -22,14 +33,8 @@ class GameService:
     
     def __init__(self):
         """Inicializa o serviço de jogo"""
-        # Armazena sessões ativas em memória
-        self.active_sessions: Dict[str, GameSession] = {}
-        
-        # Cache de detecções por imagem
-        self.detection_cache: Dict[str, List[Detection]] = {}
-        
-        # Estado da IA por sessão
-        self.ai_state: Dict[str, dict] = {}
+        # Sessões ativas, estado da IA e detecções por imagem de cada sessão
+        self.store: SessionStore = create_session_store()
         
         # Imagens de exemplo para o jogo
         self.sample_images: List[str] = []
@@ -61,12 +66,13 @@ class GameService:
         else:
             print("⚠️ Nenhuma imagem encontrada no dataset Agriculture")
     
-    def create_session(self, player_name: Optional[str] = None) -> GameSession:
+    def create_session(self, player_name: Optional[str] = None, seed: Optional[int] = None) -> GameSession:
         """
         Cria uma nova sessão de jogo
         
         Args:
             player_name: Nome opcional do jogador
+            seed: Semente do sorteio de imagens (aleatória se omitida)
             
         Returns:
             Nova GameSession
@@ -76,66 +82,164 @@ class GameService:
         session = GameSession(
             session_id=session_id,
             created_at=datetime.utcnow(),
+            player_name=player_name,
             rounds_completed=0,
             total_rounds=settings.IMAGES_PER_ROUND,
             player_total_score=0,
             ai_total_score=0,
+            image_seed=seed if seed is not None else random.randrange(2**31),
             status="active"
         )
         
-        self.active_sessions[session_id] = session
-        
         # Inicializa estado da IA
-        self.ai_state[session_id] = {
+        ai_state = {
             "confidence": settings.AI_BASE_CONFIDENCE,
             "reaction_time_base": 1.5,  # segundos
             "accuracy_bonus": 0.0,
             "learned_patterns": []
         }
         
+        self.store.create(SessionState(session, ai_state))
+        storage_service.save_session(session, player_name)
+        
         return session
     
     def get_session(self, session_id: str) -> Optional[GameSession]:
         """Obtém uma sessão existente"""
-        return self.active_sessions.get(session_id)
+        state = self.store.get(session_id)
+        return state.session if state else None
+    
+    def get_detections(self, session_id: str, image_id: str) -> List[Detection]:
+        """Detecções de uma imagem da sessão (lista vazia se desconhecida)"""
+        return self.get_detection_table(session_id, image_id).to_detections()
+    
+    def get_detection_table(self, session_id: str, image_id: str) -> DetectionTable:
+        """Detecções de uma imagem da sessão em colunas (sem criar modelos da API)"""
+        state = self.store.get(session_id)
+        table = state.detections.get(image_id) if state else None
+        return table if table is not None else DetectionTable.empty()
+    
+    def draw_image(self, session_id: str, split: str = "test", **kwargs) -> CatalogEntry:
+        """
+        Sorteia a próxima imagem da sessão, sem repetir imagens já jogadas
+        
+        O gerador depende só da semente e do nº de imagens vistas, então a
+        sequência é reproduzível e qualquer worker sorteia a mesma imagem.
+        """
+        session = self.get_session(session_id)
+        if not session:
+            raise ValueError("Sessão não encontrada")
+        rng = random.Random(f"{session.image_seed}:{len(session.images_seen)}")
+        return image_sampler.draw(split, rng=rng, exclude=set(session.images_seen), **kwargs)
+    
+    def active_session_count(self) -> int:
+        """Número de sessões ativas (em todos os workers, no backend compartilhado)"""
+        return self.store.count()
     
-    def start_round(self, session_id: str, image_base64: str) -> Tuple[GameRound, List[Detection]]:
+    def start_round(
+        self,
+        session_id: str,
+        image_base64: str,
+        image_name: Optional[str] = None,
+        return_masks: bool = True
+    ) -> Tuple[GameRound, List[Detection]]:
         """
         Inicia uma nova rodada
         
         Args:
             session_id: ID da sessão
             image_base64: Imagem da rodada em base64
+            image_name: Arquivo do dataset exibido (opcional; ignorado se não
+                        for uma imagem do catálogo com o mesmo conteúdo)
+            return_masks: Se False, as detecções vêm só com caixas e as
+                          máscaras ficam em cache para `get_masks`
             
         Returns:
             Tupla (GameRound, detecções da imagem)
         """
-        session = self.active_sessions.get(session_id)
-        if not session:
+        if self.store.get(session_id) is None:
             raise ValueError("Sessão não encontrada")
         
-        # Analisa a imagem com segmentação habilitada
-        analysis = detection_service.analyze_image(image_base64, return_masks=True)
-        
-        # Armazena detecções no cache
-        self.detection_cache[analysis.image_id] = analysis.detections
-        
-        # Cria a rodada
-        round_num = session.rounds_completed + 1
-        
-        game_round = GameRound(
-            round_number=round_num,
-            image_id=analysis.image_id,
-            image_url="",  # Será preenchido pelo frontend
-            time_limit=settings.ROUND_TIME_SECONDS,
-            player_score=PlayerScore(),
-            ai_score=PlayerScore()
+        # Analisa a imagem com segmentação habilitada (fora da atualização,
+        # que pode ser repetida em conflito)
+        analysis = detection_service.analyze_image(
+            image_base64, return_masks=return_masks, cache_masks=not return_masks
         )
-        
-        session.current_round = game_round
-        
+        started_at = datetime.utcnow()
+        table = DetectionTable.from_detections(analysis.detections)
+        
+        # O nome vem do cliente e alimenta dificuldade e aprendizado da
+        # imagem: só vale se a imagem enviada for o próprio arquivo do catálogo
+        if image_name and not image_sampler.verify(image_name, analysis.image_id):
+            image_name = None
+        
+        def apply(state: SessionState) -> Tuple[GameRound, Optional[str]]:
+            # Armazena detecções da imagem na sessão (colunares)
+            state.detections[analysis.image_id] = table
+            if analysis.mask_key:
+                replaced = state.mask_keys.get(analysis.image_id)
+                state.mask_keys[analysis.image_id] = analysis.mask_key
+            else:
+                replaced = state.mask_keys.pop(analysis.image_id, None)
+            if image_name and image_name not in state.session.images_seen:
+                state.session.images_seen.append(image_name)
+            
+            # Cria a rodada
+            game_round = GameRound(
+                round_number=state.session.rounds_completed + 1,
+                image_id=analysis.image_id,
+                image_url="",  # Será preenchido pelo frontend
+                time_limit=settings.ROUND_TIME_SECONDS,
+                player_score=PlayerScore(),
+                ai_score=PlayerScore(),
+                started_at=started_at,
+                image_name=image_name
+            )
+            state.session.current_round = game_round
+            return game_round, replaced
+        
+        try:
+            game_round, replaced = self.store.update(session_id, apply)
+        except BaseException:
+            self._release_masks([analysis.mask_key])
+            raise
+        # Máscaras presas pela análise ficam até o fim da rodada (ou da
+        # rodada que a substitui na mesma imagem)
+        self._release_masks([replaced])
         return game_round, analysis.detections
     
+    def get_masks(
+        self,
+        session_id: str,
+        image_id: str,
+        indices: Optional[List[int]] = None
+    ) -> Optional[Dict[int, List[SegmentationPoint]]]:
+        """
+        Polígonos de segmentação de detecções de uma rodada (sob demanda)
+        
+        Args:
+            session_id: ID da sessão
+            image_id: Imagem da rodada (iniciada com `return_masks=False`)
+            indices: Índices das detecções (padrão: todas)
+            
+        Returns:
+            {índice da detecção: polígono normalizado} ou None se as máscaras
+            não estão em cache neste processo
+        """
+        state = self.store.get(session_id)
+        if state is None:
+            raise ValueError("Sessão não encontrada")
+        if image_id not in state.detections:
+            raise ValueError("Imagem não pertence a uma rodada ativa da sessão")
+        if not state.detections[image_id]:
+            return {}
+        
+        # Máscaras da análise desta rodada (outro modelo/limiar tem outra chave)
+        mask_key = state.mask_keys.get(image_id)
+        if mask_key is None:
+            return None
+        return detection_service.mask_cache.polygons(mask_key, indices)
+    
     def process_player_click(
         self, 
         session_id: str, 
@@ -151,168 +255,211 @@ class GameService:
         Returns:
             Resultado do clique
         """
-        session = self.active_sessions.get(session_id)
-        if not session or not session.current_round:
+        def apply(state: SessionState) -> Optional[ClickResult]:
+            session = state.session
+            if not session.current_round:
+                return None
+            
+            # Verifica acerto (teste vetorizado sobre as caixas da imagem)
+            table = state.detections.get(click.image_id)
+            index = table.hit_test(click.x, click.y) if table is not None else -1
+            
+            if index < 0:
+                session.player_streak = 0
+                return ClickResult(
+                    hit=False,
+                    target_class=None,
+                    points_earned=0,
+                    is_penalty=False,
+                    message="Tiro na água! Nenhum animal atingido."
+                )
+            
+            # Calcula pontos baseado no tipo de acerto
+            class_name, is_target, confidence = table.fields(index)
+            points, is_penalty, message = self._calculate_points(class_name, is_target, confidence)
+            
+            # Atualiza pontuação do jogador
+            session.player_total_score += points
+            player_score = session.current_round.player_score
+            
+            if is_target:
+                player_score.correct_hits += 1
+                session.player_streak += 1
+                session.player_best_streak = max(session.player_best_streak, session.player_streak)
+            else:
+                player_score.wrong_hits += 1
+                session.player_streak = 0
+                if class_name == AnimalClass.HUMAN:
+                    player_score.human_hits += 1
+            
+            player_score.total_points += points
+            
             return ClickResult(
-                hit=False,
-                target_class=None,
-                points_earned=0,
-                is_penalty=False,
-                message="Sessão inválida"
+                hit=True,
+                target_class=class_name,
+                points_earned=points,
+                is_penalty=is_penalty,
+                message=message
             )
         
-        # Obtém detecções da imagem
-        detections = self.detection_cache.get(click.image_id, [])
-        
-        # Verifica acerto
-        hit, detection = detection_service.check_click_hit(
-            click.x, click.y, detections
-        )
+        try:
+            result = self.store.update(session_id, apply)
+        except ValueError:
+            result = None
         
-        if not hit:
+        if result is None:
             return ClickResult(
                 hit=False,
                 target_class=None,
                 points_earned=0,
                 is_penalty=False,
-                message="Tiro na água! Nenhum animal atingido."
+                message="Sessão inválida"
             )
         
-        # Calcula pontos baseado no tipo de acerto
-        points, is_penalty, message = self._calculate_points(detection)
-        
-        # Atualiza pontuação do jogador
-        session.player_total_score += points
-        player_score = session.current_round.player_score
-        
-        if detection.is_target:
-            player_score.correct_hits += 1
-        else:
-            player_score.wrong_hits += 1
-            if detection.class_name == AnimalClass.HUMAN:
-                player_score.human_hits += 1
-        
-        player_score.total_points += points
-        
-        return ClickResult(
-            hit=True,
-            target_class=detection.class_name,
-            points_earned=points,
-            is_penalty=is_penalty,
-            message=message
-        )
+        storage_service.save_click(session_id, click, result)
+        return result
     
-    def _calculate_points(self, detection: Detection) -> Tuple[int, bool, str]:
+    def _calculate_points(
+        self, class_name: AnimalClass, is_target: bool, confidence: float
+    ) -> Tuple[int, bool, str]:
         """
-        Calcula pontos para uma detecção
+        Calcula pontos para uma detecção (campos de `DetectionTable.fields`)
         
         Returns:
             Tupla (pontos, é_penalidade, mensagem)
         """
-        if detection.is_target:
+        if is_target:
             # Acertou javali!
-            bonus = int(detection.confidence * 50)  # Bônus por confiança
+            bonus = int(confidence * 50)  # Bônus por confiança
             points = settings.CORRECT_BOAR_POINTS + bonus
             return points, False, f"🎯 Javali detectado! +{points} pontos"
         
-        if detection.class_name == AnimalClass.HUMAN:
+        if class_name == AnimalClass.HUMAN:
             # Penalidade severa por acertar humano
             return settings.HUMAN_HIT_PENALTY, True, "⚠️ HUMANO ATINGIDO! Penalidade severa aplicada!"
         
-        if detection.class_name == AnimalClass.PIG:
+        if class_name == AnimalClass.PIG:
             # Penalidade menor por porco doméstico
             return settings.WRONG_ANIMAL_PENALTY // 2, True, "🐷 Porco doméstico! Penalidade leve."
         
         # Outros animais
-        return settings.WRONG_ANIMAL_PENALTY, True, f"❌ Animal errado ({detection.class_name.value})! Penalidade aplicada."
+        return settings.WRONG_ANIMAL_PENALTY, True, f"❌ Animal errado ({class_name.value})! Penalidade aplicada."
     
-    async def simulate_ai_turn(
+    def simulate_ai_turn(
         self, 
         session_id: str, 
-        detections: List[Detection]
-    ) -> List[ClickResult]:
+        detections: Sequence[Detection],
+        scores: Optional[DetectionScores] = None
+    ) -> List[AIClickEvent]:
         """
         Simula a vez da IA com base nas detecções e aprendizado
         
+        A vez inteira é calculada de uma só vez, sem esperar: cada clique
+        recebe o instante (`at_ms`, relativo ao início da vez) em que
+        aconteceria, com tempos de reação sorteados a partir do `ai_state`.
+        O cliente (ou o canal WebSocket) revela os cliques contra o relógio
+        da rodada; a pontuação já é aplicada aqui.
+        
         Args:
             session_id: ID da sessão
-            detections: Detecções na imagem atual
+            detections: Detecções na imagem atual (lista ou DetectionTable)
+            scores: Pontuação já calculada das detecções (a mesma das
+                    recomendações); calculada aqui se omitida
             
         Returns:
-            Lista de resultados dos "cliques" da IA
+            Linha do tempo dos "cliques" da IA, em ordem de tempo
         """
-        session = self.active_sessions.get(session_id)
-        ai_state = self.ai_state.get(session_id, {})
+        if scores is None:
+            scores = ai_learning_service.score_detections(detections)
+        try:
+            return self.store.update(
+                session_id, lambda state: self._plan_ai_turn(state, scores)
+            )
+        except ValueError:
+            return []
+    
+    def _plan_ai_turn(self, state: SessionState, scores: DetectionScores) -> List[AIClickEvent]:
+        """Sorteia e pontua os cliques da IA sobre o estado da sessão"""
+        session = state.session
+        ai_state = state.ai_state
         
-        if not session or not session.current_round:
+        if not session.current_round:
             return []
         
-        results = []
-        ai_confidence = ai_state.get("confidence", settings.AI_BASE_CONFIDENCE)
-        base_reaction = ai_state.get("reaction_time_base", 1.5)
+        # Decisões e tempos de reação de todas as detecções de uma vez
+        chosen, instants = scores.sample_clicks(
+            ai_state.get("confidence", settings.AI_BASE_CONFIDENCE),
+            ai_state.get("reaction_time_base", 1.5)
+        )
         
-        for detection in detections:
-            # IA decide se vai "clicar" baseado na confiança
-            should_click = random.random() < ai_confidence
+        events = []
+        ai_score = session.current_round.ai_score
+        for index, at_ms in zip(chosen, instants):
+            class_name, is_target, confidence = scores.table.fields(index)
+            points, is_penalty, message = self._calculate_points(class_name, is_target, confidence)
             
-            # Adiciona ruído realista - IA pode errar
-            if detection.is_target:
-                # Maior chance de acertar javalis
-                should_click = should_click or random.random() < 0.3
+            # Atualiza pontuação da IA
+            session.ai_total_score += points
+            if is_target:
+                ai_score.correct_hits += 1
             else:
-                # Pode evitar não-alvos
-                if detection.class_name == AnimalClass.HUMAN:
-                    # IA é mais cuidadosa com humanos
-                    should_click = should_click and random.random() < 0.1
-                elif random.random() < 0.2:
-                    # 20% de chance de erro em não-alvos
-                    should_click = True
+                ai_score.wrong_hits += 1
+                if class_name == AnimalClass.HUMAN:
+                    ai_score.human_hits += 1
+            ai_score.total_points += points
             
-            if should_click:
-                # Simula tempo de reação
-                reaction_time = base_reaction * random.uniform(0.8, 1.2)
-                await asyncio.sleep(min(reaction_time, 0.1))  # Cap para não travar
-                
-                points, is_penalty, message = self._calculate_points(detection)
-                
-                # Atualiza pontuação da IA
-                session.ai_total_score += points
-                ai_score = session.current_round.ai_score
-                
-                if detection.is_target:
-                    ai_score.correct_hits += 1
-                else:
-                    ai_score.wrong_hits += 1
-                    if detection.class_name == AnimalClass.HUMAN:
-                        ai_score.human_hits += 1
-                
-                ai_score.total_points += points
-                
-                results.append(ClickResult(
+            events.append(AIClickEvent(
+                at_ms=at_ms,
+                click=ClickResult(
                     hit=True,
-                    target_class=detection.class_name,
+                    target_class=class_name,
                     points_earned=points,
                     is_penalty=is_penalty,
                     message=f"🤖 IA: {message}"
-                ))
+                )
+            ))
         
-        return results
+        return events
     
     def end_round(self, session_id: str) -> GameRound:
         """Finaliza a rodada atual"""
-        session = self.active_sessions.get(session_id)
-        if not session or not session.current_round:
-            raise ValueError("Sessão ou rodada inválida")
-        
-        current_round = session.current_round
-        session.rounds_completed += 1
+        def apply(state: SessionState) -> Tuple[GameRound, Optional[DetectionTable], Optional[str]]:
+            session = state.session
+            if not session.current_round:
+                raise ValueError("Sessão ou rodada inválida")
+            
+            current_round = session.current_round
+            session.rounds_completed += 1
+            
+            # Acumula estatísticas da rodada na sessão
+            for total, partial in (
+                (session.player_stats, current_round.player_score),
+                (session.ai_stats, current_round.ai_score),
+            ):
+                total.correct_hits += partial.correct_hits
+                total.wrong_hits += partial.wrong_hits
+                total.human_hits += partial.human_hits
+            
+            # Limpa detecções da imagem
+            mask_key = state.mask_keys.pop(current_round.image_id, None)
+            return current_round, state.detections.pop(current_round.image_id, None), mask_key
         
-        # Limpa cache de detecções
-        if current_round.image_id in self.detection_cache:
-            del self.detection_cache[current_round.image_id]
+        # As máscaras voltam ao LRU (outras sessões podem ter recebido a
+        # mesma análise: mesma imagem, modelo e limiares)
+        current_round, table, mask_key = self.store.update(session_id, apply)
+        self._release_masks([mask_key])
+        detections = table.to_detections(with_segmentation=False) if table is not None else []
+        storage_service.save_round(session_id, current_round, detections)
         
         return current_round
     
+    @staticmethod
+    def _release_masks(mask_keys: Iterable[Optional[str]]):
+        """Solta as máscaras presas por rodadas (chaves None são ignoradas)"""
+        for mask_key in mask_keys:
+            if mask_key:
+                detection_service.mask_cache.release(mask_key)
+    
     def end_game(self, session_id: str) -> GameResult:
         """
         Finaliza o jogo e calcula resultado
@@ -320,10 +467,14 @@ class GameService:
         Returns:
             GameResult com estatísticas finais
         """
-        session = self.active_sessions.get(session_id)
-        if not session:
+        # Remove sessão ativa (estado da IA e detecções juntos); com pedidos
+        # simultâneos, só um deles finaliza o jogo
+        state = self.store.pop(session_id)
+        if not state:
             raise ValueError("Sessão não encontrada")
+        self._release_masks(state.mask_keys.values())
         
+        session = state.session
         session.status = "completed"
         
         # Determina vencedor
@@ -334,19 +485,19 @@ class GameService:
         else:
             winner = "tie"
         
-        # Calcula estatísticas
+        # Calcula estatísticas (acumuladas a cada fim de rodada)
         player_stats = PlayerScore(
             total_points=session.player_total_score,
-            correct_hits=0,
-            wrong_hits=0,
-            human_hits=0
+            correct_hits=session.player_stats.correct_hits,
+            wrong_hits=session.player_stats.wrong_hits,
+            human_hits=session.player_stats.human_hits
         )
         
         ai_stats = PlayerScore(
             total_points=session.ai_total_score,
-            correct_hits=0,
-            wrong_hits=0,
-            human_hits=0
+            correct_hits=session.ai_stats.correct_hits,
+            wrong_hits=session.ai_stats.wrong_hits,
+            human_hits=session.ai_stats.human_hits
         )
         
         # Calcula precisão (evita divisão por zero)
@@ -371,14 +522,12 @@ class GameService:
             ai_accuracy=ai_accuracy,
             total_boars_found=player_stats.correct_hits + ai_stats.correct_hits,
             player_stats=player_stats,
-            ai_stats=ai_stats
+            ai_stats=ai_stats,
+            player_name=session.player_name,
+            player_best_streak=session.player_best_streak
         )
         
-        # Remove sessão ativa
-        if session_id in self.active_sessions:
-            del self.active_sessions[session_id]
-        if session_id in self.ai_state:
-            del self.ai_state[session_id]
+        storage_service.save_game_result(session, result)
         
         return result
 
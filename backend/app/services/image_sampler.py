@@ -0,0 +1,272 @@
+"""
+Amostrador de Imagens do Jogo
+
+Catálogo das imagens do dataset (lido dos labels uma vez por split) e
+tabelas de alias pré-calculadas sobre os pesos de cada imagem:
+- viés para imagens com javali (BOAR_IMAGE_PROBABILITY)
+- faixa de dificuldade pedida (imagens fora da faixa têm peso zero)
+- bônus para imagens que misturam javalis e distratores
+
+Cada sorteio é O(1). Imagens já vistas na sessão são rejeitadas e
+sorteadas de novo, então uma partida não repete imagens; com um gerador
+semeado por sessão a sequência de imagens é reproduzível.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Collection, Dict, List, Optional, Sequence, Tuple
+
+from ..config import settings
+from .. import constants
+from .ai_learning_service import ai_learning_service
+from .detection_service import content_image_id
+from .metrics_service import record_cache
+
+
+class CatalogEntry:
+    """Uma imagem do catálogo"""
+
+    __slots__ = ("path", "name", "label_path", "has_boar", "has_distractor", "content_id")
+
+    def __init__(self, path: Path, label_path: Path, class_ids: Collection[int]):
+        self.path = path
+        self.name = path.name
+        self.label_path = label_path
+        self.has_boar = any(c in constants.BOAR_CLASS_INDICES for c in class_ids)
+        self.has_distractor = any(c not in constants.BOAR_CLASS_INDICES for c in class_ids)
+        # Hash do conteúdo (calculado na primeira verificação)
+        self.content_id: Optional[str] = None
+
+
+class AliasTable:
+    """Tabela de alias (Vose): sorteio O(1) de um índice com pesos arbitrários"""
+
+    __slots__ = ("prob", "alias")
+
+    def __init__(self, weights: Sequence[float]):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("Nenhuma imagem com peso positivo")
+
+        scaled = [w * n / total for w in weights]
+        self.prob = [0.0] * n
+        self.alias = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def draw(self, rng) -> int:
+        i = int(rng.random() * len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+def _read_label_classes(label_path: Path) -> List[int]:
+    """Classes presentes em um label YOLO (vazio se não houver label)"""
+    try:
+        with open(label_path, 'r') as f:
+            return [int(line.split()[0]) for line in f if line.strip()]
+    except (OSError, ValueError):
+        return []
+
+
+class ImageSampler:
+    """Sorteio de imagens por split com tabelas de alias em cache"""
+
+    def __init__(self):
+        self.catalogs: Dict[str, List[CatalogEntry]] = {}
+        self._by_name: Dict[str, CatalogEntry] = {}
+        # (split, use_bias, min, max) -> (criada em, candidatas, tabela)
+        self._tables: "OrderedDict[tuple, Tuple[float, List[CatalogEntry], AliasTable]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _split_dir(split: str) -> Path:
+        split_dirs = {
+            "test": settings.GAME_IMAGES_DIR,
+            "valid": settings.VALID_IMAGES_DIR,
+            "train": settings.TRAIN_IMAGES_DIR,
+        }
+        return split_dirs.get(split, settings.GAME_IMAGES_DIR)
+
+    # ===========================================
+    # Catálogo
+    # ===========================================
+
+    def catalog(self, split: str) -> List[CatalogEntry]:
+        """Imagens do split (lidas do disco na primeira chamada)"""
+        entries = self.catalogs.get(split)
+        if entries is None:
+            entries = self._build_catalog(split)
+            self.catalogs[split] = entries
+            for entry in entries:
+                self._by_name.setdefault(entry.name, entry)
+        return entries
+
+    def find(self, image_name: str) -> Optional[CatalogEntry]:
+        """Imagem do catálogo pelo nome do arquivo (None se não for do dataset)"""
+        for split in ("test", "valid", "train"):
+            self.catalog(split)
+        return self._by_name.get(image_name)
+
+    def verify(self, image_name: str, image_id: str) -> bool:
+        """
+        A imagem enviada (ID de conteúdo) é o arquivo do dataset com esse nome?
+
+        O nome vem do cliente: só é aceito se o conteúdo confere, senão
+        qualquer imagem poderia fixar a dificuldade de uma imagem do dataset.
+        """
+        entry = self.find(image_name)
+        if entry is None:
+            return False
+        if entry.content_id is None:
+            try:
+                entry.content_id = content_image_id(entry.path.read_bytes())
+            except OSError:
+                return False
+        return entry.content_id == image_id
+
+    def _build_catalog(self, split: str) -> List[CatalogEntry]:
+        images_dir = self._split_dir(split)
+        if not images_dir.exists():
+            return []
+
+        labels_dir = images_dir.parent / "labels"
+        extensions = ['.jpg', '.jpeg', '.png', '.webp']
+        entries = []
+        for path in sorted(images_dir.iterdir()):
+            if path.suffix.lower() not in extensions:
+                continue
+            label_path = labels_dir / (path.stem + ".txt")
+            entries.append(CatalogEntry(path, label_path, _read_label_classes(label_path)))
+        return entries
+
+    def warm(self):
+        """Pré-carrega os catálogos de todos os splits (chamado no startup)"""
+        for split in ("test", "valid", "train"):
+            entries = self.catalog(split)
+            if entries:
+                print(f"🎲 Amostrador: {len(entries)} imagens em {split}")
+
+    def difficulty(self, entry: CatalogEntry) -> float:
+        """Dificuldade da imagem (cache do aprendizado; labels na 1ª consulta)"""
+        return ai_learning_service.get_image_difficulty(entry.name, label_path=entry.label_path)
+
+    # ===========================================
+    # Tabelas de alias
+    # ===========================================
+
+    def _weights(
+        self,
+        entries: List[CatalogEntry],
+        use_bias: bool,
+        min_difficulty: float,
+        max_difficulty: float
+    ) -> Tuple[List[CatalogEntry], List[float]]:
+        """Candidatas na faixa de dificuldade e seus pesos"""
+        if min_difficulty > 0.0 or max_difficulty < 1.0:
+            entries = [
+                e for e in entries
+                if min_difficulty <= self.difficulty(e) <= max_difficulty
+            ]
+
+        bonus = settings.SAMPLER_CLASS_MIX_BONUS
+        weights = [
+            1.0 + bonus if e.has_boar and e.has_distractor else 1.0
+            for e in entries
+        ]
+
+        if use_bias:
+            # Cada grupo recebe a sua fração total (se o outro grupo existir)
+            boar_total = sum(w for e, w in zip(entries, weights) if e.has_boar)
+            other_total = sum(weights) - boar_total
+            if boar_total > 0 and other_total > 0:
+                p = constants.BOAR_IMAGE_PROBABILITY
+                weights = [
+                    w * p / boar_total if e.has_boar else w * (1 - p) / other_total
+                    for e, w in zip(entries, weights)
+                ]
+        return entries, weights
+
+    def _table(
+        self,
+        split: str,
+        use_bias: bool,
+        min_difficulty: float,
+        max_difficulty: float
+    ) -> Tuple[List[CatalogEntry], AliasTable]:
+        """Tabela em cache; recriada após o TTL (dificuldade observada muda)"""
+        key = (split, use_bias, round(min_difficulty, 3), round(max_difficulty, 3))
+        now = time.monotonic()
+        with self._lock:
+            cached = self._tables.get(key)
+            if cached is not None and now - cached[0] < settings.SAMPLER_TABLE_TTL_SECONDS:
+                self._tables.move_to_end(key)
+                record_cache("sampler_table", True)
+                return cached[1], cached[2]
+        record_cache("sampler_table", False)
+
+        entries, weights = self._weights(self.catalog(split), use_bias, min_difficulty, max_difficulty)
+        if not entries:
+            raise ValueError("Nenhuma imagem encontrada na faixa de dificuldade")
+        table = AliasTable(weights)
+
+        with self._lock:
+            self._tables[key] = (now, entries, table)
+            self._tables.move_to_end(key)
+            while len(self._tables) > constants.SAMPLER_TABLE_CACHE_SIZE:
+                self._tables.popitem(last=False)
+        return entries, table
+
+    # ===========================================
+    # Sorteio
+    # ===========================================
+
+    def draw(
+        self,
+        split: str = "test",
+        rng: Optional[random.Random] = None,
+        exclude: Collection[str] = (),
+        use_bias: bool = True,
+        min_difficulty: float = 0.0,
+        max_difficulty: float = 1.0
+    ) -> CatalogEntry:
+        """
+        Sorteia uma imagem
+
+        Args:
+            split: 'test', 'valid' ou 'train'
+            rng: Gerador (ex: semeado pela sessão); padrão: módulo `random`
+            exclude: Nomes de imagens já vistas (não se repetem enquanto
+                     houver outra candidata)
+            use_bias: Aplica o viés para imagens com javali
+            min_difficulty, max_difficulty: Faixa de dificuldade (0-1)
+
+        Raises:
+            ValueError: nenhuma imagem no split/faixa
+        """
+        rng = rng or random
+        entries, table = self._table(split, use_bias, min_difficulty, max_difficulty)
+
+        for _ in range(constants.SAMPLER_MAX_REJECTIONS):
+            entry = entries[table.draw(rng)]
+            if entry.name not in exclude:
+                return entry
+
+        # Quase tudo já visto: sorteia entre as restantes (ou repete, se não houver)
+        remaining = [e for e in entries if e.name not in exclude]
+        return rng.choice(remaining or entries)
+
+
+# Instância global
+image_sampler = ImageSampler()
@@ -0,0 +1,321 @@
+"""
+Serviço de Placar de Líderes
+
+O placar fica em `LeaderboardDB` (uma linha por jogador e por placar:
+geral, diário e semanal), gravado por upsert via fila write-behind.
+Um cache top-N em memória por placar é atualizado incrementalmente quando
+um jogo termina, então a leitura das primeiras páginas não consulta o banco.
+Páginas além do cache usam o índice (board, score, player_name), sem
+ordenação completa. Resultados ainda na fila de escrita são guardados à
+parte e aplicados sobre o que vem do banco (recarga do cache e linha de
+um jogador fora do top-N).
+"""
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, select
+
+from ..models.database import LeaderboardDB
+from ..models.schemas import LeaderboardEntry
+from ..config import settings
+from .storage_service import storage_service
+from .metrics_service import record_cache
+
+
+# Placares disponíveis e como derivar a chave do período
+LEADERBOARD_PERIODS = ("all", "daily", "weekly")
+
+
+def board_key(period: str, at: Optional[datetime] = None) -> str:
+    """Chave do placar para um período ('all', 'daily:2026-10-19', 'weekly:2026-W42')"""
+    at = at or datetime.utcnow()
+    if period == "daily":
+        return f"daily:{at.strftime('%Y-%m-%d')}"
+    if period == "weekly":
+        year, week, _ = at.isocalendar()
+        return f"weekly:{year}-W{week:02d}"
+    if period == "all":
+        return "all"
+    raise ValueError(f"Período inválido: {period}. Use: {', '.join(LEADERBOARD_PERIODS)}")
+
+
+def _leaderboard_updates(stmt, columns):
+    """SET do upsert: guarda a melhor pontuação e acumula partidas"""
+    excluded = stmt.excluded
+    is_better = excluded.score > LeaderboardDB.score
+    return {
+        "score": case((is_better, excluded.score), else_=LeaderboardDB.score),
+        "accuracy": case((is_better, excluded.accuracy), else_=LeaderboardDB.accuracy),
+        "best_streak": case(
+            (excluded.best_streak > LeaderboardDB.best_streak, excluded.best_streak),
+            else_=LeaderboardDB.best_streak
+        ),
+        "games_played": LeaderboardDB.games_played + excluded.games_played,
+        "updated_at": excluded.updated_at,
+    }
+
+
+class BoardCache:
+    """Top-N de um placar, ordenado por pontuação (maior primeiro)"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.entries: List[Dict] = []
+        self.by_player: Dict[str, Dict] = {}
+        # True quando o cache contém o placar inteiro (menos de N jogadores)
+        self.complete = True
+        self.loaded_at = time.monotonic()
+
+    def load(self, rows: List[Dict], complete: bool):
+        """Substitui o conteúdo pelo resultado de uma consulta ao banco"""
+        self.entries = rows[:self.size]
+        self.by_player = {e["player_name"]: e for e in self.entries}
+        self.complete = complete
+        self.loaded_at = time.monotonic()
+
+    def _sort(self):
+        # Mesma ordem do índice (score, player_name) percorrido de trás para frente
+        self.entries.sort(key=lambda e: (e["score"], e["player_name"]), reverse=True)
+
+    def _trim(self):
+        self._sort()
+        if len(self.entries) > self.size:
+            for dropped in self.entries[self.size:]:
+                self.by_player.pop(dropped["player_name"], None)
+            del self.entries[self.size:]
+            self.complete = False
+
+    def _fits(self, score: int) -> bool:
+        return len(self.entries) < self.size or score > self.entries[-1]["score"]
+
+    def record(self, player_name: str, score: int, accuracy: float, streak: int,
+               previous: Optional[Dict] = None) -> Dict:
+        """
+        Aplica o resultado de uma partida
+
+        Args:
+            previous: Linha atual do jogador no banco, quando ele não está no
+                      cache (para manter partidas e recordes exatos)
+
+        Returns:
+            Linha atualizada do jogador (mesmo se ficou fora do top-N)
+        """
+        entry = self.by_player.get(player_name)
+        is_new = entry is None
+        if is_new:
+            entry = dict(previous) if previous else {
+                "player_name": player_name, "score": score, "accuracy": accuracy,
+                "games_played": 0, "best_streak": 0,
+            }
+
+        entry["games_played"] += 1
+        entry["best_streak"] = max(entry["best_streak"], streak)
+        if score > entry["score"]:
+            entry["score"], entry["accuracy"] = score, accuracy
+
+        if is_new:
+            # Só entra se couber no top-N
+            if not self._fits(entry["score"]):
+                self.complete = False
+                return entry
+            self.entries.append(entry)
+            self.by_player[player_name] = entry
+
+        self._trim()
+        return entry
+
+    def merge(self, row: Dict):
+        """
+        Junta uma linha ainda na fila de escrita ao conteúdo vindo do banco
+
+        A consulta pode ou não já ter visto a linha; como pontuação, sequência
+        e partidas só crescem, cada campo fica com o maior valor.
+        """
+        entry = self.by_player.get(row["player_name"])
+        if entry is None:
+            if not self._fits(row["score"]):
+                self.complete = False
+                return
+            entry = dict(row)
+            self.entries.append(entry)
+            self.by_player[entry["player_name"]] = entry
+        else:
+            if row["score"] > entry["score"]:
+                entry["score"], entry["accuracy"] = row["score"], row["accuracy"]
+            entry["games_played"] = max(entry["games_played"], row["games_played"])
+            entry["best_streak"] = max(entry["best_streak"], row["best_streak"])
+        self._trim()
+
+
+class LeaderboardService:
+    """Placar de líderes com cache top-N incremental"""
+
+    def __init__(self):
+        self.cache_size = settings.LEADERBOARD_CACHE_SIZE
+        self.boards: Dict[str, BoardCache] = {}
+        # Linhas gravadas por este worker que ainda estão na fila de escrita:
+        # (placar, jogador) -> (posição na fila, linha após a partida)
+        self._unsettled: "OrderedDict[Tuple[str, str], Tuple[int, Dict]]" = OrderedDict()
+        storage_service.register_upsert(
+            LeaderboardDB, ["board", "player_name"], updates=_leaderboard_updates, merge=False
+        )
+
+    def _is_stale(self, cache: BoardCache) -> bool:
+        """Outros workers também gravam no placar; recarrega após o TTL"""
+        ttl = settings.LEADERBOARD_CACHE_TTL_SECONDS
+        return storage_service.enabled and ttl > 0 and time.monotonic() - cache.loaded_at > ttl
+
+    def _prune_unsettled(self):
+        """Esquece as linhas que a fila já gravou (a ordem segue a posição)"""
+        while self._unsettled:
+            key = next(iter(self._unsettled))
+            if not storage_service.is_settled(self._unsettled[key][0]):
+                break
+            del self._unsettled[key]
+
+    def _pending_rows(self, key: str) -> List[Dict]:
+        return [row for (board, _), (_, row) in self._unsettled.items() if board == key]
+
+    async def _load_board(self, key: str) -> BoardCache:
+        """
+        Carrega o top-N de um placar pelo índice (board, score)
+
+        Linhas ainda na fila antes ou durante a consulta podem não estar no
+        resultado e são mescladas por cima, então a recarga não apaga
+        partidas recentes deste worker.
+        """
+        cache = BoardCache(self.cache_size)
+        if storage_service.enabled:
+            pending = self._pending_rows(key)
+            rows = await self._query(key, offset=0, limit=self.cache_size + 1)
+            cache.load(rows, complete=len(rows) <= self.cache_size)
+            for row in [*pending, *self._pending_rows(key)]:
+                cache.merge(row)
+        self.boards[key] = cache
+        self._evict_ended()
+        return cache
+
+    def _evict_ended(self):
+        """Descarta os caches de placares diários/semanais de períodos encerrados"""
+        current = {board_key(period) for period in LEADERBOARD_PERIODS}
+        for key in [k for k in self.boards if k not in current]:
+            del self.boards[key]
+
+    async def _get_board(self, key: str) -> BoardCache:
+        cache = self.boards.get(key)
+        if cache is None or self._is_stale(cache):
+            cache = await self._load_board(key)
+        return cache
+
+    async def warm(self):
+        """Pré-carrega os placares do período atual (chamado no startup)"""
+        self.boards.clear()
+        for period in LEADERBOARD_PERIODS:
+            await self._load_board(board_key(period))
+
+    async def _query(self, key: str, offset: int, limit: int) -> List[Dict]:
+        """Página do placar direto do banco (varredura do índice, sem sort)"""
+        stmt = (
+            select(LeaderboardDB)
+            .where(LeaderboardDB.board == key)
+            .order_by(LeaderboardDB.score.desc(), LeaderboardDB.player_name.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        async with storage_service.session() as db:
+            rows = (await db.execute(stmt)).scalars().all()
+        return [self._row_to_dict(r) for r in rows]
+
+    async def _fetch_player(self, key: str, player_name: str) -> Optional[Dict]:
+        """
+        Linha de um jogador (índice único board + player_name)
+
+        Se este worker tem uma partida do jogador ainda na fila, a linha
+        guardada após ela é mais nova que a do banco.
+        """
+        if not storage_service.enabled:
+            return None
+        pending = self._unsettled.get((key, player_name))
+        if pending is not None and not storage_service.is_settled(pending[0]):
+            return dict(pending[1])
+        stmt = select(LeaderboardDB).where(
+            LeaderboardDB.board == key, LeaderboardDB.player_name == player_name
+        )
+        async with storage_service.session() as db:
+            row = (await db.execute(stmt)).scalars().first()
+        return self._row_to_dict(row) if row else None
+
+    @staticmethod
+    def _row_to_dict(row: LeaderboardDB) -> Dict:
+        return {
+            "player_name": row.player_name,
+            "score": row.score or 0,
+            "accuracy": row.accuracy or 0.0,
+            "games_played": row.games_played or 0,
+            "best_streak": row.best_streak or 0,
+        }
+
+    async def record_game(self, player_name: Optional[str], score: int, accuracy: float, streak: int):
+        """
+        Registra o resultado de uma partida em todos os placares
+
+        Jogadores anônimos não entram no placar.
+        """
+        if not player_name:
+            return
+
+        now = datetime.utcnow()
+        for period in LEADERBOARD_PERIODS:
+            key = board_key(period, now)
+            cache = await self._get_board(key)
+
+            previous = None
+            if player_name not in cache.by_player and not cache.complete:
+                previous = await self._fetch_player(key, player_name)
+                # O placar pode ter sido recarregado durante a consulta
+                cache = self.boards.get(key, cache)
+            entry = cache.record(player_name, score, accuracy, streak, previous)
+
+            storage_service.enqueue(LeaderboardDB, {
+                "board": key,
+                "player_name": player_name,
+                "score": score,
+                "accuracy": accuracy,
+                "games_played": 1,
+                "best_streak": streak,
+                "created_at": now,
+                "updated_at": now,
+            }, upsert=True)
+            if storage_service.enabled:
+                self._unsettled[(key, player_name)] = (storage_service.rows_queued, dict(entry))
+                self._unsettled.move_to_end((key, player_name))
+
+        self._prune_unsettled()
+
+    async def get_page(self, period: str = "all", offset: int = 0, limit: int = 10) -> List[LeaderboardEntry]:
+        """
+        Página do placar
+
+        Servida do cache quando a página cabe no top-N (ou o cache contém o
+        placar inteiro); caso contrário, consulta o banco pelo índice.
+        """
+        key = board_key(period)
+        cache = await self._get_board(key)
+
+        hit = offset + limit <= len(cache.entries) or cache.complete or not storage_service.enabled
+        record_cache("leaderboard", hit)
+        if hit:
+            rows = cache.entries[offset:offset + limit]
+        else:
+            rows = await self._query(key, offset, limit)
+
+        return [
+            LeaderboardEntry(rank=offset + i + 1, **row)
+            for i, row in enumerate(rows)
+        ]
+
+
+# Instância global
+leaderboard_service = LeaderboardService()
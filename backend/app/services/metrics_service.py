@@ -0,0 +1,209 @@
+"""
+Serviço de Métricas (formato de texto do Prometheus)
+
+Contadores, gauges e histogramas em memória, sem dependências externas,
+expostos em `/metrics`. Registrar uma observação custa uma busca em
+dicionário e alguns incrementos sob uma trava curta, então pode ser usado
+no caminho do clique. Gauges calculados (sessões ativas, fila de gravação)
+são avaliados só quando `/metrics` é lido.
+
+Métricas são por processo: com vários workers, o Prometheus coleta cada um
+(ou agrega pelos rótulos da instância).
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .. import constants
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Valor que só cresce, por combinação de rótulos"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self.values.items())
+        return self.header() + [
+            f"{self.name}{_label_text(self.labels, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    """Valor que sobe e desce (ex: requisições em andamento)"""
+
+    kind = "gauge"
+
+    def set(self, value: float, *label_values: str):
+        with self._lock:
+            self.values[label_values] = value
+
+    def dec(self, *label_values: str, amount: float = 1.0):
+        self.inc(*label_values, amount=-amount)
+
+
+class CallbackGauge(_Metric):
+    """Gauge calculado na coleta (função sem argumentos)"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], float]):
+        super().__init__(name, help_text)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.fn())
+        except Exception:
+            return []
+        return self.header() + [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """Histograma com buckets fixos (cumulativos na exposição)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = constants.METRICS_LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # rótulos -> [contagem por bucket (+Inf no fim), soma]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self.values.get(label_values)
+            if entry is None:
+                entry = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, *label_values: str) -> Iterator[None]:
+        """Cronometra o bloco (segundos)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self.values.items())
+
+        lines = self.header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro das métricas do processo"""
+
+    def __init__(self, prefix: str = constants.METRICS_PREFIX):
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(f"{self.prefix}{name}", help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(f"{self.prefix}{name}", help_text, labels))
+
+    def callback_gauge(self, name: str, help_text: str, fn: Callable[[], float]) -> CallbackGauge:
+        return self._register(CallbackGauge(f"{self.prefix}{name}", help_text, fn))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Optional[Sequence[float]] = None) -> Histogram:
+        buckets = buckets or constants.METRICS_LATENCY_BUCKETS
+        return self._register(Histogram(f"{self.prefix}{name}", help_text, labels, buckets))
+
+    def render(self) -> str:
+        """Todas as métricas no formato de texto do Prometheus (0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Instância global e métricas compartilhadas pelos serviços
+metrics = MetricsRegistry()
+
+# Etapas internas dos serviços (decode, inference, postprocess, serialize...)
+stage_seconds = metrics.histogram(
+    "stage_duration_seconds", "Duração das etapas internas dos serviços", ("service", "stage")
+)
+
+# Acertos de cache (razão = hit / (hit + miss))
+cache_requests = metrics.counter(
+    "cache_requests_total", "Consultas aos caches em memória", ("cache", "result")
+)
+
+
+def record_cache(cache: str, hit: bool):
+    """Conta uma consulta a um cache"""
+    cache_requests.inc(cache, "hit" if hit else "miss")
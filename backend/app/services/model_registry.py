@@ -0,0 +1,336 @@
+"""
+Registro de Modelos de Segmentação
+
+Mantém várias versões e formatos do modelo (pt, onnx, quantizado) e permite:
+- Troca atômica (hot reload) quando um arquivo novo/alterado aparece
+- Roteamento de uma porcentagem do tráfego para um modelo canário
+- Métricas por modelo (latência e nº de detecções) lado a lado
+
+Requisições em andamento mantêm a referência ao modelo que receberam em
+`select()`, então uma troca nunca interrompe uma inferência já iniciada.
+"""
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    from ultralytics import YOLO
+    YOLO_AVAILABLE = True
+except ImportError:
+    YOLO_AVAILABLE = False
+
+from ..config import settings
+from .. import constants
+from .stub_model import StubSegmentationModel
+
+
+def _detect_format(path: Path) -> str:
+    """Identifica o formato do modelo pelo nome do arquivo"""
+    model_format = constants.MODEL_FORMATS.get(path.suffix.lower(), "unknown")
+    stem = path.stem.lower()
+    if any(tag in stem for tag in constants.MODEL_QUANTIZED_TAGS):
+        model_format = f"{model_format}-int8"
+    return model_format
+
+
+class ModelEntry:
+    """Uma versão de modelo registrada (arquivo + modelo carregado + métricas)"""
+
+    def __init__(self, name: str, path: Path):
+        self.name = name
+        self.path = path
+        self.format = _detect_format(path)
+        self.model = None
+        self.loaded_at: Optional[float] = None
+        self.file_signature: Optional[tuple] = None
+
+        # Métricas acumuladas
+        self._metrics_lock = threading.Lock()
+        self.requests = 0
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.total_detections = 0
+
+    def load(self):
+        """Carrega o modelo do disco (bloqueante - chame fora do caminho da requisição)"""
+        self.model = YOLO(str(self.path), task="segment")
+        self.file_signature = _file_signature(self.path)
+        self.loaded_at = time.time()
+
+    def record(self, latency_ms: float, detections: int):
+        """Registra uma inferência feita com este modelo"""
+        with self._metrics_lock:
+            self.requests += 1
+            self.total_latency_ms += latency_ms
+            self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+            self.total_detections += detections
+
+    def metrics(self) -> Dict:
+        """Retorna métricas agregadas do modelo"""
+        with self._metrics_lock:
+            requests = self.requests
+            return {
+                "requests": requests,
+                "avg_latency_ms": round(self.total_latency_ms / requests, 2) if requests else 0.0,
+                "max_latency_ms": round(self.max_latency_ms, 2),
+                "avg_detections": round(self.total_detections / requests, 3) if requests else 0.0,
+            }
+
+    def describe(self) -> Dict:
+        """Resumo serializável da entrada"""
+        return {
+            "name": self.name,
+            "path": str(self.path),
+            "format": self.format,
+            "loaded": self.model is not None,
+            "loaded_at": self.loaded_at,
+            "metrics": self.metrics(),
+        }
+
+
+def _file_signature(path: Path) -> Optional[tuple]:
+    """Assinatura (mtime, tamanho) usada para detectar arquivos alterados"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class ModelRegistry:
+    """Registro de modelos com hot reload e roteamento canário"""
+
+    def __init__(self):
+        self.models_dir: Path = settings.ML_MODELS_DIR
+        self.entries: Dict[str, ModelEntry] = {}
+
+        # Nomes dos modelos ativos
+        self.primary_name: Optional[str] = None
+        self.canary_name: Optional[str] = None
+        self.canary_percent: float = settings.MODEL_CANARY_PERCENT
+
+        # Protege trocas de primário/canário e o dicionário de entradas
+        self._lock = threading.Lock()
+
+        # Arquivos vistos na última varredura (aguardam estabilizar antes de carregar)
+        self._pending_signatures: Dict[str, tuple] = {}
+
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    # ===========================================
+    # Carregamento
+    # ===========================================
+
+    def load(self):
+        """Descobre os modelos disponíveis e carrega primário e canário"""
+        if settings.MODEL_STUB:
+            self.load_stub(settings.MODEL_STUB_LATENCY_MS)
+            return
+
+        if not YOLO_AVAILABLE:
+            print("⚠️ YOLO não disponível. Instale: pip install ultralytics")
+            return
+
+        self._discover()
+
+        primary = self.entries.get(settings.MODEL_FILENAME)
+        if primary is None:
+            print(f"❌ Modelo {settings.MODEL_FILENAME} não encontrado em: {self.models_dir}")
+            print("   Execute o treinamento com: python ml/training/train_segmentation.py")
+        elif self._load_entry(primary):
+            self.primary_name = primary.name
+            print(f"✅ Modelo Agriculture carregado: {primary.name} ({primary.format})")
+            print(f"   Classes: {list(constants.MODEL_CLASSES.values())}")
+
+        if settings.MODEL_CANARY_FILENAME:
+            try:
+                self.set_canary(settings.MODEL_CANARY_FILENAME, self.canary_percent)
+            except ValueError as e:
+                print(f"⚠️ Canário não ativado: {e}")
+
+    def load_stub(self, latency_ms: float = 0.0):
+        """Registra o modelo stub como primário (não depende de pesos nem do YOLO)"""
+        entry = ModelEntry("stub", Path("stub"))
+        entry.format = "stub"
+        entry.model = StubSegmentationModel(latency_ms)
+        entry.loaded_at = time.time()
+        with self._lock:
+            self.entries[entry.name] = entry
+            self.primary_name = entry.name
+        print(f"🧪 Modelo stub ativo (detecções sintéticas, {latency_ms:.0f} ms por imagem)")
+
+    def _discover(self) -> List[str]:
+        """Registra arquivos de modelo novos; retorna os nomes adicionados"""
+        added = []
+        if not self.models_dir.exists():
+            return added
+
+        for pattern in constants.MODEL_FILE_PATTERNS:
+            for path in self.models_dir.glob(pattern):
+                if path.suffix.lower() not in constants.MODEL_FORMATS:
+                    continue
+                with self._lock:
+                    if path.name not in self.entries:
+                        self.entries[path.name] = ModelEntry(path.name, path)
+                        added.append(path.name)
+        return added
+
+    def _load_entry(self, entry: ModelEntry) -> bool:
+        """Carrega uma entrada, tratando erros de leitura"""
+        try:
+            entry.load()
+            return True
+        except Exception as e:
+            print(f"❌ Erro ao carregar modelo {entry.name}: {e}")
+            return False
+
+    # ===========================================
+    # Seleção (caminho da requisição)
+    # ===========================================
+
+    @property
+    def primary(self) -> Optional[ModelEntry]:
+        """Entrada do modelo primário carregado (ou None)"""
+        entry = self.entries.get(self.primary_name) if self.primary_name else None
+        return entry if entry is not None and entry.model is not None else None
+
+    @property
+    def canary(self) -> Optional[ModelEntry]:
+        """Entrada do modelo canário carregado (ou None)"""
+        entry = self.entries.get(self.canary_name) if self.canary_name else None
+        return entry if entry is not None and entry.model is not None else None
+
+    def select(self) -> Optional[ModelEntry]:
+        """
+        Escolhe o modelo para uma requisição
+
+        Uma fração `canary_percent` do tráfego vai para o canário. O chamador
+        deve usar `entry.model` capturado aqui até o fim da inferência.
+        """
+        canary = self.canary
+        if canary is not None and random.random() * 100 < self.canary_percent:
+            return canary
+        return self.primary
+
+    # ===========================================
+    # Administração
+    # ===========================================
+
+    def _get_loaded(self, name: str) -> ModelEntry:
+        """Obtém uma entrada carregando-a se necessário"""
+        self._discover()
+        entry = self.entries.get(name)
+        if entry is None:
+            raise ValueError(f"Modelo {name} não encontrado em {self.models_dir}")
+        if entry.model is None and not self._load_entry(entry):
+            raise ValueError(f"Falha ao carregar modelo {name}")
+        return entry
+
+    def set_primary(self, name: str) -> ModelEntry:
+        """Promove um modelo a primário (troca atômica)"""
+        entry = self._get_loaded(name)
+        with self._lock:
+            self.primary_name = entry.name
+            if self.canary_name == entry.name:
+                self.canary_name = None
+        print(f"🔁 Modelo primário: {entry.name}")
+        return entry
+
+    def set_canary(self, name: Optional[str], percent: float) -> Optional[ModelEntry]:
+        """Define (ou remove, com name=None) o modelo canário"""
+        if not 0.0 <= percent <= 100.0:
+            raise ValueError("Porcentagem do canário deve estar entre 0 e 100")
+
+        entry = self._get_loaded(name) if name else None
+        with self._lock:
+            self.canary_name = entry.name if entry else None
+            self.canary_percent = percent if entry else 0.0
+        if entry:
+            print(f"🐤 Canário: {entry.name} ({percent:.1f}% do tráfego)")
+        return entry
+
+    def describe(self) -> Dict:
+        """Estado do registro com métricas de cada modelo lado a lado"""
+        with self._lock:
+            entries = list(self.entries.values())
+        return {
+            "primary": self.primary_name,
+            "canary": self.canary_name,
+            "canary_percent": self.canary_percent,
+            "models": [entry.describe() for entry in entries],
+        }
+
+    # ===========================================
+    # Hot reload
+    # ===========================================
+
+    def check_for_updates(self):
+        """
+        Varre o diretório de modelos e recarrega arquivos alterados
+
+        Um arquivo só é (re)carregado depois de manter a mesma assinatura por
+        duas varreduras seguidas, evitando ler uma cópia ainda em andamento.
+        O modelo novo é carregado ao lado do antigo e só então substituído.
+        """
+        for name in self._discover():
+            print(f"📦 Novo modelo disponível: {name}")
+
+        with self._lock:
+            active = [n for n in (self.primary_name, self.canary_name) if n]
+
+        for name in active:
+            entry = self.entries.get(name)
+            if entry is None:
+                continue
+
+            signature = _file_signature(entry.path)
+            if signature is None or signature == entry.file_signature:
+                self._pending_signatures.pop(name, None)
+                continue
+
+            if self._pending_signatures.get(name) != signature:
+                # Primeira vez que vemos esta versão: espera estabilizar
+                self._pending_signatures[name] = signature
+                continue
+
+            replacement = ModelEntry(entry.name, entry.path)
+            if self._load_entry(replacement):
+                with self._lock:
+                    self.entries[name] = replacement
+                self._pending_signatures.pop(name, None)
+                print(f"🔄 Modelo recarregado: {name}")
+
+    def _watch(self, interval: float):
+        """Loop do watcher em thread de background"""
+        while not self._stop_event.wait(interval):
+            try:
+                self.check_for_updates()
+            except Exception as e:
+                print(f"⚠️ Erro no hot reload de modelos: {e}")
+
+    def start_watcher(self, interval: Optional[float] = None):
+        """Inicia a verificação periódica de novos arquivos de modelo"""
+        interval = interval or settings.MODEL_RELOAD_INTERVAL_SECONDS
+        if interval <= 0 or self._watcher is not None:
+            return
+
+        self._stop_event.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), name="model-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watcher(self):
+        """Para o watcher de hot reload"""
+        if self._watcher is None:
+            return
+        self._stop_event.set()
+        self._watcher.join(timeout=5)
+        self._watcher = None
+
+
+# Instância global do registro
+model_registry = ModelRegistry()
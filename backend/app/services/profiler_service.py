@@ -0,0 +1,197 @@
+"""
+Profiler por Amostragem (diagnóstico em produção)
+
+Uma thread lê as pilhas de todas as threads do processo
+(`sys._current_frames`) a cada intervalo, mas só enquanto houver uma
+requisição selecionada em andamento: o `ProfilerMiddleware` escolhe 1 a cada
+N requisições das rotas pedidas (detecção e jogo por padrão). Assim o custo
+fica limitado à janela ligada e a amostra reflete o trabalho dessas rotas,
+inclusive o que roda no threadpool.
+
+A janela tem duração máxima; ao terminar, as pilhas são gravadas no formato
+"collapsed" (`frame;frame;frame contagem`), aceito por flamegraph.pl,
+speedscope e similares.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from ..config import settings
+from .. import constants
+
+
+# Módulos que, no topo da pilha, indicam thread ociosa (esperando trabalho/E-S)
+IDLE_MODULES = {"threading.py", "selectors.py", "queue.py"}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Janela de amostragem estatística ligada/desligada em tempo de execução"""
+
+    def __init__(self, output_dir: Optional[Path] = None):
+        self.output_dir = output_dir or settings.PROFILES_DIR
+        self.active = False
+        self.route_prefixes: Sequence[str] = constants.PROFILER_ROUTE_PREFIXES
+        self.sample_one_in = 1
+        self.interval = constants.PROFILER_INTERVAL_MS / 1000
+
+        self._lock = threading.Lock()
+        self._stacks: Counter = Counter()
+        self._selected_in_flight = 0
+        self._request_counter = 0
+        self._samples = 0
+        self._started_at = 0.0
+        self._deadline = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.last_profile: Optional[Dict] = None
+
+    # ===========================================
+    # Controle da janela
+    # ===========================================
+
+    def start(
+        self,
+        duration_seconds: float,
+        interval_ms: float = constants.PROFILER_INTERVAL_MS,
+        sample_one_in: int = 1,
+        route_prefixes: Optional[Sequence[str]] = None
+    ) -> Dict:
+        """
+        Liga a amostragem por `duration_seconds` (limitado a PROFILER_MAX_SECONDS)
+
+        Raises:
+            ValueError: já existe uma janela ativa
+        """
+        with self._lock:
+            if self.active:
+                raise ValueError("Profiler já está ativo")
+            self._stacks = Counter()
+            self._samples = 0
+            self._request_counter = 0
+            self.interval = max(interval_ms, 1.0) / 1000
+            self.sample_one_in = max(sample_one_in, 1)
+            self.route_prefixes = tuple(route_prefixes or constants.PROFILER_ROUTE_PREFIXES)
+            self._started_at = time.time()
+            self._deadline = time.monotonic() + min(duration_seconds, constants.PROFILER_MAX_SECONDS)
+            self._stop_event.clear()
+            self.active = True
+
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        print(f"🔬 Profiler ligado por {min(duration_seconds, constants.PROFILER_MAX_SECONDS):.0f} s")
+        return self.status()
+
+    def stop(self) -> Optional[Dict]:
+        """Encerra a janela atual (se houver) e retorna o perfil gravado"""
+        thread = self._thread
+        if thread is None:
+            return self.last_profile
+        self._stop_event.set()
+        thread.join(timeout=5)
+        return self.last_profile
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "active": self.active,
+                "started_at": datetime.fromtimestamp(self._started_at).isoformat() if self.active else None,
+                "remaining_seconds": round(max(self._deadline - time.monotonic(), 0.0), 1) if self.active else 0.0,
+                "interval_ms": self.interval * 1000,
+                "sample_one_in": self.sample_one_in,
+                "route_prefixes": list(self.route_prefixes),
+                "samples": self._samples,
+                "last_profile": self.last_profile,
+            }
+
+    def list_profiles(self) -> List[Dict]:
+        if not self.output_dir.exists():
+            return []
+        return [
+            {"file": path.name, "bytes": path.stat().st_size}
+            for path in sorted(self.output_dir.glob("*.collapsed"), reverse=True)
+        ]
+
+    # ===========================================
+    # Seleção de requisições (chamado pelo middleware)
+    # ===========================================
+
+    def enter(self, path: str) -> bool:
+        """Marca o início de uma requisição; True se ela foi selecionada"""
+        if not path.startswith(tuple(self.route_prefixes)):
+            return False
+        with self._lock:
+            if not self.active:
+                return False
+            self._request_counter += 1
+            if self._request_counter % self.sample_one_in:
+                return False
+            self._selected_in_flight += 1
+            return True
+
+    def exit(self):
+        with self._lock:
+            self._selected_in_flight = max(self._selected_in_flight - 1, 0)
+
+    # ===========================================
+    # Amostragem
+    # ===========================================
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        try:
+            while not self._stop_event.wait(self.interval) and time.monotonic() < self._deadline:
+                if not self._selected_in_flight:
+                    continue
+                if len(names) != threading.active_count():
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                self._sample(sys._current_frames(), own_id, names)
+        finally:
+            self._finish()
+
+    def _sample(self, frames: Dict, own_id: int, names: Dict[int, str]):
+        stacks = []
+        for thread_id, frame in frames.items():
+            if thread_id == own_id or Path(frame.f_code.co_filename).name in IDLE_MODULES:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(thread_id, f"thread-{thread_id}"))
+            stacks.append(";".join(reversed(labels)))
+
+        with self._lock:
+            self._samples += 1
+            self._stacks.update(stacks)
+
+    def _finish(self):
+        """Grava as pilhas em formato collapsed e desliga a janela"""
+        with self._lock:
+            stacks, samples = self._stacks, self._samples
+            self._stacks = Counter()
+            self.active = False
+            self._selected_in_flight = 0
+            self._thread = None
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.collapsed"
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        self.last_profile = {"file": path.name, "samples": samples, "stacks": len(stacks)}
+        print(f"🔬 Profiler desligado: {samples} amostras em {path}")
+
+
+# Instância global
+profiler = SamplingProfiler()
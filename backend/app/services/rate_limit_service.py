@@ -0,0 +1,280 @@
+"""
+Limite de Taxa por Cliente (token bucket)
+
+Cada regra de rota tem um balde por sessão e/ou por IP do cliente: o balde
+enche `rate` fichas por segundo até `burst`, e cada requisição gasta uma.
+Sem ficha, a requisição é recusada (429 + Retry-After) no middleware, antes
+do roteamento e da leitura do corpo.
+
+Backends plugáveis, como o estado das sessões:
+- InMemoryRateLimitBackend: dicionário no processo (um único worker)
+- SQLiteRateLimitBackend: arquivo SQLite compartilhado entre os workers do
+  uvicorn na mesma máquina (o limite vale para o conjunto); como faz I/O,
+  é consultado no threadpool (`blocking`) e, com o arquivo travado por
+  outro worker além de um prazo curto, deixa a requisição passar
+"""
+import math
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Balde de uma consulta: (chave, fichas por segundo, capacidade)
+Bucket = Tuple[str, float, float]
+
+from ..config import settings
+from .metrics_service import metrics
+
+
+class RateLimitExceeded(Exception):
+    """Requisição acima do limite; `retry_after` em segundos"""
+
+    def __init__(self, rule: str, scope: str, retry_after: int):
+        super().__init__(f"{rule}/{scope}")
+        self.rule = rule
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class RateLimitBackend:
+    """Interface dos backends de baldes"""
+
+    # Se a consulta faz I/O (deve sair do event loop)
+    blocking = False
+
+    def take(self, buckets: Sequence[Bucket], now: float) -> Tuple[int, float]:
+        """
+        Gasta uma ficha de cada balde, só se todos tiverem ficha
+
+        Returns:
+            (-1, 0.0) se gastou, senão (índice do primeiro balde vazio,
+            segundos até a próxima ficha dele)
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _first_empty(tokens: Sequence[float], buckets: Sequence[Bucket]) -> Tuple[int, float]:
+        for index, (value, (_, rate, _)) in enumerate(zip(tokens, buckets)):
+            if value < 1.0:
+                return index, (1.0 - value) / rate
+        return -1, 0.0
+
+    @staticmethod
+    def _refill(tokens: float, updated: float, rate: float, burst: float, now: float) -> float:
+        return min(burst, tokens + (now - updated) * rate)
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Baldes em memória do processo; baldes cheios antigos são descartados"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, buckets: Sequence[Bucket], now: float) -> Tuple[int, float]:
+        with self._lock:
+            states, tokens = [], []
+            for key, rate, burst in buckets:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    if len(self._buckets) >= self.max_keys:
+                        self._prune(now)
+                    bucket = self._buckets[key] = [burst, now]
+                states.append(bucket)
+                tokens.append(self._refill(bucket[0], bucket[1], rate, burst, now))
+
+            index, wait = self._first_empty(tokens, buckets)
+            for bucket, value in zip(states, tokens):
+                bucket[0] = value - 1.0 if index < 0 else value
+                bucket[1] = now
+            return index, wait
+
+    def _prune(self, now: float):
+        # Um balde parado há mais de 60 s equivale a um balde novo (cheio)
+        stale = [key for key, (_, updated) in self._buckets.items() if now - updated > 60.0]
+        for key in stale:
+            del self._buckets[key]
+        if len(self._buckets) >= self.max_keys:
+            self._buckets.clear()
+
+
+class SQLiteRateLimitBackend(RateLimitBackend):
+    """
+    Baldes em um arquivo SQLite (WAL) compartilhado entre workers
+
+    Cada consulta é uma transação curta (BEGIN IMMEDIATE), então dois
+    workers nunca gastam a mesma ficha. A espera pela trava do arquivo é
+    limitada a `busy_timeout` segundos: passado o prazo, a requisição é
+    liberada (falha aberta) em vez de segurar o worker.
+    """
+
+    blocking = True
+
+    def __init__(self, path: Path, busy_timeout: float = settings.RATE_LIMIT_SQLITE_TIMEOUT_SECONDS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout = busy_timeout
+        self.failed_open = metrics.counter(
+            "rate_limit_failed_open_total", "Consultas liberadas sem limite (arquivo de baldes travado)"
+        )
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS rate_bucket ("
+            " key TEXT PRIMARY KEY,"
+            " tokens REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, buckets: Sequence[Bucket], now: float) -> Tuple[int, float]:
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            # Arquivo travado além do prazo: libera em vez de esperar
+            self.failed_open.inc()
+            return -1, 0.0
+        try:
+            tokens = []
+            for key, rate, burst in buckets:
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM rate_bucket WHERE key = ?", (key,)
+                ).fetchone()
+                tokens.append(self._refill(row[0], row[1], rate, burst, now) if row else burst)
+
+            index, wait = self._first_empty(tokens, buckets)
+            conn.executemany(
+                "INSERT OR REPLACE INTO rate_bucket (key, tokens, updated_at) VALUES (?, ?, ?)",
+                [(key, value - 1.0 if index < 0 else value, now)
+                 for (key, _, _), value in zip(buckets, tokens)]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return index, wait
+
+
+class RateLimitRule:
+    """Regra de uma rota: limite por sessão e/ou por IP"""
+
+    __slots__ = ("name", "pattern", "session_rate", "session_burst", "ip_rate", "ip_burst")
+
+    def __init__(
+        self,
+        name: str,
+        pattern: str,
+        session_rate: float = 0.0,
+        session_burst: float = 0.0,
+        ip_rate: float = 0.0,
+        ip_burst: float = 0.0
+    ):
+        self.name = name
+        # Grupo `session_id` (se houver) identifica o balde da sessão
+        self.pattern = re.compile(pattern)
+        self.session_rate = session_rate
+        self.session_burst = max(session_burst, 1.0)
+        self.ip_rate = ip_rate
+        self.ip_burst = max(ip_burst, 1.0)
+
+
+def default_rules() -> List[RateLimitRule]:
+    """Regras configuradas no Settings (taxa 0 desativa o balde)"""
+    return [
+        RateLimitRule(
+            "click", r"^/api/v1/game/(?P<session_id>[^/]+)/click$",
+            settings.RATE_LIMIT_CLICK_PER_SECOND, settings.RATE_LIMIT_CLICK_BURST,
+            settings.RATE_LIMIT_CLICK_IP_PER_SECOND, settings.RATE_LIMIT_CLICK_IP_BURST,
+        ),
+        RateLimitRule(
+            "round_start", r"^/api/v1/game/(?P<session_id>[^/]+)/round/start$",
+            settings.RATE_LIMIT_ROUND_START_PER_SECOND, settings.RATE_LIMIT_ROUND_START_BURST,
+            settings.RATE_LIMIT_ROUND_START_IP_PER_SECOND, settings.RATE_LIMIT_ROUND_START_IP_BURST,
+        ),
+        RateLimitRule(
+            "detect", r"^/api/v1/(detect(/upload|/batch|/video)?|images/random/analyzed)$",
+            ip_rate=settings.RATE_LIMIT_DETECT_IP_PER_SECOND,
+            ip_burst=settings.RATE_LIMIT_DETECT_IP_BURST,
+        ),
+    ]
+
+
+class RateLimiter:
+    """Aplica as regras de rota sobre o backend configurado"""
+
+    def __init__(self, backend: RateLimitBackend, rules: Sequence[RateLimitRule]):
+        self.backend = backend
+        self.rules = {rule.name: rule for rule in rules}
+        self.rejected = metrics.counter(
+            "rate_limited_total", "Requisições recusadas pelo limite de taxa", ("rule", "scope")
+        )
+
+    def match(self, path: str) -> Tuple[Optional[RateLimitRule], Optional[str]]:
+        """Regra da rota e o session_id do caminho (se a regra tiver)"""
+        for rule in self.rules.values():
+            found = rule.pattern.match(path)
+            if found:
+                return rule, found.groupdict().get("session_id")
+        return None, None
+
+    @property
+    def blocking(self) -> bool:
+        """Se `check` faz I/O (chamar via threadpool)"""
+        return self.backend.blocking
+
+    def check(self, rule: RateLimitRule, session_id: Optional[str], client_ip: Optional[str]):
+        """
+        Gasta uma ficha de cada balde da regra (de nenhum, se algum estiver vazio)
+
+        Raises:
+            RateLimitExceeded: algum balde vazio
+        """
+        scopes, buckets = [], []
+        if session_id and rule.session_rate > 0:
+            scopes.append("session")
+            buckets.append((f"{rule.name}:session:{session_id}", rule.session_rate, rule.session_burst))
+        if client_ip and rule.ip_rate > 0:
+            scopes.append("ip")
+            buckets.append((f"{rule.name}:ip:{client_ip}", rule.ip_rate, rule.ip_burst))
+        if not buckets:
+            return
+
+        index, wait = self.backend.take(buckets, time.time())
+        if index >= 0:
+            self.rejected.inc(rule.name, scopes[index])
+            raise RateLimitExceeded(rule.name, scopes[index], max(1, math.ceil(wait)))
+
+
+def client_ip(scope) -> Optional[str]:
+    """IP do cliente (X-Forwarded-For só com RATE_LIMIT_TRUST_FORWARDED)"""
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+def create_rate_limiter() -> RateLimiter:
+    """Cria o limitador com o backend configurado em RATE_LIMIT_BACKEND"""
+    backend = settings.RATE_LIMIT_BACKEND.lower()
+    if backend == "memory":
+        return RateLimiter(InMemoryRateLimitBackend(), default_rules())
+    if backend == "sqlite":
+        return RateLimiter(SQLiteRateLimitBackend(settings.RATE_LIMIT_PATH), default_rules())
+    raise ValueError(f"RATE_LIMIT_BACKEND inválido: {settings.RATE_LIMIT_BACKEND}")
+
+
+# Instância global
+rate_limiter = create_rate_limiter()
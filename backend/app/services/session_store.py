@@ -0,0 +1,298 @@
+"""
+Armazenamento de Estado das Sessões de Jogo
+
+Interface plugável para o estado por sessão (sessão, estado da IA e
+detecções das rodadas), com duas implementações:
+- InMemorySessionStore: dicionário no processo (um único worker)
+- SQLiteSessionStore: arquivo SQLite em modo WAL compartilhado entre os
+  workers do uvicorn na mesma máquina
+
+As atualizações usam concorrência otimista: cada estado tem uma versão e só
+é gravado se ninguém o alterou desde a leitura; em conflito, a operação é
+reaplicada sobre o estado mais recente. Dentro do processo, atualizações da
+mesma sessão são serializadas por travas listradas (uma trava por faixa de
+sessões), sem uma trava global.
+
+A interface é síncrona (o backend SQLite faz I/O de disco): as rotas
+assíncronas a chamam via `run_in_threadpool`, nunca direto no event loop.
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from ..models.schemas import GameSession
+from ..config import settings
+from .detection_table import DetectionTable
+from .metrics_service import metrics, stage_seconds
+
+
+T = TypeVar("T")
+
+
+# Gravações rejeitadas por versão desatualizada (outro worker/thread gravou antes)
+_conflicts = metrics.counter(
+    "session_store_conflicts_total", "Conflitos de versão ao gravar o estado de sessões"
+)
+
+
+class ConcurrentUpdateError(RuntimeError):
+    """A sessão foi alterada por outro worker em todas as tentativas"""
+
+
+class StripedLock:
+    """
+    Conjunto fixo de travas indexado pelo hash da chave
+    
+    Chaves diferentes raramente disputam a mesma trava; a memória não
+    cresce com o número de sessões.
+    """
+
+    def __init__(self, stripes: int):
+        self._locks = [threading.Lock() for _ in range(max(1, stripes))]
+
+    def for_key(self, key: str) -> threading.Lock:
+        return self._locks[hash(key) % len(self._locks)]
+
+
+class SessionState:
+    """Estado completo de uma sessão"""
+
+    __slots__ = ("session", "ai_state", "detections", "mask_keys", "version")
+
+    def __init__(
+        self,
+        session: GameSession,
+        ai_state: Dict[str, Any],
+        detections: Optional[Dict[str, DetectionTable]] = None,
+        version: int = 0,
+        mask_keys: Optional[Dict[str, str]] = None
+    ):
+        self.session = session
+        self.ai_state = ai_state
+        # Detecções das imagens da sessão (colunares), por image_id
+        self.detections = detections if detections is not None else {}
+        # Chave das máscaras em cache da análise de cada rodada, por image_id
+        self.mask_keys = mask_keys if mask_keys is not None else {}
+        self.version = version
+
+
+# ===========================================
+# Serialização compacta
+# ===========================================
+
+def dumps_state(state: SessionState) -> bytes:
+    """Serializa o estado (JSON compacto + zlib)"""
+    payload = {
+        "s": state.session.model_dump(mode="json"),
+        "a": state.ai_state,
+        "d": {image_id: table.to_payload() for image_id, table in state.detections.items()},
+        "m": state.mask_keys,
+    }
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode(), 1)
+
+
+def loads_state(data: bytes, version: int) -> SessionState:
+    """Reconstrói o estado serializado por `dumps_state`"""
+    payload = json.loads(zlib.decompress(data))
+    return SessionState(
+        session=GameSession.model_validate(payload["s"]),
+        ai_state=payload["a"],
+        detections={
+            image_id: DetectionTable.from_payload(columns)
+            for image_id, columns in payload["d"].items()
+        },
+        version=version,
+        mask_keys=payload.get("m", {})
+    )
+
+
+# ===========================================
+# Interface
+# ===========================================
+
+class SessionStore:
+    """Interface dos backends de estado de sessão"""
+
+    max_retries: int = settings.SESSION_STORE_MAX_RETRIES
+
+    def __init__(self, lock_stripes: int = settings.SESSION_LOCK_STRIPES):
+        self._locks = StripedLock(lock_stripes)
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        """Lê o estado de uma sessão (None se não existir)"""
+        raise NotImplementedError
+
+    def create(self, state: SessionState):
+        """Grava o estado de uma sessão nova"""
+        raise NotImplementedError
+
+    def save(self, state: SessionState) -> bool:
+        """
+        Grava o estado se a versão não mudou desde a leitura
+
+        Returns:
+            True se gravou (e incrementa `state.version`), False em conflito
+        """
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        """Remove uma sessão"""
+        raise NotImplementedError
+
+    def _delete_version(self, state: SessionState) -> bool:
+        """Remove a sessão se a versão não mudou desde a leitura"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Número de sessões armazenadas"""
+        raise NotImplementedError
+
+    def update(self, session_id: str, mutate: Callable[[SessionState], T]) -> T:
+        """
+        Lê, aplica `mutate` e grava com concorrência otimista
+
+        `mutate` pode ser executada mais de uma vez (em conflito), então não
+        deve ter efeitos colaterais fora do estado recebido. Threads do mesmo
+        processo atualizando a mesma sessão esperam umas pelas outras.
+
+        Raises:
+            ValueError: sessão não encontrada
+            ConcurrentUpdateError: conflito em todas as tentativas
+        """
+        with stage_seconds.time("session_store", "update"), self._locks.for_key(session_id):
+            for _ in range(self.max_retries):
+                state = self.get(session_id)
+                if state is None:
+                    raise ValueError("Sessão não encontrada")
+                result = mutate(state)
+                if self.save(state):
+                    return result
+                _conflicts.inc()
+        raise ConcurrentUpdateError("Sessão alterada concorrentemente, tente novamente")
+
+    def pop(self, session_id: str) -> Optional[SessionState]:
+        """
+        Remove e retorna o estado de uma sessão
+
+        Só um chamador recebe o estado (ex: dois pedidos de fim de jogo
+        simultâneos); os demais recebem None.
+        """
+        with self._locks.for_key(session_id):
+            for _ in range(self.max_retries):
+                state = self.get(session_id)
+                if state is None:
+                    return None
+                if self._delete_version(state):
+                    return state
+        raise ConcurrentUpdateError("Sessão alterada concorrentemente, tente novamente")
+
+
+class InMemorySessionStore(SessionStore):
+    """Estado em memória do processo (comportamento original, um worker)"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._states: Dict[str, SessionState] = {}
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        return self._states.get(session_id)
+
+    def create(self, state: SessionState):
+        self._states[state.session.session_id] = state
+
+    def save(self, state: SessionState) -> bool:
+        # O objeto em memória é o próprio estado: não há cópia para conflitar
+        # (a trava da sessão em `update` serializa as alterações)
+        state.version += 1
+        return True
+
+    def delete(self, session_id: str):
+        self._states.pop(session_id, None)
+
+    def _delete_version(self, state: SessionState) -> bool:
+        return self._states.pop(state.session.session_id, None) is not None
+
+    def count(self) -> int:
+        return len(self._states)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Estado em um arquivo SQLite (WAL) compartilhado entre workers
+
+    Cada thread usa a sua conexão; leituras não bloqueiam escritas no WAL.
+    """
+
+    def __init__(self, path: Path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_state ("
+            " id TEXT PRIMARY KEY,"
+            " version INTEGER NOT NULL,"
+            " data BLOB NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        row = self._conn().execute(
+            "SELECT data, version FROM session_state WHERE id = ?", (session_id,)
+        ).fetchone()
+        return loads_state(row[0], row[1]) if row else None
+
+    def create(self, state: SessionState):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO session_state (id, version, data, updated_at) VALUES (?, ?, ?, ?)",
+            (state.session.session_id, state.version, dumps_state(state), time.time())
+        )
+
+    def save(self, state: SessionState) -> bool:
+        cursor = self._conn().execute(
+            "UPDATE session_state SET data = ?, version = version + 1, updated_at = ?"
+            " WHERE id = ? AND version = ?",
+            (dumps_state(state), time.time(), state.session.session_id, state.version)
+        )
+        if cursor.rowcount != 1:
+            return False
+        state.version += 1
+        return True
+
+    def delete(self, session_id: str):
+        self._conn().execute("DELETE FROM session_state WHERE id = ?", (session_id,))
+
+    def _delete_version(self, state: SessionState) -> bool:
+        cursor = self._conn().execute(
+            "DELETE FROM session_state WHERE id = ? AND version = ?",
+            (state.session.session_id, state.version)
+        )
+        return cursor.rowcount == 1
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM session_state").fetchone()[0]
+
+
+def create_session_store() -> SessionStore:
+    """Cria o backend configurado em SESSION_STORE_BACKEND"""
+    backend = settings.SESSION_STORE_BACKEND.lower()
+    if backend == "memory":
+        return InMemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore(settings.SESSION_STORE_PATH)
+    raise ValueError(f"SESSION_STORE_BACKEND inválido: {settings.SESSION_STORE_BACKEND}")
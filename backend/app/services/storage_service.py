@@ -0,0 +1,385 @@
+"""
+Serviço de Persistência Assíncrona (SQLAlchemy + aiosqlite)
+
+Grava sessões, rodadas e cliques nas tabelas de `models/database.py` sem
+adicionar latência ao caminho do jogo: as escritas entram em uma fila
+(write-behind) e uma tarefa de background as descarrega em inserts em lote.
+A fila é drenada por completo no encerramento da aplicação.
+"""
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import inspect, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from ..models.database import Base, GameSessionDB, GameRoundDB, ClickEventDB, LeaderboardDB
+from ..models.schemas import ClickEvent, ClickResult, Detection, GameResult, GameRound, GameSession
+from ..config import settings
+
+
+# Sentinela que encerra a tarefa de escrita
+_STOP = object()
+
+
+def _migrate_leaderboard(conn):
+    """
+    Atualiza uma tabela `leaderboard` criada antes dos placares por período
+
+    O `create_all` não altera tabelas existentes: sem a coluna `board` e o
+    índice único (board, player_name), o upsert do placar falharia. Linhas
+    antigas vão para o placar "all"; nomes repetidos (o esquema antigo
+    permitia) viram uma linha só, com a melhor pontuação, a soma das
+    partidas e a maior sequência.
+    """
+    columns = {c["name"] for c in inspect(conn).get_columns(LeaderboardDB.__tablename__)}
+    if "board" in columns:
+        return
+
+    print("🔧 Migrando tabela leaderboard (coluna board e índices)")
+    conn.execute(text("ALTER TABLE leaderboard ADD COLUMN board VARCHAR NOT NULL DEFAULT 'all'"))
+    conn.execute(text("DELETE FROM leaderboard WHERE player_name IS NULL"))
+    merged = [
+        {"player_name": name, "games_played": games, "best_streak": streak}
+        for name, games, streak in conn.execute(text(
+            "SELECT player_name, SUM(COALESCE(games_played, 1)), MAX(COALESCE(best_streak, 0))"
+            " FROM leaderboard GROUP BY player_name HAVING COUNT(*) > 1"
+        ))
+    ]
+    conn.execute(text(
+        "DELETE FROM leaderboard WHERE EXISTS ("
+        " SELECT 1 FROM leaderboard b"
+        " WHERE b.player_name = leaderboard.player_name"
+        " AND (COALESCE(b.score, 0) > COALESCE(leaderboard.score, 0)"
+        "      OR (COALESCE(b.score, 0) = COALESCE(leaderboard.score, 0) AND b.id < leaderboard.id)))"
+    ))
+    if merged:
+        conn.execute(text(
+            "UPDATE leaderboard SET games_played = :games_played, best_streak = :best_streak"
+            " WHERE player_name = :player_name"
+        ), merged)
+    # A restrição única vira índice único (ALTER TABLE não adiciona restrições no SQLite)
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_leaderboard_board_player ON leaderboard (board, player_name)"
+    ))
+    for index in LeaderboardDB.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+class StorageService:
+    """Engine/pool assíncronos e fila de escrita em lote"""
+
+    def __init__(self):
+        self.engine = None
+        self.session_factory: Optional[async_sessionmaker] = None
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+
+        # Regras de upsert por tabela: (colunas de conflito, atualizações, mesclar no lote)
+        self._upsert_rules: Dict[Any, Tuple[List[str], Optional[Callable], bool]] = {}
+        self.register_upsert(GameSessionDB, ["id"])
+        
+        # Métricas da fila
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.flushes = 0
+        # Posições na fila (FIFO, um único escritor): itens até `rows_settled`
+        # já saíram do lote, gravados ou descartados
+        self.rows_queued = 0
+        self.rows_settled = 0
+
+    def register_upsert(
+        self,
+        model,
+        index_elements: List[str],
+        updates: Optional[Callable] = None,
+        merge: bool = True
+    ):
+        """
+        Define como uma tabela é gravada com `enqueue(..., upsert=True)`
+
+        Args:
+            model: Tabela SQLAlchemy
+            index_elements: Colunas da restrição única usada no ON CONFLICT
+            updates: Função (stmt, colunas) -> dict do SET; padrão: sobrescreve
+                     com os valores novos (`excluded`)
+            merge: Se True, linhas com a mesma chave no lote viram uma só;
+                   se False, cada linha é aplicada (ex: contadores acumulados)
+        """
+        self._upsert_rules[model] = (index_elements, updates, merge)
+
+    @property
+    def enabled(self) -> bool:
+        """Se a persistência está ativa (engine criada e fila rodando)"""
+        return self._queue is not None
+
+    # ===========================================
+    # Ciclo de vida (chamado pelo lifespan)
+    # ===========================================
+
+    async def start(self):
+        """Cria engine, pool de sessões, tabelas e a tarefa de escrita"""
+        if not settings.STORAGE_ENABLED or self.enabled:
+            return
+
+        self.engine = create_async_engine(settings.DATABASE_URL, pool_pre_ping=True)
+        self.session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_migrate_leaderboard)
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._queue = asyncio.Queue(maxsize=settings.STORAGE_QUEUE_MAX)
+        self._writer_task = asyncio.create_task(self._writer())
+        print(f"💾 Persistência ativa: {settings.DATABASE_URL}")
+
+    async def stop(self):
+        """Drena a fila, grava o que falta e fecha o pool"""
+        if not self.enabled:
+            return
+
+        await self._queue.put(_STOP)
+        await self._writer_task
+        self._queue = None
+        self._writer_task = None
+
+        await self.engine.dispose()
+        print(f"💾 Persistência encerrada: {self.rows_written} linhas gravadas")
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """Sessão do pool para leituras/escritas diretas"""
+        if self.session_factory is None:
+            raise RuntimeError("Persistência não iniciada")
+        async with self.session_factory() as db:
+            yield db
+
+    # ===========================================
+    # Fila write-behind
+    # ===========================================
+
+    def enqueue(self, model, row: Dict[str, Any], upsert: bool = False):
+        """
+        Agenda uma linha para gravação (não bloqueia)
+
+        Pode ser chamado do event loop ou de threads de trabalho. Se a fila
+        estiver cheia a linha é descartada e contabilizada, para que a
+        persistência nunca segure uma requisição. No event loop, a posição
+        da linha fica em `rows_queued` logo após a chamada (ver `is_settled`).
+        """
+        if not self.enabled:
+            return
+
+        item = (model, row, upsert)
+        if threading.get_ident() == self._loop_thread:
+            self._put(item)
+        else:
+            self._loop.call_soon_threadsafe(self._put, item)
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+            self.rows_queued += 1
+        except asyncio.QueueFull:
+            self.rows_dropped += 1
+        except AttributeError:
+            # Fila já encerrada (item agendado durante o shutdown)
+            self.rows_dropped += 1
+
+    async def _writer(self):
+        """Agrupa itens da fila e grava em lote"""
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+
+            # Junta o que chegar até o intervalo de flush ou o tamanho do lote
+            deadline = self._loop.time() + settings.STORAGE_FLUSH_INTERVAL_SECONDS
+            while len(batch) < settings.STORAGE_BATCH_SIZE:
+                timeout = deadline - self._loop.time()
+                try:
+                    item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(
+                        self._queue.get(), timeout
+                    )
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+        # Shutdown: grava o que ainda estiver na fila
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for start in range(0, len(remaining), settings.STORAGE_BATCH_SIZE):
+            await self._flush(remaining[start:start + settings.STORAGE_BATCH_SIZE])
+
+    async def _flush(self, batch: List[Tuple[Any, Dict[str, Any], bool]]):
+        """Grava um lote: upserts primeiro (sessões antes de filhos), depois inserts"""
+        upserts: Dict[Any, List[Dict[str, Any]]] = {}
+        merged: Dict[Any, Dict[tuple, Dict[str, Any]]] = {}
+        inserts: Dict[Any, List[Dict[str, Any]]] = {}
+
+        for model, row, upsert in batch:
+            if not upsert:
+                inserts.setdefault(model, []).append(row)
+                continue
+            index_elements, _, merge = self._upsert_rules[model]
+            if merge:
+                # Várias atualizações da mesma linha no lote viram uma só
+                rows = merged.setdefault(model, {})
+                key = tuple(row[c] for c in index_elements)
+                rows[key] = {**rows.get(key, {}), **row}
+            else:
+                upserts.setdefault(model, []).append(row)
+
+        for model, rows in merged.items():
+            upserts.setdefault(model, []).extend(rows.values())
+
+        try:
+            async with self.session() as db:
+                for model, rows in upserts.items():
+                    for stmt in self._upsert_statements(model, rows):
+                        await db.execute(stmt)
+                for model, rows in inserts.items():
+                    await db.execute(insert(model), rows)
+                await db.commit()
+            self.rows_written += len(batch)
+            self.flushes += 1
+        except Exception as e:
+            self.rows_dropped += len(batch)
+            print(f"⚠️ Erro ao gravar lote ({len(batch)} linhas): {e}")
+        finally:
+            self.rows_settled += len(batch)
+
+    def is_settled(self, position: int) -> bool:
+        """Se a linha na posição `position` da fila já saiu dela (gravada ou descartada)"""
+        return position <= self.rows_settled
+
+    def _upsert_statements(self, model, rows: List[Dict[str, Any]]):
+        """
+        INSERT ... ON CONFLICT DO UPDATE em lote
+
+        As linhas são agrupadas por conjunto de colunas e divididas em
+        "ondas" em que cada chave aparece no máximo uma vez por comando.
+        """
+        dialect = self.engine.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        index_elements, updates, _ = self._upsert_rules[model]
+
+        waves: List[Dict[tuple, List[Dict[str, Any]]]] = []
+        for row in rows:
+            columns = tuple(sorted(row))
+            key = tuple(row[c] for c in index_elements)
+            for wave in waves:
+                group = wave.setdefault(columns, [])
+                if all(tuple(r[c] for c in index_elements) != key for r in group):
+                    group.append(row)
+                    break
+            else:
+                waves.append({columns: [row]})
+
+        for wave in waves:
+            for columns, group in wave.items():
+                if not group:
+                    continue
+                stmt = dialect_insert(model).values(group)
+                if updates is not None:
+                    set_ = updates(stmt, columns)
+                else:
+                    set_ = {c: stmt.excluded[c] for c in columns if c not in index_elements}
+                yield stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas da fila de persistência"""
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "flushes": self.flushes,
+        }
+
+    # ===========================================
+    # Repositório do jogo
+    # ===========================================
+
+    def save_session(self, session: GameSession, player_name: Optional[str] = None):
+        """Registra (ou atualiza) uma sessão criada"""
+        self.enqueue(GameSessionDB, {
+            "id": session.session_id,
+            "player_name": player_name,
+            "created_at": session.created_at,
+            "status": session.status,
+            "total_rounds": session.total_rounds,
+        }, upsert=True)
+
+    def save_click(self, session_id: str, click: ClickEvent, result: ClickResult):
+        """Registra um clique do jogador"""
+        self.enqueue(ClickEventDB, {
+            "session_id": session_id,
+            "image_id": click.image_id,
+            "x": click.x,
+            "y": click.y,
+            "timestamp": click.timestamp,
+            "hit": result.hit,
+            "target_class": result.target_class.value if result.target_class else None,
+            "points_earned": result.points_earned,
+            "is_penalty": result.is_penalty,
+        })
+
+    def save_round(self, session_id: str, game_round: GameRound, detections: List[Detection]):
+        """Registra uma rodada finalizada (detecções sem polígonos, para economizar espaço)"""
+        player, ai = game_round.player_score, game_round.ai_score
+        self.enqueue(GameRoundDB, {
+            "session_id": session_id,
+            "round_number": game_round.round_number,
+            "image_id": game_round.image_id,
+            "player_points": player.total_points,
+            "ai_points": ai.total_points,
+            "player_hits": player.correct_hits,
+            "ai_hits": ai.correct_hits,
+            "player_misses": player.wrong_hits,
+            "ai_misses": ai.wrong_hits,
+            "started_at": game_round.started_at,
+            "completed_at": datetime.utcnow(),
+            "detections": [d.model_dump(mode="json", exclude={"segmentation"}) for d in detections],
+        })
+        self.enqueue(GameSessionDB, {
+            "id": session_id,
+            "rounds_completed": game_round.round_number,
+        }, upsert=True)
+
+    def save_game_result(self, session: GameSession, result: GameResult):
+        """Atualiza a sessão com o resultado final"""
+        self.enqueue(GameSessionDB, {
+            "id": session.session_id,
+            "status": session.status,
+            "completed_at": datetime.utcnow(),
+            "player_total_score": result.player_final_score,
+            "ai_total_score": result.ai_final_score,
+            "rounds_completed": session.rounds_completed,
+            "winner": result.winner,
+        }, upsert=True)
+
+
+# Instância global
+storage_service = StorageService()
@@ -0,0 +1,181 @@
+"""
+Modelo Stub de Segmentação (testes de carga sem pesos)
+
+Imita a interface do YOLO usada pelo `DetectionService` (boxes, masks,
+names, fatiamento do resultado) com detecções sintéticas determinísticas
+por imagem. Ativado com `MODEL_STUB=true`; `MODEL_STUB_LATENCY_MS` simula o
+tempo de inferência do modelo real.
+"""
+import random
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .. import constants
+
+
+# Resolução das máscaras sintéticas (o YOLO devolve máscaras reduzidas)
+MASK_SIZE = 160
+
+# Chance de cada classe (javalis mais comuns, como no dataset)
+CLASS_WEIGHTS = {0: 0.45, 1: 0.2, 2: 0.12, 3: 0.11, 4: 0.12}
+
+
+class StubTensor(np.ndarray):
+    """Array NumPy com os métodos de tensor usados pelo serviço"""
+
+    def cpu(self) -> "StubTensor":
+        return self
+
+    def numpy(self) -> np.ndarray:
+        return self.view(np.ndarray)
+
+    def bool(self) -> "StubTensor":
+        return self.astype(bool)
+
+
+def _tensor(values, dtype=np.float32) -> StubTensor:
+    return np.asarray(values, dtype=dtype).view(StubTensor)
+
+
+class StubBoxes:
+    """Caixas no formato (x1, y1, x2, y2, conf, cls) em pixels"""
+
+    def __init__(self, data: np.ndarray):
+        self.data = _tensor(data).reshape(-1, 6)
+
+    @property
+    def xyxy(self) -> StubTensor:
+        return self.data[:, :4]
+
+    @property
+    def conf(self) -> StubTensor:
+        return self.data[:, 4]
+
+    @property
+    def cls(self) -> StubTensor:
+        return self.data[:, 5]
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, idx) -> "StubBoxes":
+        return StubBoxes(self.data[idx])
+
+
+class StubMasks:
+    """Máscaras binárias reduzidas; `xy` devolve contornos em pixels"""
+
+    def __init__(self, data: np.ndarray, orig_shape: Tuple[int, int]):
+        self.data = _tensor(data, dtype=None)
+        self.orig_shape = orig_shape
+
+    def cpu(self) -> "StubMasks":
+        return self
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, idx) -> "StubMasks":
+        return StubMasks(self.data[idx], self.orig_shape)
+
+    @property
+    def xy(self) -> List[np.ndarray]:
+        """Contorno (octógono inscrito na região da máscara) de cada máscara"""
+        img_height, img_width = self.orig_shape
+        polygons = []
+        for mask in self.data.numpy():
+            rows = np.flatnonzero(mask.any(axis=1))
+            cols = np.flatnonzero(mask.any(axis=0))
+            if rows.size == 0:
+                polygons.append(np.zeros((0, 2), dtype=np.float32))
+                continue
+            sy, sx = img_height / mask.shape[0], img_width / mask.shape[1]
+            y1, y2 = rows[0] * sy, (rows[-1] + 1) * sy
+            x1, x2 = cols[0] * sx, (cols[-1] + 1) * sx
+            dx, dy = (x2 - x1) * 0.3, (y2 - y1) * 0.3
+            polygons.append(np.array([
+                (x1 + dx, y1), (x2 - dx, y1), (x2, y1 + dy), (x2, y2 - dy),
+                (x2 - dx, y2), (x1 + dx, y2), (x1, y2 - dy), (x1, y1 + dy),
+            ], dtype=np.float32))
+        return polygons
+
+
+class StubResults:
+    """Resultado de uma imagem (subconjunto da API de `ultralytics.Results`)"""
+
+    def __init__(self, boxes: StubBoxes, masks: StubMasks, names: Dict[int, str], orig_shape):
+        self.boxes = boxes
+        self.masks = masks
+        self.names = names
+        self.orig_shape = orig_shape
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def __getitem__(self, idx) -> "StubResults":
+        return StubResults(self.boxes[idx], self.masks[idx], self.names, self.orig_shape)
+
+
+class StubSegmentationModel:
+    """Modelo falso: 0-4 animais por imagem, sempre os mesmos para a mesma imagem"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.names = dict(constants.MODEL_CLASSES)
+
+    def __call__(self, source: Any, conf: float = 0.25, verbose: bool = False, **kwargs) -> List[StubResults]:
+        images = source if isinstance(source, (list, tuple)) else [source]
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms * len(images) / 1000)
+        return [self._predict(image, conf) for image in images]
+
+    @staticmethod
+    def _shape(image: Any) -> Tuple[int, int]:
+        if isinstance(image, Image.Image):
+            return image.height, image.width
+        return tuple(np.asarray(image).shape[:2])
+
+    @staticmethod
+    def _seed(image: Any) -> bytes:
+        """Semente pelo conteúdo (miniatura), para resultados estáveis por imagem"""
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(np.asarray(image)[..., ::-1])
+        return image.resize((8, 8)).tobytes()
+
+    def _predict(self, image: Any, conf: float) -> StubResults:
+        img_height, img_width = self._shape(image)
+        rng = random.Random(self._seed(image))
+
+        rows, masks = [], []
+        for _ in range(rng.randint(0, 4)):
+            score = rng.uniform(0.2, 0.95)
+            cls_id = rng.choices(list(CLASS_WEIGHTS), weights=list(CLASS_WEIGHTS.values()))[0]
+            width, height = rng.uniform(0.1, 0.4), rng.uniform(0.1, 0.4)
+            x, y = rng.uniform(0, 1 - width), rng.uniform(0, 1 - height)
+            if score < conf:
+                continue
+
+            rows.append((
+                x * img_width, y * img_height,
+                (x + width) * img_width, (y + height) * img_height,
+                score, cls_id
+            ))
+            masks.append(self._ellipse(x, y, width, height))
+
+        boxes = StubBoxes(np.array(rows, dtype=np.float32))
+        data = np.stack(masks) if masks else np.zeros((0, MASK_SIZE, MASK_SIZE), dtype=np.float32)
+        return StubResults(boxes, StubMasks(data, (img_height, img_width)), self.names, (img_height, img_width))
+
+    @staticmethod
+    def _ellipse(x: float, y: float, width: float, height: float) -> np.ndarray:
+        """Máscara elíptica inscrita na caixa (coordenadas normalizadas)"""
+        grid = (np.arange(MASK_SIZE) + 0.5) / MASK_SIZE
+        cx, cy = x + width / 2, y + height / 2
+        inside = (
+            ((grid[None, :] - cx) / (width / 2)) ** 2
+            + ((grid[:, None] - cy) / (height / 2)) ** 2
+        ) <= 1.0
+        return inside.astype(np.float32)
@@ -0,0 +1,356 @@
+"""
+Serviço de Detecção em Vídeo (câmeras de trilha)
+
+Decodifica frames em uma thread de background, executa segmentação em lote
+com salto de frames configurável e associa detecções entre frames com um
+rastreador leve (IoU + distância de centróides). Cada javali é contado uma
+vez por trilha, não uma vez por frame.
+"""
+import io
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+from ..models.schemas import Detection
+from ..config import settings
+from .detection_service import detection_service
+
+
+# Sentinela que marca o fim da fila de frames
+_END_OF_STREAM = object()
+
+
+class Track:
+    """Uma trilha: o mesmo animal acompanhado ao longo dos frames"""
+
+    def __init__(self, track_id: int, detection: Detection, frame_index: int):
+        self.track_id = track_id
+        self.class_name = detection.class_name
+        self.is_target = detection.is_target
+        self.box = _to_xyxy(detection)
+        self.hits = 1
+        self.missed = 0
+        self.first_frame = frame_index
+        self.last_frame = frame_index
+        self.max_confidence = detection.confidence
+
+    def update(self, detection: Detection, frame_index: int):
+        """Atualiza a trilha com a detecção associada"""
+        self.box = _to_xyxy(detection)
+        self.hits += 1
+        self.missed = 0
+        self.last_frame = frame_index
+        self.max_confidence = max(self.max_confidence, detection.confidence)
+
+    def describe(self) -> Dict:
+        """Resumo serializável da trilha"""
+        return {
+            "track_id": self.track_id,
+            "class_name": self.class_name.value,
+            "is_target": self.is_target,
+            "hits": self.hits,
+            "first_frame": self.first_frame,
+            "last_frame": self.last_frame,
+            "max_confidence": round(self.max_confidence, 4),
+        }
+
+
+def _to_xyxy(detection: Detection) -> np.ndarray:
+    """Converte bbox (centro, largura, altura) em (x1, y1, x2, y2)"""
+    b = detection.bbox
+    return np.array(
+        [b.x - b.width / 2, b.y - b.height / 2, b.x + b.width / 2, b.y + b.height / 2],
+        dtype=np.float32
+    )
+
+
+def _iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU entre todas as caixas de `a` (N, 4) e `b` (M, 4)"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class DetectionTracker:
+    """
+    Rastreador guloso por IoU com fallback por distância de centróides
+
+    Detecções só são associadas a trilhas da mesma classe. Trilhas sem
+    associação por mais de `max_missed` frames processados são encerradas.
+    """
+
+    def __init__(
+        self,
+        iou_threshold: float = settings.TRACK_IOU_THRESHOLD,
+        max_centroid_distance: float = settings.TRACK_MAX_CENTROID_DISTANCE,
+        max_missed: int = settings.TRACK_MAX_MISSED,
+        min_hits: int = settings.TRACK_MIN_HITS
+    ):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_missed = max_missed
+        self.min_hits = min_hits
+
+        self.active: List[Track] = []
+        self.finished: List[Track] = []
+        self._next_id = 1
+
+    def update(self, detections: List[Detection], frame_index: int) -> List[int]:
+        """
+        Associa as detecções de um frame às trilhas existentes
+
+        Returns:
+            ID da trilha de cada detecção, na ordem recebida
+        """
+        track_ids = [0] * len(detections)
+        unmatched_dets = set(range(len(detections)))
+        unmatched_tracks = set(range(len(self.active)))
+
+        if detections and self.active:
+            det_boxes = np.stack([_to_xyxy(d) for d in detections])
+            track_boxes = np.stack([t.box for t in self.active])
+
+            same_class = np.array([
+                [t.class_name == d.class_name for d in detections]
+                for t in self.active
+            ])
+            iou = np.where(same_class, _iou_matrix(track_boxes, det_boxes), 0.0)
+
+            det_centers = (det_boxes[:, :2] + det_boxes[:, 2:]) / 2
+            track_centers = (track_boxes[:, :2] + track_boxes[:, 2:]) / 2
+            distance = np.linalg.norm(track_centers[:, None, :] - det_centers[None, :, :], axis=2)
+            distance = np.where(same_class, distance, np.inf)
+
+            # 1ª passada: pares com maior IoU; 2ª: centróides mais próximos
+            passes = (
+                (-iou, iou >= self.iou_threshold),
+                (distance, distance <= self.max_centroid_distance),
+            )
+            for cost, valid in passes:
+                for flat in np.argsort(cost, axis=None):
+                    t, d = np.unravel_index(flat, cost.shape)
+                    if not valid[t, d]:
+                        continue
+                    if t in unmatched_tracks and d in unmatched_dets:
+                        self.active[t].update(detections[d], frame_index)
+                        track_ids[d] = self.active[t].track_id
+                        unmatched_tracks.discard(t)
+                        unmatched_dets.discard(d)
+
+        # Trilhas sem associação envelhecem
+        survivors = []
+        for i, track in enumerate(self.active):
+            if i in unmatched_tracks:
+                track.missed += 1
+            if track.missed > self.max_missed:
+                self.finished.append(track)
+            else:
+                survivors.append(track)
+        self.active = survivors
+
+        # Detecções sem trilha iniciam trilhas novas
+        for d in sorted(unmatched_dets):
+            track = Track(self._next_id, detections[d], frame_index)
+            self._next_id += 1
+            self.active.append(track)
+            track_ids[d] = track.track_id
+
+        return track_ids
+
+    def confirmed_tracks(self) -> List[Track]:
+        """Trilhas vistas em pelo menos `min_hits` frames processados"""
+        return [t for t in self.finished + self.active if t.hits >= self.min_hits]
+
+    def unique_boar_count(self) -> int:
+        """Número de javalis distintos (uma contagem por trilha confirmada)"""
+        return sum(1 for t in self.confirmed_tracks() if t.is_target)
+
+
+class _FrameReader(threading.Thread):
+    """Decodifica frames em background e os entrega por uma fila limitada"""
+
+    def __init__(self, frames: Iterable[Tuple[int, float, object]], queue_size: int):
+        super().__init__(name="video-frame-reader", daemon=True)
+        self.frames = frames
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.error: Optional[Exception] = None
+
+    def run(self):
+        try:
+            for item in self.frames:
+                while not self.stop_event.is_set():
+                    try:
+                        self.queue.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if self.stop_event.is_set():
+                    break
+        except Exception as e:
+            self.error = e
+        finally:
+            while not self.stop_event.is_set():
+                try:
+                    self.queue.put(_END_OF_STREAM, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def __iter__(self) -> Iterator[Tuple[int, float, object]]:
+        while not self.stop_event.is_set():
+            item = self.queue.get()
+            if item is _END_OF_STREAM:
+                return
+            yield item
+
+    def stop(self):
+        """Sinaliza parada (ex: cliente desconectou) e libera a fila"""
+        self.stop_event.set()
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+
+def iter_video_frames(video_path: Path, frame_skip: int) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """
+    Lê um arquivo de vídeo com OpenCV
+
+    Frames pulados usam `grab()` (sem decodificar a imagem completa).
+
+    Yields:
+        (índice do frame, timestamp em ms, frame BGR)
+    """
+    if not CV2_AVAILABLE:
+        raise RuntimeError("OpenCV não disponível. Instale: pip install opencv-python-headless")
+
+    capture = cv2.VideoCapture(str(video_path))
+    if not capture.isOpened():
+        raise ValueError(f"Não foi possível abrir o vídeo: {video_path.name}")
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    try:
+        index = 0
+        while True:
+            if index % frame_skip != 0:
+                if not capture.grab():
+                    break
+                index += 1
+                continue
+
+            ok, frame = capture.read()
+            if not ok:
+                break
+            timestamp_ms = index / fps * 1000 if fps > 0 else capture.get(cv2.CAP_PROP_POS_MSEC)
+            yield index, timestamp_ms, frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def iter_uploaded_frames(frames: Iterable[bytes], frame_skip: int) -> Iterator[Tuple[int, float, Image.Image]]:
+    """
+    Decodifica frames enviados como imagens individuais (upload em partes)
+
+    Yields:
+        (índice do frame, timestamp em ms - desconhecido, imagem RGB)
+    """
+    for index, data in enumerate(frames):
+        if index % frame_skip != 0:
+            continue
+        image = Image.open(io.BytesIO(data)).convert("RGB")
+        yield index, 0.0, image
+
+
+class VideoService:
+    """Executa detecção + rastreamento sobre uma sequência de frames"""
+
+    def analyze_stream(
+        self,
+        frames: Iterable[Tuple[int, float, object]],
+        batch_size: int = settings.VIDEO_BATCH_SIZE,
+        confidence_threshold: Optional[float] = None,
+        return_masks: bool = False
+    ) -> Iterator[Dict]:
+        """
+        Processa frames e produz um resultado por frame, seguido de um resumo
+
+        Os frames são decodificados em uma thread separada enquanto o lote
+        anterior passa pelo modelo.
+
+        Yields:
+            Dicionários serializáveis (um por frame processado e o resumo final)
+        """
+        start_time = time.time()
+        tracker = DetectionTracker()
+        reader = _FrameReader(frames, settings.VIDEO_QUEUE_SIZE)
+        reader.start()
+
+        frames_processed = 0
+        batch: List[Tuple[int, float, object]] = []
+
+        def flush(items):
+            images = [frame for _, _, frame in items]
+            batch_detections = detection_service.analyze_batch(
+                images, confidence_threshold, return_masks
+            )
+            for (index, timestamp_ms, _), detections in zip(items, batch_detections):
+                track_ids = tracker.update(detections, index)
+                yield {
+                    "frame": index,
+                    "timestamp_ms": round(timestamp_ms, 1),
+                    "detections": [
+                        {**d.model_dump(mode="json"), "track_id": track_id}
+                        for d, track_id in zip(detections, track_ids)
+                    ],
+                    "boar_count": sum(1 for d in detections if d.is_target),
+                    "unique_boars": tracker.unique_boar_count(),
+                }
+
+        try:
+            for item in reader:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    yield from flush(batch)
+                    frames_processed += len(batch)
+                    batch = []
+            if batch:
+                yield from flush(batch)
+                frames_processed += len(batch)
+        finally:
+            reader.stop()
+
+        if reader.error is not None:
+            yield {"error": f"Erro ao decodificar frames: {reader.error}"}
+
+        tracks = tracker.confirmed_tracks()
+        yield {
+            "summary": True,
+            "frames_processed": frames_processed,
+            "unique_boars": tracker.unique_boar_count(),
+            "tracks": [t.describe() for t in tracks],
+            "processing_time_ms": (time.time() - start_time) * 1000,
+        }
+
+
+# Instância global
+video_service = VideoService()
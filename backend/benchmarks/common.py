@@ -0,0 +1,37 @@
+"""
+Utilitários compartilhados pelos benchmarks e testes de carga
+"""
+import socket
+import threading
+import time
+from typing import List
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentil por interpolação linear (q entre 0 e 100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def start_local_server() -> str:
+    """Sobe a aplicação com uvicorn em uma thread, numa porta livre"""
+    import uvicorn
+    from app.main import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    server.install_signal_handlers = lambda: None
+    threading.Thread(target=server.run, daemon=True).start()
+
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
@@ -0,0 +1,143 @@
+"""
+Teste de estresse das atualizações concorrentes de sessões e aprendizado
+
+Dispara cliques em paralelo (threads) sobre poucas sessões e confere, no
+fim, que a pontuação de cada sessão é exatamente a soma dos pontos
+retornados e que os contadores globais do aprendizado batem com os
+acertos. Também mede a vazão com uma única trava (listras = 1) para
+comparar com as travas por sessão.
+
+Uso (a partir de backend/):
+    python -m benchmarks.concurrency_stress --threads 16 --clicks 200000
+    python -m benchmarks.concurrency_stress --backend sqlite
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from app.models.schemas import (
+    AnimalClass, BoundingBox, ClickEvent, Detection, GameRound, PlayerScore
+)
+from app.services.ai_learning_service import ai_learning_service
+from app.services.detection_table import DetectionTable
+from app.services.game_service import game_service
+from app.services.session_store import InMemorySessionStore, SQLiteSessionStore
+
+IMAGE_ID = "stress"
+
+DETECTIONS = [
+    Detection(class_name=AnimalClass.BOAR, confidence=0.9, is_target=True,
+              bbox=BoundingBox(x=0.25, y=0.25, width=0.3, height=0.3)),
+    Detection(class_name=AnimalClass.DEER, confidence=0.8, is_target=False,
+              bbox=BoundingBox(x=0.75, y=0.75, width=0.3, height=0.3)),
+]
+TABLE = DetectionTable.from_detections(DETECTIONS)
+
+
+def _prepare_sessions(count: int):
+    """Cria sessões com uma rodada ativa sobre detecções fixas"""
+    session_ids = []
+    for _ in range(count):
+        session = game_service.create_session()
+
+        def apply(state):
+            state.detections[IMAGE_ID] = TABLE
+            state.session.current_round = GameRound(
+                round_number=1, image_id=IMAGE_ID, image_url="", time_limit=5,
+                player_score=PlayerScore(), ai_score=PlayerScore(),
+                started_at=datetime.utcnow()
+            )
+
+        game_service.store.update(session.session_id, apply)
+        session_ids.append(session.session_id)
+    return session_ids
+
+
+def _click(session_id: str, rng: random.Random):
+    """Um clique do jogador: pontuação da sessão + aprendizado"""
+    click = ClickEvent(
+        x=rng.random(), y=rng.random(), timestamp=time.time(),
+        image_id=IMAGE_ID, game_session_id=session_id
+    )
+    result = game_service.process_player_click(session_id, click)
+    index = TABLE.hit_test(click.x, click.y)
+    detection = TABLE.detection(index, with_segmentation=False) if index >= 0 else None
+    ai_learning_service.record_human_click(session_id, click, index >= 0, detection, TABLE)
+    return session_id, result
+
+
+def run(store, args) -> bool:
+    game_service.store = store
+    ai_learning_service.reset_learning()
+    base_correct = ai_learning_service.global_metrics["human_correct"]
+
+    session_ids = _prepare_sessions(args.sessions)
+    per_thread = args.clicks // args.threads
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        return [_click(rng.choice(session_ids), rng) for _ in range(per_thread)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        batches = list(pool.map(worker, range(args.threads)))
+    elapsed = time.perf_counter() - start
+
+    # Soma dos pontos retornados por sessão vs estado final
+    expected = {sid: 0 for sid in session_ids}
+    target_hits = 0
+    for batch in batches:
+        for session_id, result in batch:
+            expected[session_id] += result.points_earned
+            target_hits += result.hit and result.target_class == AnimalClass.BOAR
+
+    mismatches = 0
+    for session_id, points in expected.items():
+        session = game_service.get_session(session_id)
+        if session.player_total_score != points or session.current_round.player_score.total_points != points:
+            mismatches += 1
+
+    counted = ai_learning_service.global_metrics["human_correct"] - base_correct
+    total = per_thread * args.threads
+    print(f"   {total:,} cliques em {elapsed:.2f} s ({total / elapsed:,.0f} cliques/s)")
+    print(f"   sessões com pontuação divergente: {mismatches}/{len(session_ids)}")
+    print(f"   acertos contados: {counted} (esperado {target_hits})")
+
+    for session_id in session_ids:
+        game_service.store.delete(session_id)
+    return mismatches == 0 and counted == target_hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estresse de atualizações concorrentes")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--sessions", type=int, default=8, help="Poucas sessões = mais disputa")
+    parser.add_argument("--clicks", type=int, default=200_000)
+    args = parser.parse_args()
+
+    if args.backend == "sqlite":
+        args.clicks = min(args.clicks, 20_000)
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, stripes in (("trava única", 1), ("travas por sessão", None)):
+            kwargs = {"lock_stripes": stripes} if stripes else {}
+            if args.backend == "sqlite":
+                store = SQLiteSessionStore(Path(tmp) / f"sessions_{stripes or 'default'}.db", **kwargs)
+            else:
+                store = InMemorySessionStore(**kwargs)
+            print(f"\n🔒 {args.backend} - {label}")
+            ok = run(store, args) and ok
+
+    print("\n✅ Pontuações consistentes" if ok else "\n❌ Inconsistências encontradas")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark da tabela colunar de detecções
+
+Compara a lista de modelos `Detection` (representação anterior do estado
+das sessões) com a `DetectionTable`:
+- memória retida por imagem (tracemalloc)
+- teste de clique (`check_click_hit` vs `hit_test`)
+- serialização do session store (dumps/loads)
+
+Uso (a partir de backend/):
+    python -m benchmarks.detection_table_bench --detections 8 --points 60
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from app.models.schemas import AnimalClass, BoundingBox, Detection, SegmentationPoint
+from app.services.detection_service import detection_service
+from app.services.detection_table import DetectionTable
+
+
+def _synthetic_detections(count: int, points: int, rng: random.Random):
+    detections = []
+    for _ in range(count):
+        cx, cy = rng.uniform(0.1, 0.9), rng.uniform(0.1, 0.9)
+        w, h = rng.uniform(0.05, 0.3), rng.uniform(0.05, 0.3)
+        cls = rng.choice(list(AnimalClass))
+        detections.append(Detection(
+            class_name=cls,
+            confidence=rng.uniform(0.3, 1.0),
+            bbox=BoundingBox(x=cx, y=cy, width=w, height=h),
+            is_target=cls == AnimalClass.BOAR,
+            segmentation=[
+                SegmentationPoint(x=cx + rng.uniform(-w, w) / 2, y=cy + rng.uniform(-h, h) / 2)
+                for _ in range(points)
+            ]
+        ))
+    return detections
+
+
+def _retained_bytes(build, copies: int) -> float:
+    """Bytes retidos por objeto criado por `build`"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build() for _ in range(copies)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / copies
+
+
+def _rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:12,.0f}/s  ({seconds / count * 1e6:6.3f} µs)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da tabela colunar de detecções")
+    parser.add_argument("--detections", type=int, default=8, help="Detecções por imagem")
+    parser.add_argument("--points", type=int, default=60, help="Pontos por polígono")
+    parser.add_argument("--copies", type=int, default=200, help="Imagens para medir memória")
+    parser.add_argument("--clicks", type=int, default=200_000, help="Testes de clique")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    detections = _synthetic_detections(args.detections, args.points, rng)
+    table = DetectionTable.from_detections(detections)
+    print(f"📦 {args.detections} detecções x {args.points} pontos por imagem")
+
+    # 1. Memória por imagem
+    as_models = _retained_bytes(lambda: [d.model_copy(deep=True) for d in detections], args.copies)
+    as_table = _retained_bytes(lambda: DetectionTable.from_detections(detections), args.copies)
+    print(f"🧠 Memória/imagem: modelos {as_models / 1024:8.1f} KB | tabela {as_table / 1024:8.1f} KB "
+          f"({as_models / as_table:.1f}x menor)")
+
+    # 2. Teste de clique (mesmos pontos, mesmo resultado)
+    clicks = [(rng.random(), rng.random()) for _ in range(args.clicks)]
+    start = time.perf_counter()
+    baseline = [detection_service.check_click_hit(x, y, detections)[1] for x, y in clicks]
+    models_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indices = [table.hit_test(x, y) for x, y in clicks]
+    table_time = time.perf_counter() - start
+
+    mismatches = sum(
+        (hit is None) != (index < 0) or (hit is not None and hit is not detections[index])
+        for hit, index in zip(baseline, indices)
+    )
+    print(f"🎯 check_click_hit: {_rate(args.clicks, models_time)}")
+    print(f"🎯 hit_test:        {_rate(args.clicks, table_time)}  ({mismatches} divergências)")
+
+    # 3. Serialização do estado (como no SQLiteSessionStore)
+    rounds = 2_000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        DetectionTable.from_payload(table.to_payload())
+    print(f"💾 to/from_payload: {_rate(rounds, time.perf_counter() - start)}")
+
+    start = time.perf_counter()
+    for _ in range(rounds // 10):
+        table.to_detections()
+    print(f"📤 to_detections:   {_rate(rounds // 10, time.perf_counter() - start)}")
+
+
+if __name__ == "__main__":
+    main()
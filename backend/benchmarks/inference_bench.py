@@ -0,0 +1,227 @@
+"""
+Micro-benchmark das etapas de inferência do DetectionService
+
+Cronometra em separado cada etapa de `analyze_image`:
+- base64: decodificação do texto base64
+- decode: PIL decode + conversão para RGB
+- forward: chamada ao modelo (com o limiar efetivo por classe)
+- boxes: corte por limiar + caixas normalizadas
+- polygons: máscaras -> contornos normalizados
+- pydantic: construção dos modelos `Detection`
+
+Roda sobre imagens de um split do dataset (redimensionadas) ou sintéticas,
+em várias resoluções e tamanhos de lote. Os tempos são por imagem (ms). O
+resultado vai para JSON e pode ser comparado com uma linha de base: uma
+etapa cuja mediana piora além da tolerância conta como regressão (saída 1).
+
+Uso (a partir de backend/):
+    python -m benchmarks.inference_bench --stub-model --json-out inference.json
+    python -m benchmarks.inference_bench --split test --resolutions 640,1280 --batches 1,8
+    python -m benchmarks.inference_bench --baseline baseline.json --tolerance 0.15
+    python -m benchmarks.inference_bench --save-baseline baseline.json
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from .common import percentile
+
+STAGES = ("base64", "decode", "forward", "boxes", "polygons", "pydantic")
+
+# Diferenças abaixo disso (ms) são ruído de medição, nunca regressão
+NOISE_FLOOR_MS = 0.05
+
+
+def _jpeg_base64(image) -> str:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def load_images(split: str, resolution: int, count: int) -> List[str]:
+    """Imagens em base64 na largura pedida (dataset se existir; senão sintéticas)"""
+    from PIL import Image, ImageDraw
+    from app.services.image_sampler import image_sampler
+
+    height = resolution * 3 // 4
+    entries = image_sampler.catalog(split) if split else []
+    if entries:
+        return [
+            _jpeg_base64(Image.open(entry.path).convert("RGB").resize((resolution, height)))
+            for entry in entries[:count]
+        ]
+
+    rng = random.Random(resolution)
+    images = []
+    for _ in range(count):
+        image = Image.new("RGB", (resolution, height), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(8):
+            x, y = rng.randrange(resolution), rng.randrange(height)
+            size = rng.randint(resolution // 20, resolution // 4)
+            draw.ellipse((x, y, x + size, y + size * 3 // 4), fill=tuple(rng.randrange(256) for _ in range(3)))
+        images.append(_jpeg_base64(image))
+    return images
+
+
+def time_stages(images: List[str], batch: int, repeat: int, warmup: int) -> Dict[str, List[float]]:
+    """Tempos por imagem (ms) de cada etapa, um lote de `batch` imagens por vez"""
+    from PIL import Image
+    from app.config import settings
+    from app.services.detection_service import detection_service
+
+    entry = detection_service.registry.primary
+    threshold = settings.MODEL_CONFIDENCE_THRESHOLD
+    service = detection_service
+    samples: Dict[str, List[float]] = defaultdict(list)
+
+    for iteration in range(warmup + repeat):
+        start = iteration * batch % len(images)
+        chunk = [images[(start + i) % len(images)] for i in range(batch)]
+        marks = [time.perf_counter()]
+
+        raw = [base64.b64decode(b) for b in chunk]
+        marks.append(time.perf_counter())
+
+        decoded = [Image.open(io.BytesIO(r)).convert("RGB") for r in raw]
+        marks.append(time.perf_counter())
+
+        results, thresholds = service._predict(entry, decoded if batch > 1 else decoded[0], threshold)
+        marks.append(time.perf_counter())
+
+        kept = []
+        for result in results:
+            img_height, img_width = result.orig_shape[:2]
+            filtered, cls_ids, confs = service._filter_result(result, thresholds)
+            if filtered is not None:
+                boxes = service._normalized_boxes(filtered, img_width, img_height)
+                kept.append((filtered, cls_ids, confs, boxes, img_width, img_height))
+        marks.append(time.perf_counter())
+
+        polygons = [service._normalized_polygons(r, w, h) for r, _, _, _, w, h in kept]
+        marks.append(time.perf_counter())
+
+        for (result, cls_ids, confs, boxes, _, _), polygon in zip(kept, polygons):
+            service._build_detections(result.names, cls_ids, confs, boxes, polygon)
+        marks.append(time.perf_counter())
+
+        if iteration >= warmup:
+            for stage, (begin, end) in zip(STAGES, zip(marks, marks[1:])):
+                samples[stage].append((end - begin) * 1000 / batch)
+    return samples
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict:
+    summary = {
+        stage: {
+            "mean_ms": round(sum(values) / len(values), 4),
+            "p50_ms": round(percentile(values, 50), 4),
+            "p95_ms": round(percentile(values, 95), 4),
+        }
+        for stage, values in samples.items()
+    }
+    summary["total_p50_ms"] = round(sum(s["p50_ms"] for s in summary.values()), 4)
+    return summary
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Etapas cuja mediana piorou além da tolerância em relação à base"""
+    regressions = []
+    for case, stages in results.items():
+        base_stages = baseline.get("results", {}).get(case)
+        if not base_stages:
+            continue
+        for stage in STAGES:
+            current = stages[stage]["p50_ms"]
+            previous = base_stages.get(stage, {}).get("p50_ms")
+            if previous is None:
+                continue
+            if current > previous * (1 + tolerance) and current - previous > NOISE_FLOOR_MS:
+                regressions.append(
+                    f"{case} {stage}: {previous:.3f} -> {current:.3f} ms (+{(current / previous - 1):.0%})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark das etapas de inferência")
+    parser.add_argument("--split", default="test", help="Split do dataset ('' para só sintéticas)")
+    parser.add_argument("--resolutions", default="320,640,1280",
+                        type=lambda s: [int(v) for v in s.split(",")], help="Larguras das imagens")
+    parser.add_argument("--batches", default="1,4,8",
+                        type=lambda s: [int(v) for v in s.split(",")], help="Imagens por chamada ao modelo")
+    parser.add_argument("--images", type=int, default=16, help="Imagens distintas por resolução")
+    parser.add_argument("--repeat", type=int, default=20, help="Lotes medidos por caso")
+    parser.add_argument("--warmup", type=int, default=3, help="Lotes descartados por caso")
+    parser.add_argument("--stub-model", action="store_true", help="Modelo stub (sem pesos)")
+    parser.add_argument("--json-out", type=Path, help="Grava o resultado em JSON")
+    parser.add_argument("--baseline", type=Path, help="Compara com um resultado anterior")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Piora relativa aceita (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", type=Path, help="Grava o resultado como nova linha de base")
+    args = parser.parse_args()
+
+    # Configuração lida no import do app: precisa vir antes de importá-lo
+    if args.stub_model:
+        os.environ["MODEL_STUB"] = "true"
+
+    from app.services.detection_service import detection_service
+
+    entry = detection_service.registry.primary
+    if entry is None:
+        print("❌ Nenhum modelo carregado (use --stub-model para rodar sem pesos)")
+        sys.exit(2)
+
+    print(f"🔬 Etapas de inferência com {entry.name} ({entry.format})")
+    results = {}
+    for resolution in args.resolutions:
+        images = load_images(args.split, resolution, args.images)
+        for batch in args.batches:
+            case = f"{resolution}px/b{batch}"
+            results[case] = summarize(time_stages(images, batch, args.repeat, args.warmup))
+            stages = "  ".join(f"{stage} {results[case][stage]['p50_ms']:7.3f}" for stage in STAGES)
+            print(f"   {case:12s} {stages}  | total {results[case]['total_p50_ms']:8.3f} ms/img")
+
+    report = {
+        "meta": {
+            "date": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "model": entry.name,
+            "model_format": entry.format,
+            "split": args.split or "synthetic",
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    for path in (args.json_out, args.save_baseline):
+        if path:
+            path.write_text(json.dumps(report, indent=2))
+            print(f"💾 Resultado salvo em {path}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("meta", {}).get("model") != entry.name:
+            print(f"⚠️ Base medida com outro modelo ({baseline.get('meta', {}).get('model')})")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressões (tolerância {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"\n✅ Sem regressões em relação a {args.baseline} (tolerância {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark do placar de líderes com 1M de linhas em SQLite
+
+Mede o caminho de leitura (cache top-N vs consultas paginadas pelo índice),
+o custo de registrar uma partida e, como referência, uma consulta que
+precisa de ordenação completa (coluna sem índice).
+
+Uso (a partir de backend/):
+    python -m benchmarks.leaderboard_bench --rows 1000000
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+from sqlalchemy import insert, text
+
+from app.config import settings
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:9.3f} ms"
+
+
+async def _timeit(fn: Callable, repeat: int) -> float:
+    """Tempo médio (s) de `repeat` execuções de uma corrotina"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await fn()
+    return (time.perf_counter() - start) / repeat
+
+
+async def run(args) -> Dict[str, float]:
+    # Importa depois de apontar DATABASE_URL para o banco temporário
+    from app.models.database import LeaderboardDB
+    from app.services.storage_service import storage_service
+    from app.services.leaderboard_service import leaderboard_service
+
+    await storage_service.start()
+    results = {}
+    try:
+        # 1. Popula o placar geral
+        start = time.perf_counter()
+        async with storage_service.session() as db:
+            for offset in range(0, args.rows, args.chunk):
+                rows = [
+                    {
+                        "board": "all",
+                        "player_name": f"jogador_{i:07d}",
+                        "score": random.randint(-2000, 3000),
+                        "accuracy": random.random() * 100,
+                        "games_played": random.randint(1, 50),
+                        "best_streak": random.randint(0, 20),
+                    }
+                    for i in range(offset, min(offset + args.chunk, args.rows))
+                ]
+                await db.execute(insert(LeaderboardDB), rows)
+            await db.commit()
+        print(f"📦 {args.rows} linhas inseridas em {time.perf_counter() - start:.1f} s")
+
+        # 2. Plano de consulta (deve usar o índice, sem TEMP B-TREE)
+        async with storage_service.session() as db:
+            plan = (await db.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM leaderboard WHERE board = 'all' "
+                "ORDER BY score DESC, player_name DESC LIMIT 10 OFFSET 500000"
+            ))).all()
+        print("🔎 Plano:", " | ".join(str(row[-1]) for row in plan))
+
+        # 3. Aquecimento do cache top-N
+        results["warm"] = await _timeit(leaderboard_service.warm, 1)
+
+        # 4. Leituras
+        results["page_cached"] = await _timeit(
+            lambda: leaderboard_service.get_page("all", 0, 10), args.repeat
+        )
+        for offset in (1000, args.rows // 10, args.rows - 10):
+            results[f"page_offset_{offset}"] = await _timeit(
+                lambda offset=offset: leaderboard_service.get_page("all", offset, 10), max(1, args.repeat // 10)
+            )
+
+        # 5. Registro de partidas (cache incremental + upsert na fila)
+        counter = iter(range(10**9))
+        results["record_game"] = await _timeit(
+            lambda: leaderboard_service.record_game(
+                f"jogador_{next(counter) % args.rows:07d}", random.randint(0, 5000), 80.0, 3
+            ),
+            args.repeat
+        )
+
+        # 6. Referência: ordenação completa por coluna sem índice
+        async def full_sort():
+            async with storage_service.session() as db:
+                await db.execute(text(
+                    "SELECT * FROM leaderboard WHERE board = 'all' ORDER BY accuracy DESC LIMIT 10"
+                ))
+        results["full_sort_reference"] = await _timeit(full_sort, max(1, args.repeat // 100))
+    finally:
+        await storage_service.stop()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do placar de líderes")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Linhas no placar geral")
+    parser.add_argument("--chunk", type=int, default=50_000, help="Linhas por insert em lote")
+    parser.add_argument("--repeat", type=int, default=1000, help="Repetições das leituras")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.DATABASE_URL = f"sqlite+aiosqlite:///{Path(tmp) / 'leaderboard_bench.db'}"
+        results = asyncio.run(run(args))
+
+    print("\n📊 Tempo médio por operação")
+    for name, seconds in results.items():
+        print(f"   {name:28s} {_ms(seconds)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Teste de carga ponta a ponta da API do jogo
+
+Simula jogadores (asyncio) com o roteiro de uma partida real: `game/start`,
+a cada rodada `images/random` + `round/start` com imagens do dataset,
+cliques com tempos de reação humanos, `ai-turn`, `round/end` e, no fim,
+`end`. Para cada nível de concorrência relata a vazão, p50/p95/p99 por rota
+e a taxa de erros, e indica o maior nível que cumpre o SLO pedido.
+
+A aplicação roda no próprio processo (httpx.ASGITransport, sem rede), em um
+uvicorn local (--serve) ou em um servidor já em execução (--url). Com
+--stub-model as detecções são sintéticas e os pesos não são necessários;
+sem o dataset, as rodadas usam imagens sintéticas.
+
+Uso (a partir de backend/):
+    python -m benchmarks.load_test --stub-model --concurrency 1,10,50 --games 100
+    python -m benchmarks.load_test --serve --stub-model --stub-latency-ms 40 --time-scale 0.2
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --json-out load.json
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from .common import percentile, start_local_server
+
+API_PREFIX = "/api/v1"
+
+# Tempos humanos (segundos, log-normal): primeira reação e intervalo entre cliques
+FIRST_CLICK_MEDIAN = 0.8
+NEXT_CLICK_MEDIAN = 0.5
+CLICK_SIGMA = 0.35
+
+
+class RouteStats:
+    """Latências e erros por rota"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.games = 0
+
+    def summary(self, elapsed: float) -> Dict:
+        routes = sorted(set(self.latencies) | set(self.errors))
+        requests = sum(len(self.latencies[r]) + self.errors[r] for r in routes)
+        errors = sum(self.errors.values())
+        return {
+            "games": self.games,
+            "elapsed_s": round(elapsed, 3),
+            "requests": requests,
+            "requests_per_second": round(requests / elapsed, 1) if elapsed > 0 else 0.0,
+            "games_per_minute": round(self.games * 60 / elapsed, 1) if elapsed > 0 else 0.0,
+            "error_rate": round(errors / requests, 4) if requests else 0.0,
+            "routes": {
+                route: {
+                    "count": len(self.latencies[route]),
+                    "errors": self.errors[route],
+                    "p50": round(percentile(self.latencies[route], 50), 3),
+                    "p95": round(percentile(self.latencies[route], 95), 3),
+                    "p99": round(percentile(self.latencies[route], 99), 3),
+                }
+                for route in routes
+            },
+        }
+
+
+class Player:
+    """Um jogador simulado: uma partida completa por chamada de `play`"""
+
+    def __init__(self, client: httpx.AsyncClient, stats: RouteStats, images: "ImageSource", args):
+        self.client = client
+        self.stats = stats
+        self.images = images
+        self.args = args
+        self.rng = random.Random()
+
+    async def call(self, route: str, method: str, path: str, **kwargs) -> Optional[dict]:
+        """Uma requisição cronometrada; None em erro (status >= 400 ou falha)"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, f"{API_PREFIX}{path}", **kwargs)
+        except httpx.HTTPError:
+            self.stats.errors[route] += 1
+            return None
+        if response.status_code >= 400:
+            self.stats.errors[route] += 1
+            return None
+        self.stats.latencies[route].append((time.perf_counter() - start) * 1000)
+        return response.json()
+
+    def aim(self, detections: List[dict]) -> tuple:
+        """Mira em uma detecção (javalis primeiro) ou erra com `1 - accuracy`"""
+        if detections and self.rng.random() < self.args.accuracy:
+            targets = [d for d in detections if d["is_target"]] or detections
+            bbox = self.rng.choice(targets)["bbox"]
+            return (
+                bbox["x"] + self.rng.uniform(-0.4, 0.4) * bbox["width"],
+                bbox["y"] + self.rng.uniform(-0.4, 0.4) * bbox["height"],
+            )
+        return self.rng.random(), self.rng.random()
+
+    async def play(self):
+        data = await self.call("game_start", "POST", "/game/start", params={"player_name": "loadtest"})
+        if data is None:
+            return
+        session_id = data["session_id"]
+
+        for _ in range(self.args.rounds):
+            image_base64, image_name = await self.images.next(self, session_id)
+            data = await self.call(
+                "round_start", "POST", f"/game/{session_id}/round/start",
+                json={
+                    "image_base64": image_base64,
+                    "image_name": image_name,
+                    "return_masks": not self.args.lazy_masks,
+                },
+            )
+            if data is None:
+                continue
+            image_id = data["round"]["image_id"]
+            detections = data["detections"]
+
+            if self.args.lazy_masks and detections:
+                indices = [i for i, d in enumerate(detections) if d["is_target"]]
+                await self.call(
+                    "masks", "GET", f"/game/{session_id}/masks/{image_id}", params={"indices": indices}
+                )
+
+            # Cliques dentro do tempo da rodada
+            elapsed = 0.0
+            median = FIRST_CLICK_MEDIAN
+            for _ in range(self.args.clicks):
+                wait = self.rng.lognormvariate(0, CLICK_SIGMA) * median
+                elapsed += wait
+                if elapsed > self.args.round_seconds:
+                    break
+                if self.args.time_scale > 0:
+                    await asyncio.sleep(wait * self.args.time_scale)
+                median = NEXT_CLICK_MEDIAN
+
+                x, y = self.aim(detections)
+                await self.call("click", "POST", f"/game/{session_id}/click", json={
+                    "x": min(max(x, 0.0), 1.0), "y": min(max(y, 0.0), 1.0),
+                    "timestamp": time.time(), "image_id": image_id, "game_session_id": session_id,
+                })
+
+            await self.call("ai_turn", "POST", f"/game/{session_id}/ai-turn", params={"image_id": image_id})
+            await self.call("round_end", "POST", f"/game/{session_id}/round/end")
+
+        if await self.call("game_end", "POST", f"/game/{session_id}/end") is not None:
+            self.stats.games += 1
+
+
+class ImageSource:
+    """Imagens das rodadas: dataset via /images/random ou sintéticas"""
+
+    def __init__(self, synthetic: bool, pool_size: int = 16):
+        self.synthetic = synthetic
+        self.pool_size = pool_size
+        self._pool: List[str] = []
+
+    def _synthetic_pool(self) -> List[str]:
+        if not self._pool:
+            from PIL import Image, ImageDraw
+
+            rng = random.Random(0)
+            for _ in range(self.pool_size):
+                image = Image.new("RGB", (640, 480), tuple(rng.randrange(256) for _ in range(3)))
+                draw = ImageDraw.Draw(image)
+                for _ in range(6):
+                    x, y = rng.randrange(560), rng.randrange(400)
+                    draw.ellipse((x, y, x + rng.randint(30, 200), y + rng.randint(30, 150)),
+                                 fill=tuple(rng.randrange(256) for _ in range(3)))
+                buffer = io.BytesIO()
+                image.save(buffer, format="JPEG", quality=85)
+                self._pool.append(base64.b64encode(buffer.getvalue()).decode())
+        return self._pool
+
+    async def next(self, player: Player, session_id: str) -> tuple:
+        """(imagem em base64, nome do arquivo ou None)"""
+        if not self.synthetic:
+            data = await player.call("images_random", "GET", "/images/random", params={"session_id": session_id})
+            if data is not None:
+                return data["image_base64"], data["filename"]
+        return player.rng.choice(self._synthetic_pool()), None
+
+
+async def run_level(client: httpx.AsyncClient, images: ImageSource, concurrency: int, args) -> Dict:
+    """`args.games` partidas com `concurrency` jogadores simultâneos"""
+    stats = RouteStats()
+    remaining = args.games
+
+    async def player_loop():
+        nonlocal remaining
+        player = Player(client, stats, images, args)
+        while remaining > 0:
+            remaining -= 1
+            try:
+                await player.play()
+            except Exception as e:
+                stats.errors["unexpected"] += 1
+                print(f"⚠️ Partida falhou: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(player_loop() for _ in range(concurrency)))
+    return stats.summary(time.perf_counter() - start)
+
+
+@asynccontextmanager
+async def open_client(args):
+    """Cliente HTTP para o app no processo, um uvicorn local ou --url"""
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+    if args.url or args.serve:
+        base_url = args.url or start_local_server()
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            yield client, base_url
+        return
+
+    from app.main import app
+
+    # ASGITransport não executa o lifespan (banco, aprendizado, catálogo)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest",
+                                     timeout=args.timeout, limits=limits) as client:
+            yield client, "no processo (ASGI)"
+
+
+async def run(args) -> Dict:
+    results = {}
+    async with open_client(args) as (client, target):
+        images = ImageSource(args.synthetic_images)
+        if not images.synthetic:
+            probe = await client.get(f"{API_PREFIX}/images/random")
+            if probe.status_code != 200:
+                print("⚠️ Dataset indisponível no servidor - usando imagens sintéticas")
+                images.synthetic = True
+
+        print(f"🐗 Teste de carga em {target}")
+        print(f"   {args.games} partidas por nível, {args.rounds} rodadas, até {args.clicks} cliques, "
+              f"tempo humano x{args.time_scale}")
+
+        for concurrency in args.concurrency:
+            summary = await run_level(client, images, concurrency, args)
+            results[str(concurrency)] = summary
+            print(f"\n📊 {concurrency} jogadores: {summary['requests_per_second']} req/s, "
+                  f"{summary['games_per_minute']} partidas/min, erros {summary['error_rate']:.2%}")
+            for route, stats in summary["routes"].items():
+                print(f"   {route:14s} n={stats['count']:6d}  p50 {stats['p50']:8.2f}  "
+                      f"p95 {stats['p95']:8.2f}  p99 {stats['p99']:8.2f} ms  erros {stats['errors']}")
+    return results
+
+
+def sustained_concurrency(results: Dict, slo_ms: float, max_error_rate: float) -> Optional[int]:
+    """Maior nível cujo p95 de todas as rotas e a taxa de erros cumprem o SLO"""
+    best = None
+    for level, summary in results.items():
+        p95 = max((s["p95"] for s in summary["routes"].values()), default=0.0)
+        if p95 <= slo_ms and summary["error_rate"] <= max_error_rate:
+            best = max(best or 0, int(level))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga ponta a ponta do jogo")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Servidor já em execução (padrão: app no próprio processo)")
+    target.add_argument("--serve", action="store_true", help="Sobe um uvicorn local (tráfego por localhost)")
+    parser.add_argument("--concurrency", default="1,5,10,25",
+                        type=lambda s: [int(v) for v in s.split(",")], help="Níveis de jogadores simultâneos")
+    parser.add_argument("--games", type=int, default=50, help="Partidas por nível")
+    parser.add_argument("--rounds", type=int, default=10, help="Rodadas por partida")
+    parser.add_argument("--clicks", type=int, default=6, help="Máximo de cliques por rodada")
+    parser.add_argument("--round-seconds", type=float, default=5.0, help="Tempo da rodada para os cliques")
+    parser.add_argument("--accuracy", type=float, default=0.7, help="Chance de mirar em uma detecção")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Multiplica os tempos humanos (0 = sem espera, máximo de vazão)")
+    parser.add_argument("--lazy-masks", action="store_true",
+                        help="Rodadas só com caixas + /masks para os javalis")
+    parser.add_argument("--synthetic-images", action="store_true", help="Não usa o dataset")
+    parser.add_argument("--stub-model", action="store_true", help="Modelo stub (sem pesos)")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="Latência simulada do stub")
+    parser.add_argument("--no-analysis-cache", action="store_true",
+                        help="Desliga o cache de análises (toda rodada roda o modelo)")
+    parser.add_argument("--slo-p95-ms", type=float, default=500.0, help="p95 máximo por rota")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json-out", type=Path, help="Grava o resultado em JSON")
+    args = parser.parse_args()
+
+    # Configuração lida no import do app: precisa vir antes de importá-lo
+    if args.stub_model:
+        os.environ["MODEL_STUB"] = "true"
+        os.environ["MODEL_STUB_LATENCY_MS"] = str(args.stub_latency_ms)
+    if args.no_analysis_cache:
+        os.environ["ANALYSIS_CACHE_MAX_IMAGES"] = "0"
+    if not args.url:
+        # Banco descartável para não poluir o placar real
+        scratch = Path(tempfile.mkdtemp(prefix="loadtest_"))
+        os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{scratch / 'loadtest.db'}")
+        os.environ.setdefault("SESSION_STORE_PATH", str(scratch / "sessions.db"))
+        # Todos os jogadores simulados saem do mesmo IP: o limite por IP
+        # recusaria o próprio teste (a admissão continua ativa)
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    results = asyncio.run(run(args))
+
+    best = sustained_concurrency(results, args.slo_p95_ms, args.max_error_rate)
+    if best is None:
+        print(f"\n❌ Nenhum nível cumpriu p95 <= {args.slo_p95_ms} ms e erros <= {args.max_error_rate:.1%}")
+    else:
+        print(f"\n✅ Jogos simultâneos sustentados: {best} (p95 <= {args.slo_p95_ms} ms, "
+              f"erros <= {args.max_error_rate:.1%})")
+
+    if args.json_out:
+        args.json_out.write_text(json.dumps({
+            "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+            "levels": results,
+            "sustained_concurrency": best,
+        }, indent=2))
+        print(f"💾 Resultado salvo em {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
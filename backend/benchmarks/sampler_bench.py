@@ -0,0 +1,115 @@
+"""
+Benchmark do amostrador de imagens
+
+Compara a vazão de sorteios da tabela de alias com a seleção anterior
+(`random.choice` sobre duas listas), mede partidas completas sem repetição
+e confere que sementes iguais geram a mesma sequência.
+
+Usa o catálogo real do split quando o dataset existe; caso contrário, um
+catálogo sintético com o tamanho pedido.
+
+Uso (a partir de backend/):
+    python -m benchmarks.sampler_bench --draws 1000000 --images 1443
+"""
+import argparse
+import random
+import time
+from pathlib import Path
+
+from app.constants import BOAR_IMAGE_PROBABILITY
+from app.services.image_sampler import AliasTable, CatalogEntry, image_sampler
+
+
+def _synthetic_catalog(n: int):
+    """Catálogo com ~60% de imagens com javali e parte delas com distratores"""
+    entries = []
+    for i in range(n):
+        roll = random.random()
+        classes = [0] if roll < 0.45 else [0, 4] if roll < 0.6 else [2]
+        path = Path(f"/synthetic/img_{i:05d}.jpg")
+        entries.append(CatalogEntry(path, path.with_suffix(".txt"), classes))
+    return entries
+
+
+def _rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:12,.0f}/s  ({seconds / count * 1e6:6.3f} µs)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do amostrador de imagens")
+    parser.add_argument("--split", default="test", help="Split do dataset (se existir)")
+    parser.add_argument("--images", type=int, default=1443, help="Tamanho do catálogo sintético")
+    parser.add_argument("--draws", type=int, default=1_000_000, help="Sorteios simples")
+    parser.add_argument("--sessions", type=int, default=20_000, help="Partidas simuladas")
+    parser.add_argument("--rounds", type=int, default=10, help="Imagens por partida")
+    args = parser.parse_args()
+
+    entries = image_sampler.catalog(args.split)
+    if not entries:
+        entries = _synthetic_catalog(args.images)
+        image_sampler.catalogs[args.split] = entries
+        print(f"📦 Catálogo sintético: {len(entries)} imagens")
+    else:
+        print(f"📦 Catálogo {args.split}: {len(entries)} imagens")
+
+    # 1. Construção da tabela
+    start = time.perf_counter()
+    candidates, weights = image_sampler._weights(entries, True, 0.0, 1.0)
+    table = AliasTable(weights)
+    print(f"🏗️  Tabela de alias: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    # 2. Sorteios simples: seleção anterior vs tabela de alias
+    boar = [e for e in entries if e.has_boar]
+    other = [e for e in entries if not e.has_boar]
+    rng = random.Random(42)
+
+    start = time.perf_counter()
+    for _ in range(args.draws):
+        rng.choice(boar if rng.random() < BOAR_IMAGE_PROBABILITY else other)
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(args.draws):
+        candidates[table.draw(rng)]
+    alias = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(args.draws // 10):
+        image_sampler.draw(args.split, rng=rng)
+    full = time.perf_counter() - start
+
+    # 3. Partidas sem repetição, com semente por sessão
+    repeats = 0
+    start = time.perf_counter()
+    for session in range(args.sessions):
+        seen = []
+        for _ in range(args.rounds):
+            entry = image_sampler.draw(
+                args.split, rng=random.Random(f"{session}:{len(seen)}"), exclude=set(seen)
+            )
+            repeats += entry.name in seen
+            seen.append(entry.name)
+    games = time.perf_counter() - start
+
+    # 4. Reprodutibilidade: mesma semente, mesma sequência
+    def sequence(seed):
+        seen = []
+        for _ in range(args.rounds):
+            seen.append(image_sampler.draw(
+                args.split, rng=random.Random(f"{seed}:{len(seen)}"), exclude=set(seen)
+            ).name)
+        return seen
+
+    reproducible = sequence(7) == sequence(7)
+
+    print("\n📊 Vazão de sorteios")
+    print(f"   random.choice (anterior)   {_rate(args.draws, baseline)}")
+    print(f"   tabela de alias            {_rate(args.draws, alias)}")
+    print(f"   image_sampler.draw         {_rate(args.draws // 10, full)}")
+    print(f"   partida ({args.rounds} imagens)       {_rate(args.sessions, games)}")
+    print(f"\n✅ Repetições dentro de partidas: {repeats}")
+    print(f"✅ Sequência reproduzível pela semente: {reproducible}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Teste de carga: canal WebSocket vs fluxo REST do jogo
+
+Executa o mesmo roteiro de partida (rodadas, cliques, vez da IA, fim de
+rodada e de jogo) pelos dois protocolos e compara mensagens por segundo e
+latência por troca (p50/p95/p99).
+
+Uso (a partir de backend/):
+    python -m benchmarks.ws_vs_rest --games 50 --concurrency 10
+    python -m benchmarks.ws_vs_rest --url http://127.0.0.1:8000 --json-out ws_vs_rest.json
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import struct
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+from .common import percentile, start_local_server
+
+API_PREFIX = "/api/v1"
+
+# Mesmo formato de clique binário do servidor: seq, x, y, timestamp
+BINARY_CLICK_FORMAT = "<Iffd"
+
+
+class Recorder:
+    """Acumula latências por tipo de troca"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors = 0
+
+    def record(self, kind: str, start: float):
+        self.latencies[kind].append((time.perf_counter() - start) * 1000)
+
+    def summary(self, elapsed: float) -> Dict:
+        all_latencies = [v for values in self.latencies.values() for v in values]
+        return {
+            "messages": len(all_latencies),
+            "errors": self.errors,
+            "elapsed_s": round(elapsed, 3),
+            "messages_per_second": round(len(all_latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+            "latency_ms": {
+                kind: {
+                    "count": len(values),
+                    "p50": round(percentile(values, 50), 3),
+                    "p95": round(percentile(values, 95), 3),
+                    "p99": round(percentile(values, 99), 3),
+                }
+                for kind, values in sorted(self.latencies.items())
+            },
+            "overall_p50_ms": round(percentile(all_latencies, 50), 3),
+            "overall_p99_ms": round(percentile(all_latencies, 99), 3),
+        }
+
+
+async def play_rest(client: httpx.AsyncClient, image_base64: str, args, rec: Recorder):
+    """Uma partida pelo fluxo REST (uma requisição HTTP por ação)"""
+    start = time.perf_counter()
+    response = await client.post(f"{API_PREFIX}/game/start")
+    rec.record("game_start", start)
+    session_id = response.json()["session_id"]
+
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        response = await client.post(
+            f"{API_PREFIX}/game/{session_id}/round/start", json={"image_base64": image_base64}
+        )
+        rec.record("round_start", start)
+        image_id = response.json()["round"]["image_id"]
+
+        for _ in range(args.clicks):
+            start = time.perf_counter()
+            await client.post(f"{API_PREFIX}/game/{session_id}/click", json={
+                "x": random.random(), "y": random.random(), "timestamp": time.time(),
+                "image_id": image_id, "game_session_id": session_id,
+            })
+            rec.record("click", start)
+
+        start = time.perf_counter()
+        await client.post(f"{API_PREFIX}/game/{session_id}/ai-turn", params={"image_id": image_id})
+        rec.record("ai_turn", start)
+
+        start = time.perf_counter()
+        await client.post(f"{API_PREFIX}/game/{session_id}/round/end")
+        rec.record("round_end", start)
+
+    start = time.perf_counter()
+    await client.post(f"{API_PREFIX}/game/{session_id}/end")
+    rec.record("game_end", start)
+
+
+async def play_ws(client: httpx.AsyncClient, ws_url: str, image_base64: str, args, rec: Recorder):
+    """Uma partida pelo canal WebSocket (uma conexão persistente)"""
+    start = time.perf_counter()
+    response = await client.post(f"{API_PREFIX}/game/start")
+    rec.record("game_start", start)
+    session_id = response.json()["session_id"]
+
+    async with websockets.connect(f"{ws_url}{API_PREFIX}/game/{session_id}/ws", max_size=None) as ws:
+        async def exchange(kind: str, message, expect: str):
+            start = time.perf_counter()
+            await ws.send(message)
+            while True:
+                reply = json.loads(await ws.recv())
+                if reply["type"] == "error":
+                    rec.errors += 1
+                    return reply
+                if reply["type"] == expect:
+                    rec.record(kind, start)
+                    return reply
+
+        seq = 0
+        for _ in range(args.rounds):
+            await exchange("round_start", json.dumps({"type": "round_start", "image_base64": image_base64}), "round_started")
+
+            for _ in range(args.clicks):
+                seq += 1
+                frame = struct.pack(BINARY_CLICK_FORMAT, seq, random.random(), random.random(), time.time())
+                await exchange("click", frame, "click_result")
+
+            await exchange("ai_turn", json.dumps({"type": "ai_turn"}), "ai_turn_planned")
+            await exchange("round_end", json.dumps({"type": "round_end"}), "round_ended")
+
+        await exchange("game_end", json.dumps({"type": "game_end"}), "game_ended")
+
+
+async def run_protocol(protocol: str, base_url: str, image_base64: str, args) -> Dict:
+    """Executa `args.games` partidas com `args.concurrency` simultâneas"""
+    rec = Recorder()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    ws_url = base_url.replace("http", "ws", 1)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        async def one_game():
+            async with semaphore:
+                try:
+                    if protocol == "rest":
+                        await play_rest(client, image_base64, args, rec)
+                    else:
+                        await play_ws(client, ws_url, image_base64, args, rec)
+                except Exception as e:
+                    rec.errors += 1
+                    print(f"⚠️ [{protocol}] partida falhou: {e}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_game() for _ in range(args.games)))
+        elapsed = time.perf_counter() - start
+
+    return rec.summary(elapsed)
+
+
+def load_image(image: Optional[Path]) -> str:
+    """Lê a imagem da rodada (padrão: primeira imagem do split de teste)"""
+    if image is None:
+        from app.config import settings
+        image = next(p for p in sorted(settings.GAME_IMAGES_DIR.iterdir()) if p.suffix.lower() == ".jpg")
+    return base64.b64encode(image.read_bytes()).decode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara canal WebSocket e fluxo REST do jogo")
+    parser.add_argument("--url", help="URL de um servidor já em execução (padrão: sobe um local)")
+    parser.add_argument("--games", type=int, default=20, help="Número de partidas por protocolo")
+    parser.add_argument("--concurrency", type=int, default=10, help="Partidas simultâneas")
+    parser.add_argument("--rounds", type=int, default=10, help="Rodadas por partida")
+    parser.add_argument("--clicks", type=int, default=5, help="Cliques por rodada")
+    parser.add_argument("--image", type=Path, help="Imagem usada nas rodadas")
+    parser.add_argument("--json-out", type=Path, help="Grava o resultado em JSON")
+    args = parser.parse_args()
+
+    base_url = args.url or start_local_server()
+    image_base64 = load_image(args.image)
+
+    print(f"🐗 WebSocket vs REST em {base_url}")
+    print(f"   {args.games} partidas, {args.concurrency} simultâneas, "
+          f"{args.rounds} rodadas x {args.clicks} cliques")
+
+    results = {}
+    for protocol in ("rest", "ws"):
+        results[protocol] = asyncio.run(run_protocol(protocol, base_url, image_base64, args))
+        summary = results[protocol]
+        print(f"\n📊 {protocol.upper()}: {summary['messages_per_second']} msg/s, "
+              f"p50 {summary['overall_p50_ms']} ms, p99 {summary['overall_p99_ms']} ms, "
+              f"{summary['errors']} erros")
+        for kind, stats in summary["latency_ms"].items():
+            print(f"   {kind:12s} p50 {stats['p50']:8.2f}  p95 {stats['p95']:8.2f}  p99 {stats['p99']:8.2f} ms")
+
+    rest_rate = results["rest"]["messages_per_second"]
+    if rest_rate:
+        print(f"\n⚡ WebSocket: {results['ws']['messages_per_second'] / rest_rate:.2f}x mensagens/s do REST")
+
+    if args.json_out:
+        args.json_out.write_text(json.dumps(results, indent=2))
+        print(f"💾 Resultado salvo em {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -107,9 +107,19 @@ export const api = {
     return response.data
   },
 
-  async startRound(sessionId: string, imageBase64: string) {
+  async startRound(sessionId: string, imageBase64: string, imageName?: string, returnMasks = true) {
     const response = await apiClient.post(`/game/${sessionId}/round/start`, {
       image_base64: imageBase64,
+      image_name: imageName,
+      return_masks: returnMasks,
+    })
+    return response.data
+  },
+
+  async getRoundMasks(sessionId: string, imageId: string, indices?: number[]) {
+    const response = await apiClient.get(`/game/${sessionId}/masks/${imageId}`, {
+      params: { indices },
+      paramsSerializer: { indexes: null },
     })
     return response.data
   },
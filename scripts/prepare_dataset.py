@@ -8,6 +8,14 @@ Este script:
 3. Gera arquivo YAML do dataset
 4. Cria anotações placeholder para iniciar o treinamento supervisionado
 
+As imagens são processadas em paralelo (pool de threads) e colocadas no
+dataset por hardlink ou reflink quando o sistema de arquivos permite (cópia
+só como último recurso). Um manifesto (`manifest.json`) guarda o hash do
+conteúdo, o split e o tamanho/mtime de cada imagem: numa nova execução só
+imagens novas ou alteradas são processadas, e cada imagem mantém o seu split.
+Num dataset criado sem manifesto (versão anterior do script), cada imagem
+fica no split onde já estava, sem cópias em outros splits.
+
 IMPORTANTE: 
 - Para um modelo robusto, você precisará anotar as imagens manualmente.
 - Use ferramentas como LabelImg, CVAT, ou Roboflow para anotação.
@@ -19,12 +27,24 @@ import sys
 import shutil
 import random
 import json
+import errno
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import argparse
 
 # Diretório base do projeto
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+MANIFEST_NAME = "manifest.json"
+SPLITS = ("train", "val", "test")
+LINK_MODES = ("auto", "hardlink", "reflink", "copy")
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# ioctl FICLONE do Linux (reflink em btrfs/xfs)
+FICLONE = 0x40049409
+
 
 def create_directory_structure(data_dir: Path):
     """Cria estrutura de diretórios para o dataset YOLO"""
@@ -44,13 +64,172 @@ def create_directory_structure(data_dir: Path):
     print(f"✅ Estrutura de diretórios criada em: {data_dir}")
 
 
-def copy_images_from_frontend(data_dir: Path, split_ratios: dict = None):
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Hash do conteúdo do arquivo (BLAKE2b, lido em blocos)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(data_dir: Path) -> dict:
+    """Manifesto da execução anterior (vazio se não existir ou inválido)"""
+    path = data_dir / MANIFEST_NAME
+    try:
+        with open(path) as f:
+            return json.load(f).get("images", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(data_dir: Path, images: dict):
+    """Grava o manifesto de forma atômica (arquivo temporário + rename)"""
+    path = data_dir / MANIFEST_NAME
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"version": 1, "images": images}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def assign_split(digest: str, split_ratios: dict) -> str:
+    """Split estável derivado do hash (a mesma imagem cai sempre no mesmo)"""
+    bucket = int(digest[:8], 16) / 0x100000000
+    cumulative = 0.0
+    for split in SPLITS:
+        cumulative += split_ratios[split]
+        if bucket < cumulative:
+            return split
+    return SPLITS[-1]
+
+
+def place_file(src: Path, dst: Path, link_mode: str = "auto") -> str:
     """
-    Copia imagens do frontend para o dataset de ML
+    Coloca `src` em `dst` sem duplicar dados quando possível
+    
+    Com hardlink, origem e dataset são o mesmo arquivo (editar um altera o
+    outro); reflink compartilha os blocos mas é copy-on-write.
+    
+    Returns:
+        Método usado: "hardlink", "reflink" ou "copy"
+    """
+    if dst.exists() or dst.is_symlink():
+        dst.unlink()
+    
+    if link_mode in ("auto", "hardlink"):
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError as e:
+            if link_mode == "hardlink" or e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP):
+                raise
+    
+    if link_mode in ("auto", "reflink"):
+        try:
+            import fcntl
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst)
+            return "reflink"
+        except (ImportError, OSError):
+            dst.unlink(missing_ok=True)
+            if link_mode == "reflink":
+                raise
+    
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def collect_source_images(frontend_images_dir: Path) -> list:
+    """Imagens sample_XX.jpg e da pasta Sus_scrofa (iNaturalist)"""
+    image_files = []
+    for directory, prefix in ((frontend_images_dir, "sample_"), (frontend_images_dir / "Sus_scrofa", "")):
+        if not directory.is_dir():
+            continue
+        with os.scandir(directory) as entries:
+            image_files.extend(
+                Path(entry.path) for entry in entries
+                if entry.is_file() and entry.name.startswith(prefix) and entry.name.endswith(".jpg")
+            )
+    return sorted(image_files)
+
+
+def _label_path(data_dir: Path, split: str, name: str) -> Path:
+    return data_dir / split / "labels" / f"{Path(name).stem}.txt"
+
+
+def _existing_split(data_dir: Path, name: str):
+    """
+    Split onde a imagem já está no dataset (execuções sem manifesto)
+    
+    Se houver cópias em mais de um split, prefere a que tem label.
+    """
+    found = [split for split in SPLITS if (data_dir / split / "images" / name).exists()]
+    labeled = [split for split in found if _label_path(data_dir, split, name).exists()]
+    return (labeled or found or [None])[0]
+
+
+def _sync_image(src: Path, key: str, previous: dict, data_dir: Path, split_ratios: dict, link_mode: str):
+    """
+    Processa uma imagem (executado no pool)
+    
+    Returns:
+        (entrada do manifesto, ação, bytes processados)
+    """
+    stat = src.stat()
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    
+    # Mesmo tamanho/mtime e destino presente: nada a fazer (sem ler o arquivo)
+    if previous and all(previous.get(k) == v for k, v in signature.items()):
+        if (data_dir / previous["dest"]).exists():
+            return previous, "skipped", 0
+    
+    digest = file_digest(src)
+    if previous and previous.get("hash") == digest and (data_dir / previous["dest"]).exists():
+        return {**previous, **signature}, "skipped", stat.st_size
+    
+    # Imagens conhecidas mantêm o split; sem manifesto (dataset de uma versão
+    # anterior do script) adotam o split onde já estão; novas recebem um
+    # split pelo hash
+    if previous:
+        split = previous["split"]
+    else:
+        split = _existing_split(data_dir, src.name) or assign_split(digest, split_ratios)
+    
+    # Cópias antigas em outros splits (imagem e label) sairiam duplicadas
+    for other in SPLITS:
+        if other != split:
+            (data_dir / other / "images" / src.name).unlink(missing_ok=True)
+            _label_path(data_dir, other, src.name).unlink(missing_ok=True)
+    
+    dest = Path(split) / "images" / src.name
+    # Cópia antiga com o mesmo conteúdo: é substituída pelo link, mas conta
+    # como inalterada (o label, possivelmente anotado, é mantido)
+    adopted = not previous and (data_dir / dest).exists() and file_digest(data_dir / dest) == digest
+    method = place_file(src, data_dir / dest, link_mode)
+    entry = {"hash": digest, "split": split, "dest": dest.as_posix(), **signature}
+    return entry, "adopted" if adopted else method, stat.st_size
+
+
+def copy_images_from_frontend(
+    data_dir: Path,
+    split_ratios: dict = None,
+    workers: int = DEFAULT_WORKERS,
+    link_mode: str = "auto",
+    prune: bool = False
+) -> list:
+    """
+    Sincroniza as imagens do frontend com o dataset de ML
     
     Args:
         data_dir: Diretório de destino para os dados
         split_ratios: Proporções de divisão (train, val, test)
+        workers: Threads do pool (hash + hardlink/cópia)
+        link_mode: "auto" (hardlink > reflink > cópia), "hardlink", "reflink" ou "copy"
+        prune: Remove do dataset imagens que sumiram da origem
+        
+    Returns:
+        Imagens do dataset novas ou alteradas nesta execução
     """
     if split_ratios is None:
         split_ratios = {"train": 0.7, "val": 0.2, "test": 0.1}
@@ -58,48 +237,72 @@ def copy_images_from_frontend(data_dir: Path, split_ratios: dict = None):
     frontend_images_dir = BASE_DIR / "frontend" / "public" / "images"
     
     # Coleta todas as imagens
-    image_files = []
-    
-    # Imagens sample_XX.jpg
-    for img_file in frontend_images_dir.glob("sample_*.jpg"):
-        image_files.append(img_file)
-    
-    # Imagens da pasta Sus_scrofa (iNaturalist)
-    sus_scrofa_dir = frontend_images_dir / "Sus_scrofa"
-    if sus_scrofa_dir.exists():
-        for img_file in sus_scrofa_dir.glob("*.jpg"):
-            image_files.append(img_file)
-    
+    image_files = collect_source_images(frontend_images_dir)
     print(f"📸 Encontradas {len(image_files)} imagens")
     
     if not image_files:
         print("⚠️ Nenhuma imagem encontrada!")
-        return
-    
-    # Embaralha e divide
-    random.shuffle(image_files)
-    
-    n_total = len(image_files)
-    n_train = int(n_total * split_ratios["train"])
-    n_val = int(n_total * split_ratios["val"])
-    
-    splits = {
-        "train": image_files[:n_train],
-        "val": image_files[n_train:n_train + n_val],
-        "test": image_files[n_train + n_val:],
-    }
-    
-    for split_name, files in splits.items():
-        dest_dir = data_dir / split_name / "images"
-        for src_file in files:
-            dst_file = dest_dir / src_file.name
-            shutil.copy2(src_file, dst_file)
-        print(f"  {split_name}: {len(files)} imagens copiadas")
+        return []
+    
+    manifest = load_manifest(data_dir)
+    images = {}
+    changed = []
+    actions = {}
+    total_bytes = 0
+    start = time.perf_counter()
+    
+    keys = [src.relative_to(frontend_images_dir).as_posix() for src in image_files]
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            results = pool.map(
+                lambda item: _sync_image(item[0], item[1], manifest.get(item[1]), data_dir, split_ratios, link_mode),
+                zip(image_files, keys)
+            )
+            for key, (entry, action, size) in zip(keys, results):
+                images[key] = entry
+                actions[action] = actions.get(action, 0) + 1
+                total_bytes += size
+                if action not in ("skipped", "adopted"):
+                    changed.append(data_dir / entry["dest"])
+    finally:
+        # Grava o progresso mesmo se interrompido: a próxima execução retoma
+        missing = {k: v for k, v in manifest.items() if k not in images}
+        if prune and len(images) == len(keys):
+            for entry in missing.values():
+                (data_dir / entry["dest"]).unlink(missing_ok=True)
+                _label_path(data_dir, entry["split"], entry["dest"]).unlink(missing_ok=True)
+            missing = {}
+        save_manifest(data_dir, {**missing, **images})
+    
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    per_split = {split: sum(1 for e in images.values() if e["split"] == split) for split in SPLITS}
+    for split in SPLITS:
+        print(f"  {split}: {per_split[split]} imagens")
+    summary = ", ".join(f"{count} {action}" for action, count in sorted(actions.items()))
+    print(f"  ({summary})")
+    if missing:
+        print(f"  ⚠️ {len(missing)} imagens do manifesto não existem mais na origem (use --prune)")
+    print(
+        f"⚡ {len(image_files) / elapsed:,.0f} imagens/s, "
+        f"{total_bytes / elapsed / 1e6:,.1f} MB/s lidos ({elapsed:.2f} s, {workers} workers)"
+    )
     
-    print(f"✅ Imagens copiadas para {data_dir}")
+    print(f"✅ Imagens sincronizadas em {data_dir}")
+    return changed
+
 
+def _write_placeholder_label(label_file: Path, rng: random.Random):
+    # Label placeholder: classe 0 (boar), centralizado, tamanho médio
+    # Formato: class_id x_center y_center width height
+    # Posição aleatória realista para simular variação
+    x_center = 0.3 + rng.random() * 0.4  # 0.3 a 0.7
+    y_center = 0.4 + rng.random() * 0.3  # 0.4 a 0.7
+    width = 0.15 + rng.random() * 0.2    # 0.15 a 0.35
+    height = 0.1 + rng.random() * 0.15   # 0.1 a 0.25
+    label_file.write_text(f"0 {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}\n")
 
-def create_placeholder_labels(data_dir: Path):
+
+def create_placeholder_labels(data_dir: Path, images: list = None, workers: int = DEFAULT_WORKERS):
     """
     Cria labels placeholder para as imagens.
     
@@ -107,6 +310,9 @@ def create_placeholder_labels(data_dir: Path):
     Para treinamento real, as labels devem ser criadas manualmente usando
     ferramentas de anotação como LabelImg, CVAT, ou Roboflow.
     
+    Só escreve labels de imagens novas/alteradas (`images`) e de imagens
+    sem label; labels existentes (possivelmente já anotados) são mantidos.
+    
     Formato YOLO:
         class_id x_center y_center width height
         (valores normalizados 0-1)
@@ -115,25 +321,29 @@ def create_placeholder_labels(data_dir: Path):
     print("⚠️ ATENÇÃO: Estes são labels genéricos! Para um modelo robusto,")
     print("   anote as imagens manualmente usando LabelImg, CVAT ou Roboflow.")
     
-    for split in ["train", "val", "test"]:
+    refresh = {Path(p) for p in images or ()}
+    targets = []
+    for split in SPLITS:
         images_dir = data_dir / split / "images"
         labels_dir = data_dir / split / "labels"
-        
-        for img_file in images_dir.glob("*.jpg"):
-            label_file = labels_dir / f"{img_file.stem}.txt"
-            
-            # Label placeholder: classe 0 (boar), centralizado, tamanho médio
-            # Formato: class_id x_center y_center width height
-            with open(label_file, 'w') as f:
-                # Posição aleatória realista para simular variação
-                x_center = 0.3 + random.random() * 0.4  # 0.3 a 0.7
-                y_center = 0.4 + random.random() * 0.3  # 0.4 a 0.7
-                width = 0.15 + random.random() * 0.2    # 0.15 a 0.35
-                height = 0.1 + random.random() * 0.15   # 0.1 a 0.25
-                
-                f.write(f"0 {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}\n")
-    
-    print("✅ Labels placeholder criados")
+        with os.scandir(labels_dir) as entries:
+            existing = {entry.name for entry in entries}
+        with os.scandir(images_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".jpg"):
+                    continue
+                label_name = f"{entry.name[:-4]}.txt"
+                if label_name not in existing or Path(entry.path) in refresh:
+                    targets.append(labels_dir / label_name)
+    
+    def write(label_file: Path):
+        # Semente por arquivo: o mesmo placeholder em qualquer ordem de execução
+        _write_placeholder_label(label_file, random.Random(label_file.name))
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        list(pool.map(write, targets))
+    
+    print(f"✅ {len(targets)} labels placeholder criados")
 
 
 def create_dataset_yaml(data_dir: Path):
@@ -309,13 +519,17 @@ def print_dataset_stats(data_dir: Path):
     print("\n📊 Estatísticas do Dataset:")
     print("=" * 50)
     
-    for split in ["train", "val", "test"]:
-        images_dir = data_dir / split / "images"
-        labels_dir = data_dir / split / "labels"
-        
-        n_images = len(list(images_dir.glob("*.jpg")))
-        n_labels = len(list(labels_dir.glob("*.txt")))
-        
+    def count(directory: Path, suffix: str) -> int:
+        with os.scandir(directory) as entries:
+            return sum(1 for entry in entries if entry.name.endswith(suffix))
+    
+    # Uma varredura por diretório, todas em paralelo
+    dirs = [(data_dir / split / sub, suffix) for split in SPLITS for sub, suffix in (("images", ".jpg"), ("labels", ".txt"))]
+    with ThreadPoolExecutor(max_workers=len(dirs)) as pool:
+        counts = list(pool.map(lambda item: count(*item), dirs))
+    
+    for i, split in enumerate(SPLITS):
+        n_images, n_labels = counts[2 * i], counts[2 * i + 1]
         print(f"  {split:6s}: {n_images:4d} imagens, {n_labels:4d} labels")
     
     print("=" * 50)
@@ -348,16 +562,35 @@ def main():
         action="store_true",
         help="Pular cópia de imagens (usar se já copiou)"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Threads para hash/cópia/labels (default: {DEFAULT_WORKERS})"
+    )
+    parser.add_argument(
+        "--link-mode",
+        choices=LINK_MODES,
+        default="auto",
+        help="Como colocar as imagens no dataset (default: auto = hardlink > reflink > cópia)"
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Remove do dataset imagens que não existem mais na origem"
+    )
     
     args = parser.parse_args()
     
+    started = time.perf_counter()
     print("🐗 Preparando Dataset do Javali Hunter")
     print("=" * 50)
     
     # Cria estrutura de diretórios
     create_directory_structure(args.output_dir)
     
-    # Copia imagens
+    # Copia imagens (só novas ou alteradas desde a última execução)
+    changed = []
     if not args.skip_copy:
         test_ratio = 1.0 - args.train_ratio - args.val_ratio
         split_ratios = {
@@ -365,10 +598,12 @@ def main():
             "val": args.val_ratio,
             "test": test_ratio,
         }
-        copy_images_from_frontend(args.output_dir, split_ratios)
+        changed = copy_images_from_frontend(
+            args.output_dir, split_ratios, args.workers, args.link_mode, args.prune
+        )
     
     # Cria labels placeholder
-    create_placeholder_labels(args.output_dir)
+    create_placeholder_labels(args.output_dir, changed, args.workers)
     
     # Cria arquivo YAML
     create_dataset_yaml(args.output_dir)
@@ -378,6 +613,7 @@ def main():
     
     # Estatísticas
     print_dataset_stats(args.output_dir)
+    print(f"⏱️ Tempo total: {time.perf_counter() - started:.2f} s")
     
     print("\n✅ Dataset preparado com sucesso!")
     print("\n⚠️ PRÓXIMOS PASSOS:")